@@ -1,24 +1,24 @@
 from django.contrib import admin
 from authentication.models import (
-    ForgetPasswordOtp,
-    ActivationOTP,
-    SoftDeletedUser
+    OneTimePassword,
+    SoftDeletedUser,
+    EmailOutbox,
     )
 
 
-@admin.register(ForgetPasswordOtp)
-class ForgetPasswordOtpAdmin(admin.ModelAdmin):
-    list_display = ("user", "otp", "created_at")
-    list_filter = ("created_at",)
-
-
-@admin.register(ActivationOTP)
-class ActivationOTPAdmin(admin.ModelAdmin):
-    list_display = ("user", "otp", "created_at")
-    list_filter = ("created_at",)
+@admin.register(OneTimePassword)
+class OneTimePasswordAdmin(admin.ModelAdmin):
+    list_display = ("user", "purpose", "attempts", "created_at", "expires_at")
+    list_filter = ("purpose", "created_at")
 
 
 @admin.register(SoftDeletedUser)
 class SoftDeletedUserAdmin(admin.ModelAdmin):
     list_display = ("user", "deleted_at")
     list_filter = ("deleted_time",)
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ("subject", "status", "attempts", "next_attempt_at", "created_at")
+    list_filter = ("status",)
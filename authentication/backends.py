@@ -0,0 +1,198 @@
+"""
+Token authentication with the token -> user resolution cached.
+
+DRF's `TokenAuthentication` runs a `Token`/`User` query on every request.
+`CachedTokenAuthentication` keeps the resolved tokens in a bounded
+in-process LRU cache with a TTL and, when `AUTH_TOKEN_SHARED_CACHE` is
+enabled, in Django's cache as well so that all workers share them.
+
+Entries are dropped when a token is deleted or its user is saved (see
+`authentication.signals`), which also bumps a revocation generation of the
+token in Django's cache. Entries remember the generation read before the
+token was looked up and are only served while it is unchanged. Generations
+are bumped again once the transaction is committed, so a token read from
+the database in the meantime is not kept.
+
+The generation is read at most once every
+`AUTH_TOKEN_REVOCATION_CHECK_INTERVAL` seconds per token and worker, so
+cached tokens are served without any cache round trip in between. A logout
+or password change revokes the token at once in the worker handling it,
+and within that interval in the other workers, provided `CACHES` is shared
+by them (e.g. Redis): with the default per-process LocMem cache,
+revocations never reach the other workers, which keep serving the token
+until its entry expires (`AUTH_TOKEN_CACHE_TTL`).
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+CACHE_SIZE = getattr(settings, "AUTH_TOKEN_CACHE_SIZE", 1024)
+CACHE_TTL = getattr(settings, "AUTH_TOKEN_CACHE_TTL", 60)
+SHARED_CACHE = getattr(settings, "AUTH_TOKEN_SHARED_CACHE", False)
+REVOCATION_CHECK_INTERVAL = getattr(settings, "AUTH_TOKEN_REVOCATION_CHECK_INTERVAL", 5)
+
+
+class TokenCache:
+    """
+    Thread-safe LRU cache of (token, generation, checked at) entries with a
+    time to live.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def replace(self, key, value):
+        """
+        Replace the value of an entry, keeping its expiry time.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries[key] = (value, entry[1])
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self.lock:
+            for key in [
+                key for key, ((token, generation, checked_at), expires) in self.entries.items()
+                if token.user_id == user_id
+            ]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_cache = TokenCache(CACHE_SIZE, CACHE_TTL)
+
+
+def get_shared_key(key):
+    # Hash the token so it never shows up in cache key listings
+    return "auth:token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_generation_key(key):
+    return get_shared_key(key) + ":generation"
+
+
+def get_generation(key):
+    """
+    Return the revocation generation of a token.
+
+    A missing generation (first use, expiry, cache restart) is started from
+    the current time in milliseconds, so it never goes back to the value of
+    a revoked entry. It only has to outlive the entries, which expire after
+    `CACHE_TTL` seconds.
+    """
+    generation_key = get_generation_key(key)
+    generation = cache.get(generation_key)
+    if generation is None:
+        cache.add(generation_key, int(time.time() * 1000), timeout=CACHE_TTL)
+        generation = cache.get(generation_key)
+    return generation
+
+
+def revoke(key):
+    """
+    Bump the revocation generation of a token.
+    """
+    try:
+        cache.incr(get_generation_key(key))
+    except ValueError:
+        # Missing: restarted from the current time
+        get_generation(key)
+
+
+def invalidate_token(key):
+    local_cache.delete(key)
+    if SHARED_CACHE:
+        cache.delete(get_shared_key(key))
+    revoke(key)
+    transaction.on_commit(lambda: revoke(key))
+
+
+def invalidate_user(user_id):
+    local_cache.delete_user(user_id)
+    for key in Token.objects.filter(user_id=user_id).values_list("key", flat=True):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    `TokenAuthentication` answering from the token cache when it can.
+    """
+
+    def authenticate_credentials(self, key):
+        now = time.monotonic()
+        entry = local_cache.get(key)
+        if entry is not None and now - entry[2] < REVOCATION_CHECK_INTERVAL:
+            # Checked against the revocation generation recently
+            token = entry[0]
+        else:
+            token = self.check_credentials(key, entry, now)
+        if not token.user.is_active:
+            raise AuthenticationFailed(_("User inactive or deleted."))
+
+        # Hand out copies, views are free to modify request.user
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return (token.user, token)
+
+    def check_credentials(self, key, entry, now):
+        """
+        Return the token of `key` after reading its revocation generation:
+        the cached one while the generation is unchanged, else the one in
+        the database.
+        """
+        generation = get_generation(key)
+        if entry is not None and entry[1] == generation:
+            local_cache.replace(key, (entry[0], generation, now))
+            return entry[0]
+
+        if SHARED_CACHE:
+            shared = cache.get(get_shared_key(key))
+            if shared is not None and shared[1] == generation:
+                local_cache.set(key, (shared[0], generation, now))
+                return shared[0]
+
+        # Missing or revoked since it was cached
+        user, token = super().authenticate_credentials(key)
+        local_cache.set(key, (token, generation, now))
+        if SHARED_CACHE:
+            cache.set(get_shared_key(key), (token, generation), timeout=CACHE_TTL)
+        return token
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from authentication.utils import otp
+
+
+class Command(BaseCommand):
+    help = "Delete expired and exhausted one-time passwords."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of OTPs deleted per query.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = otp.purge_expired(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} one-time passwords."))
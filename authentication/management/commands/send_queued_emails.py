@@ -0,0 +1,62 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection
+from authentication.utils import email_outbox
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Deliver the emails waiting in the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker threads, each with its own backend connection.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=email_outbox.BATCH_SIZE,
+            help="Number of emails sent per connection.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait when the outbox is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Deliver the due emails and exit instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            while True:
+                futures = [
+                    executor.submit(self.work, options["batch_size"])
+                    for _ in range(options["workers"])
+                ]
+                processed = sum(future.result() for future in futures)
+                if processed:
+                    self.stdout.write(f"Processed {processed} emails.")
+                if options["once"]:
+                    return
+                if not processed:
+                    time.sleep(options["interval"])
+
+    def work(self, batch_size):
+        try:
+            return email_outbox.deliver_due(batch_size)
+        except Exception:
+            # Keep polling, the emails are retried on the next round
+            logger.exception("Email outbox delivery failed")
+            return 0
+        finally:
+            connection.close()
@@ -0,0 +1,80 @@
+# Generated by Django 4.1.7 on 2026-10-18 00:58
+
+from datetime import timedelta
+import hashlib
+import hmac
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def port_otps(apps, schema_editor):
+    """
+    Copy the latest pending OTP of every user into OneTimePassword,
+    hashed and with an expiry counted from its creation.
+    """
+    OneTimePassword = apps.get_model('authentication', 'OneTimePassword')
+    ttl = timedelta(seconds=getattr(settings, 'OTP_TTL_SECONDS', 600))
+    key = settings.SECRET_KEY.encode()
+
+    for model_name, purpose in (('ActivationOTP', 'activation'),
+                                ('ForgetPasswordOtp', 'forget_password')):
+        model = apps.get_model('authentication', model_name)
+        latest = {}
+        for entry in model.objects.order_by('created_at', 'id').iterator():
+            latest[entry.user_id] = entry
+        OneTimePassword.objects.bulk_create([
+            OneTimePassword(
+                user_id=entry.user_id,
+                purpose=purpose,
+                otp_hash=hmac.new(key, f'{purpose}:{entry.otp}'.encode(), hashlib.sha256).hexdigest(),
+                expires_at=entry.created_at + ttl,
+            )
+            for entry in latest.values()
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('authentication', '0005_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OneTimePassword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('purpose', models.CharField(choices=[('activation', 'Activation'), ('forget_password', 'Forget Password')], max_length=20)),
+                ('otp_hash', models.CharField(max_length=64)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='onetimepassword',
+            index=models.Index(fields=['purpose', 'otp_hash'], name='auth_otp_purpose_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='onetimepassword',
+            index=models.Index(fields=['expires_at'], name='auth_otp_expires_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='onetimepassword',
+            constraint=models.UniqueConstraint(fields=('user', 'purpose', 'otp_hash'), name='auth_otp_user_purpose_hash_uniq'),
+        ),
+        migrations.RunPython(port_otps, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='forgetpasswordotp',
+            name='user',
+        ),
+        migrations.DeleteModel(
+            name='ActivationOTP',
+        ),
+        migrations.DeleteModel(
+            name='ForgetPasswordOtp',
+        ),
+    ]
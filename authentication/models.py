@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -19,37 +20,94 @@ class SoftDeletedUser(models.Model):
         return f"Dleted UserName {self.user} at {self.deleted_time}"
 
 
-class ActivationOTP(models.Model):
+class OneTimePassword(models.Model):
     """
-    Model representing an activation OTP for user account activation.
+    Model representing a one-time password sent to a user by email.
+
+    Only a keyed hash of the OTP is stored, so verification is an indexed
+    lookup on (user, purpose, otp_hash), or (purpose, otp_hash) when the
+    user is not known.
 
     Attributes:
-        user (ForeignKey): A reference to the User for whom the activation OTP was generated.
-        otp (CharField): The OTP code generated for user account activation.
-        created_at (DateTimeField): The date and time when the activation OTP was created.
+        user (ForeignKey): A reference to the User the OTP was generated for.
+        purpose (CharField): What the OTP is for, account activation or
+            forget password.
+        otp_hash (CharField): HMAC-SHA256 of the purpose and OTP code.
+        attempts (PositiveSmallIntegerField): Number of failed verifications.
+        created_at (DateTimeField): The date and time when the OTP was created.
+        expires_at (DateTimeField): The date and time after which the OTP is invalid.
     """
 
+    ACTIVATION = "activation"
+    FORGET_PASSWORD = "forget_password"
+
+    PURPOSE_CHOICES = (
+        (ACTIVATION, "Activation"),
+        (FORGET_PASSWORD, "Forget Password"),
+    )
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    otp = models.CharField(max_length=6)
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    otp_hash = models.CharField(max_length=64)
+    attempts = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "purpose", "otp_hash"],
+                name="auth_otp_user_purpose_hash_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["purpose", "otp_hash"], name="auth_otp_purpose_hash_idx"),
+            models.Index(fields=["expires_at"], name="auth_otp_expires_idx"),
+        ]
 
     def __str__(self):
-        return f"Activation OTP {self.otp} for {self.user.email}"
+        return f"{self.get_purpose_display()} OTP for {self.user.email}"
 
 
-class ForgetPasswordOtp(models.Model):
+class EmailOutbox(models.Model):
     """
-    Model representing a forget password request.
+    Model representing an email waiting in the outbox to be sent.
 
     Attributes:
-        user (ForeignKey): A reference to the User who requested the forget password.
-        otp (CharField): The OTP code generated for the forget password request.
-        created_at (DateTimeField): The date and time when the forget password request was created.
+        subject (CharField): The subject of the email.
+        body (TextField): The plain text body of the email.
+        to (JSONField): The list of recipient addresses.
+        status (CharField): The delivery status, "pending", "sending" (claimed
+            by a worker), "sent" or "failed".
+        attempts (PositiveIntegerField): Number of delivery attempts so far.
+        next_attempt_at (DateTimeField): Earliest time of the next delivery
+            attempt, or end of the lease of the worker sending it.
+        last_error (TextField): The error of the last failed attempt.
+        created_at (DateTimeField): The date and time when the email was queued.
+        sent_at (DateTimeField): The date and time when the email was sent.
     """
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    otp = models.CharField(max_length=6)
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    to = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="auth_outbox_due_idx"),
+        ]
 
     def __str__(self):
-        return f"OTP {self.otp} for {self.user.email}"
+        return f"{self.subject} to {', '.join(self.to)} ({self.status})"
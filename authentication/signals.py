@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from authentication import backends
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """
+    Drop deleted tokens (login, OTP verification, password update and
+    logout all rotate or delete them) from the token cache.
+    """
+    backends.invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """
+    Drop the cached tokens of a saved user so that the next request sees
+    its new state (password, username, active flag).
+    """
+    backends.invalidate_user(instance.pk)
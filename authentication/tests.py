@@ -1,3 +1,369 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from authentication import backends, throttling
+from authentication.management.commands import send_queued_emails
+from authentication.backends import CachedTokenAuthentication, local_cache
+from authentication.models import EmailOutbox, OneTimePassword
+from authentication.utils import email_outbox, otp as otp_store
 
-# Create your tests here.
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise SMTPException("Service unavailable")
+
+
+class RecordingEmailBackend(BaseEmailBackend):
+    """
+    Count the connections and the transactions open while sending.
+    """
+    opened = 0
+    atomic_blocks = []
+
+    def open(self):
+        RecordingEmailBackend.opened += 1
+
+    def send_messages(self, email_messages):
+        RecordingEmailBackend.atomic_blocks.append(len(connection.atomic_blocks))
+        return len(email_messages)
+
+
+class UnreachableEmailBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionRefusedError("Connection refused")
+
+    def send_messages(self, email_messages):
+        raise AssertionError("Not connected")
+
+
+class EmailOutboxTest(TestCase):
+    """
+    Queued emails are delivered from the outbox and retried on failure.
+    """
+
+    def test_delivers_queued_emails(self):
+        for i in range(3):
+            email_outbox.queue_email(f"Subject {i}", "Body", to=["user@example.com"])
+
+        self.assertEqual(email_outbox.deliver_due(), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(EmailOutbox.objects.filter(status="sent").count(), 3)
+        self.assertEqual(email_outbox.deliver_due(), 0)
+
+    @override_settings(EMAIL_BACKEND="authentication.tests.FailingEmailBackend")
+    def test_retries_with_backoff_then_gives_up(self):
+        email = email_outbox.queue_email("Subject", "Body", to=["user@example.com"])
+
+        self.assertEqual(email_outbox.deliver_due(), 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, "pending")
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertIn("Service unavailable", email.last_error)
+
+        # Not due yet
+        self.assertEqual(email_outbox.deliver_due(), 0)
+
+        for _ in range(email_outbox.MAX_ATTEMPTS - 1):
+            EmailOutbox.objects.update(next_attempt_at=timezone.now())
+            email_outbox.deliver_due()
+        email.refresh_from_db()
+        self.assertEqual(email.status, "failed")
+        self.assertEqual(email.attempts, email_outbox.MAX_ATTEMPTS)
+
+    @override_settings(EMAIL_BACKEND="authentication.tests.UnreachableEmailBackend")
+    def test_unreachable_backend_is_a_failed_attempt(self):
+        email = email_outbox.queue_email("Subject", "Body", to=["user@example.com"])
+
+        with self.assertLogs("authentication.utils.email_outbox", "WARNING"):
+            self.assertEqual(email_outbox.deliver_due(), 1)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("pending", 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertIn("Connection refused", email.last_error)
+
+        # The worker survives errors of the outbox itself
+        with mock.patch.object(email_outbox, "deliver_due", side_effect=RuntimeError("down")):
+            with self.assertLogs("authentication.management.commands.send_queued_emails"):
+                self.assertEqual(send_queued_emails.Command().work(10), 0)
+
+
+    @override_settings(EMAIL_BACKEND="authentication.tests.RecordingEmailBackend")
+    def test_sends_outside_transactions_over_one_connection(self):
+        RecordingEmailBackend.opened = 0
+        RecordingEmailBackend.atomic_blocks = []
+        for i in range(3):
+            email_outbox.queue_email(f"Subject {i}", "Body", to=["user@example.com"])
+
+        # The transactions of the test case itself
+        test_blocks = len(connection.atomic_blocks)
+        self.assertEqual(email_outbox.deliver_due(), 3)
+        self.assertEqual(RecordingEmailBackend.opened, 1)
+        self.assertEqual(RecordingEmailBackend.atomic_blocks, [test_blocks] * 3)
+        self.assertEqual(EmailOutbox.objects.filter(status="sent", attempts=1).count(), 3)
+
+    def test_expired_leases_are_claimed_again(self):
+        email = email_outbox.queue_email("Subject", "Body", to=["user@example.com"])
+        emails, lease = email_outbox.claim_batch(10)
+        self.assertEqual(emails, [email])
+        # Claimed by a worker still sending it
+        self.assertEqual(email_outbox.deliver_due(), 0)
+
+        # The worker died: its lease expires and another worker sends it
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(email_outbox.deliver_due(), 1)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("sent", 2))
+        # The late worker does not overwrite the outcome
+        email_outbox.record_attempt(emails[0], SMTPException("Timed out"))
+        email_outbox.save_attempts(emails, lease)
+        email.refresh_from_db()
+        self.assertEqual(email.status, "sent")
+
+        # Deliveries that never complete give up too
+        EmailOutbox.objects.update(
+            status="sending", attempts=email_outbox.MAX_ATTEMPTS, next_attempt_at=timezone.now())
+        self.assertEqual(email_outbox.deliver_due(), 0)
+        email.refresh_from_db()
+        self.assertEqual(email.status, "failed")
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """
+    Resolved tokens are served from the cache until they are deleted or
+    their user changes.
+    """
+
+    def setUp(self):
+        local_cache.clear()
+        self.user = User.objects.create_user(
+            username="reader", email="reader@example.com", password="secret")
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+
+    def test_second_lookup_is_cached(self):
+        with self.assertNumQueries(1):
+            self.authentication.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_deleted_token_is_rejected(self):
+        key = self.token.key
+        self.authentication.authenticate_credentials(key)
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(key)
+
+    def expire_check(self, key):
+        token, generation, checked_at = local_cache.get(key)
+        local_cache.replace(
+            key, (token, generation, checked_at - backends.REVOCATION_CHECK_INTERVAL))
+
+    def test_revocations_reach_other_processes(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        # Written by another process: only the shared generation changes
+        with mock.patch.object(local_cache, "delete"), \
+                mock.patch.object(local_cache, "delete_user"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.set_password("changed")
+                self.user.save()
+            # Seen once the generation is checked again, without any cache
+            # round trip until then
+            with self.assertNumQueries(0), \
+                    mock.patch.object(backends.cache, "get") as cache_get:
+                self.authentication.authenticate_credentials(self.token.key)
+            cache_get.assert_not_called()
+            self.expire_check(self.token.key)
+            with self.assertNumQueries(1):
+                self.authentication.authenticate_credentials(self.token.key)
+
+            key = self.token.key
+            self.token.delete()
+            self.expire_check(key)
+            with self.assertRaises(AuthenticationFailed):
+                self.authentication.authenticate_credentials(key)
+
+    def test_deactivated_user_is_rejected(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_returned_user_is_a_copy(self):
+        user, token = self.authentication.authenticate_credentials(self.token.key)
+        user.username = "changed"
+        user, token = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user.username, "reader")
+
+
+class OneTimePasswordTest(TestCase):
+    """
+    OTPs are hashed, single-use, expire and lock after too many attempts.
+    """
+
+    def setUp(self):
+        # Rate limit counters of the previous tests
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="reader", email="reader@example.com", password="secret",
+            is_active=False)
+
+    def verify_activation(self, otp, **data):
+        return self.client.post(reverse("verify-activationotp"), {"otp": otp, **data})
+
+    def test_activation_is_single_use(self):
+        otp = otp_store.issue_otp(self.user, OneTimePassword.ACTIVATION)
+        self.assertFalse(OneTimePassword.objects.filter(otp_hash=otp).exists())
+
+        self.assertEqual(self.verify_activation(otp).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+        self.assertEqual(self.verify_activation(otp).status_code, 401)
+
+    def test_purpose_must_match(self):
+        otp = otp_store.issue_otp(self.user, OneTimePassword.FORGET_PASSWORD)
+        self.assertEqual(self.verify_activation(otp).status_code, 401)
+
+    def test_expired_otp_is_rejected_and_purged(self):
+        otp = otp_store.issue_otp(self.user, OneTimePassword.ACTIVATION)
+        OneTimePassword.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.verify_activation(otp).status_code, 401)
+
+        self.assertEqual(otp_store.purge_expired(batch_size=1), 1)
+        self.assertFalse(OneTimePassword.objects.exists())
+
+    def test_locked_after_max_attempts(self):
+        otp = otp_store.issue_otp(self.user, OneTimePassword.ACTIVATION)
+        wrong = "000000" if otp != "000000" else "111111"
+        for _ in range(otp_store.OTP_MAX_ATTEMPTS):
+            response = self.verify_activation(wrong, email=self.user.email)
+            self.assertEqual(response.status_code, 401)
+        response = self.verify_activation(otp, email=self.user.email)
+        self.assertEqual(response.status_code, 401)
+
+
+class RateLimitTest(TestCase):
+    """
+    Authentication endpoints are rate limited per client over a sliding window.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_000 * 60.0
+        self.throttle = throttling.SlidingWindowThrottle()
+        self.throttle.store = throttling.MemoryStore()
+        self.throttle.timer = lambda: self.now
+        self.throttle.rates = {"login": "4/min"}
+        self.view = type("View", (), {"throttle_scope": "login"})()
+
+    def allow(self, ip="10.0.0.1", user=None):
+        request = type("Request", (), {})()
+        request.META = {"REMOTE_ADDR": ip}
+        request.user = user
+        return self.throttle.allow_request(request, self.view)
+
+    def test_login_is_rejected_with_retry_after(self):
+        url = reverse("email-login")
+        data = {"email": "nobody@example.com", "password": "wrong"}
+        with mock.patch.object(throttling.SlidingWindowThrottle, "rates", {"login": "2/min"}):
+            responses = [self.client.post(url, data) for _ in range(3)]
+        self.assertNotEqual(responses[1].status_code, 429)
+        self.assertEqual(responses[2].status_code, 429)
+        self.assertGreaterEqual(int(responses[2]["Retry-After"]), 1)
+
+    def test_previous_window_is_weighted_by_its_overlap(self):
+        for _ in range(4):
+            self.assertTrue(self.allow())
+        self.assertFalse(self.allow())
+        # Rejected requests are not counted
+        self.assertEqual(self.throttle.store.get(f"throttle:login:ip:10.0.0.1:{int(self.now // 60)}"), 4)
+
+        # A quarter into the next window, 3 of the 4 previous requests count
+        self.now += 75
+        self.assertTrue(self.allow())
+        self.assertFalse(self.allow())
+        self.assertEqual(self.throttle.wait(), 15)
+
+        # Halfway, 2 of them
+        self.now += 15
+        self.assertTrue(self.allow())
+        self.assertFalse(self.allow())
+
+    def test_clients_are_counted_apart(self):
+        user = User.objects.create_user(username="reader", password="secret")
+        for _ in range(4):
+            self.assertTrue(self.allow(ip="10.0.0.1"))
+        self.assertFalse(self.allow(ip="10.0.0.1"))
+        self.assertTrue(self.allow(ip="10.0.0.2"))
+        # Authenticated users are counted by account, wherever they come from
+        for _ in range(4):
+            self.assertTrue(self.allow(ip="10.0.0.1", user=user))
+        self.assertFalse(self.allow(ip="10.0.0.3", user=user))
+
+    def test_forwarded_for_is_not_trusted_by_default(self):
+        url = reverse("email-login")
+        data = {"email": "nobody@example.com", "password": "wrong"}
+        with mock.patch.object(throttling.SlidingWindowThrottle, "rates", {"login": "2/min"}):
+            responses = [
+                self.client.post(url, data, HTTP_X_FORWARDED_FOR=f"203.0.113.{n}")
+                for n in range(3)
+            ]
+        self.assertEqual(responses[2].status_code, 429)
+
+    def test_accounts_are_limited_from_any_address(self):
+        rates = {
+            "login": "100/min", "login_account": "2/min",
+            "otp_verify": "100/min", "otp_verify_account": "2/min",
+        }
+        for url, data in (
+            (reverse("email-login"), {"password": "guess"}),
+            (reverse("verify-forgetotp"), {"otp": "000000"}),
+        ):
+            with mock.patch.object(throttling.SlidingWindowThrottle, "rates", rates):
+                statuses = [
+                    self.client.post(
+                        url, {**data, "email": email}, REMOTE_ADDR=f"10.0.1.{n}").status_code
+                    for n, email in enumerate(
+                        ["victim@example.com", "Victim@example.com ", "VICTIM@example.com"])
+                ]
+                other = self.client.post(
+                    url, {**data, "email": "other@example.com"}, REMOTE_ADDR="10.0.1.9")
+            self.assertNotIn(429, statuses[:2])
+            self.assertEqual(statuses[2], 429)
+            self.assertNotEqual(other.status_code, 429)
+
+    def test_unlimited_scope(self):
+        self.view.throttle_scope = "other"
+        self.assertTrue(all(self.allow() for _ in range(100)))
+
+    def test_memory_store_is_thread_safe_and_expires(self):
+        store = throttling.MemoryStore()
+
+        def hit():
+            for _ in range(1000):
+                store.incr("key", 60)
+
+        threads = [threading.Thread(target=hit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(store.get("key"), 8000)
+
+        store.incr("expired", -1)
+        self.assertEqual(store.get("expired"), 0)
+        self.assertEqual(store.incr("expired", 60), 1)
@@ -0,0 +1,217 @@
+"""
+Sliding-window rate limiting of the authentication endpoints.
+
+`SlidingWindowThrottle` is a DRF throttle limiting every client (the user
+when authenticated, the IP address otherwise) to a number of requests per
+period for the `throttle_scope` of the view. Rates are set per scope in
+`AUTH_THROTTLE_RATES`, e.g. {"login": "10/min"}.
+
+The IP address is `REMOTE_ADDR`, unless `REST_FRAMEWORK["NUM_PROXIES"]`
+trusts that many proxies to append to `X-Forwarded-For`. Views whose
+requests name an account (`throttle_account_field`, e.g. the email of a
+login) are also limited per target account with the "<scope>_account"
+rate, so attempts spread over many addresses are limited too.
+
+The sliding window is approximated with two fixed-window counters: the
+requests of the current window plus the requests of the previous window
+weighted by how much of it still overlaps the sliding window. This needs
+two counters per client instead of one timestamp per request, and smooths
+out the bursts fixed windows allow at their boundaries.
+
+Counters live in a pluggable store, chosen with `AUTH_THROTTLE_STORE`:
+`MemoryStore` keeps them in the process (one web process, or tests) and
+`CacheStore` in Django's cache, shared by every worker (Redis in
+production), using its atomic increments.
+"""
+import hashlib
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+RATES = getattr(settings, "AUTH_THROTTLE_RATES", {})
+STORE = getattr(settings, "AUTH_THROTTLE_STORE", "authentication.throttling.CacheStore")
+
+DURATIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse a "<requests>/<period>" rate ("10/min", "100/hour") into
+    (requests, seconds), or (None, None) when there is no limit.
+    """
+    if not rate:
+        return None, None
+    requests, period = rate.split("/")
+    return int(requests), DURATIONS[period[0]]
+
+
+class MemoryStore:
+    """
+    Thread-safe in-process counter store.
+    """
+
+    # Expired counters are dropped every so many seconds
+    sweep_interval = 60
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.next_sweep = time.monotonic() + self.sweep_interval
+
+    def incr(self, key, ttl):
+        now = time.monotonic()
+        with self.lock:
+            if now >= self.next_sweep:
+                self.counters = {
+                    name: entry for name, entry in self.counters.items() if entry[1] > now
+                }
+                self.next_sweep = now + self.sweep_interval
+            count, expires = self.counters.get(key, (0, now + ttl))
+            if expires <= now:
+                count, expires = 0, now + ttl
+            self.counters[key] = (count + 1, expires)
+            return count + 1
+
+    def decr(self, key):
+        with self.lock:
+            entry = self.counters.get(key)
+            if entry is not None:
+                self.counters[key] = (entry[0] - 1, entry[1])
+
+    def get(self, key):
+        with self.lock:
+            entry = self.counters.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return 0
+        return entry[0]
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+
+
+class CacheStore:
+    """
+    Counter store in Django's cache, shared by all the workers.
+    """
+
+    def incr(self, key, ttl):
+        # add() only sets missing keys, so concurrent first hits are counted
+        cache.add(key, 0, timeout=ttl)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.add(key, 1, timeout=ttl)
+            return 1
+
+    def decr(self, key):
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass
+
+    def get(self, key):
+        return cache.get(key, 0)
+
+
+store = import_string(STORE)()
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Limit the requests of every client on the views of a `throttle_scope`.
+    """
+
+    rates = RATES
+
+    def __init__(self):
+        self.store = store
+        self.timer = time.time
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return f"throttle:{self.scope}:{ident}"
+
+    def get_account_cache_key(self, request, view):
+        """
+        Return the key of the account a request targets, or None.
+        """
+        field = getattr(view, "throttle_account_field", None)
+        value = request.data.get(field) if field else None
+        if not value or not isinstance(value, str):
+            return None
+        # Hashed, emails may hold characters cache keys cannot
+        ident = hashlib.sha256(value.strip().casefold().encode()).hexdigest()
+        return f"throttle:{self.scope}:account:{ident}"
+
+    def get_limits(self, request, view):
+        """
+        Return the (key, rate) of the counters a request is checked against.
+        """
+        limits = [(self.get_cache_key(request, view), self.rates.get(self.scope))]
+        account_rate = self.rates.get(f"{self.scope}_account")
+        if account_rate:
+            account_key = self.get_account_cache_key(request, view)
+            if account_key:
+                limits.append((account_key, account_rate))
+        return limits
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, "throttle_scope", None)
+        counted = []
+        for key, rate in self.get_limits(request, view):
+            self.num_requests, self.duration = parse_rate(rate)
+            if self.num_requests is None:
+                continue
+            current_key = self.hit(key)
+            if current_key is None:
+                # Rejected requests are not counted, clients get in again on time
+                for counted_key in counted:
+                    self.store.decr(counted_key)
+                return False
+            counted.append(current_key)
+        return True
+
+    def hit(self, key):
+        """
+        Count a request on the counters of `key`, and return the key of the
+        current window, or None when the request is over the rate.
+        """
+        now = self.timer()
+        window = int(now // self.duration)
+        self.elapsed = now - window * self.duration
+
+        current_key = f"{key}:{window}"
+        # Kept for two windows: it is the previous window of the next one
+        self.current = self.store.incr(current_key, 2 * self.duration)
+        self.previous = self.store.get(f"{key}:{window - 1}")
+
+        weight = 1 - self.elapsed / self.duration
+        if self.previous * weight + self.current <= self.num_requests:
+            return current_key
+        self.store.decr(current_key)
+        self.current -= 1
+        return None
+
+    def wait(self):
+        """
+        Return the number of seconds until the next request is allowed.
+        """
+        limit = self.num_requests - 1
+        if self.current <= limit and self.previous:
+            # Once enough of the previous window has slid out
+            wait = self.duration * (1 - (limit - self.current) / self.previous) - self.elapsed
+        else:
+            # In the next window, once enough of this one has slid out
+            wait = self.duration - self.elapsed
+            if self.current > limit:
+                wait += self.duration * (1 - limit / self.current)
+        return max(1, math.ceil(wait))
@@ -0,0 +1,219 @@
+"""
+Database-backed outbox for transactional emails.
+
+Emails are stored as `EmailOutbox` rows when they are queued and delivered
+later, in batches, over a single connection to the email backend. Failed
+deliveries are retried with an exponential backoff until
+`EMAIL_OUTBOX_MAX_ATTEMPTS` is reached.
+
+A batch is claimed in a short transaction, which marks its rows "sending"
+until a lease expires (`EMAIL_OUTBOX_LEASE` seconds). The emails are sent
+outside any transaction, so a slow email server holds no lock, and the
+outcomes are saved in a second transaction. Rows whose lease expired (the
+worker died or hung) are claimed again: delivery is at least once.
+
+Delivery runs either in the `send_queued_emails` management command or,
+when `EMAIL_OUTBOX_AUTOFLUSH` is enabled, in a small bounded thread pool
+of the web process that is woken up after each queued email.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from authentication.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 50)
+MAX_ATTEMPTS = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+RETRY_DELAY = getattr(settings, "EMAIL_OUTBOX_RETRY_DELAY", 60)
+AUTOFLUSH = getattr(settings, "EMAIL_OUTBOX_AUTOFLUSH", True)
+WORKERS = getattr(settings, "EMAIL_OUTBOX_WORKERS", 1)
+# Longer than a batch takes to send, see `EMAIL_TIMEOUT`
+LEASE = timedelta(seconds=getattr(settings, "EMAIL_OUTBOX_LEASE", 300))
+
+
+def queue_email(subject, body, to):
+    """
+    Store an email in the outbox and schedule its delivery once the
+    current transaction is committed.
+    """
+    email = EmailOutbox.objects.create(subject=subject, body=body, to=list(to))
+    if AUTOFLUSH:
+        transaction.on_commit(pool.schedule)
+    return email
+
+
+def get_retry_delay(attempts):
+    return timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim_batch(batch_size):
+    """
+    Claim the due emails (pending, or sending with an expired lease) and
+    return them with their lease, the time until which they are claimed.
+
+    The claim counts as an attempt, so emails whose delivery never
+    completes still give up after `MAX_ATTEMPTS`. Rows locked by another
+    worker are skipped where the database supports it, so several workers
+    never claim the same email.
+    """
+    now = timezone.now()
+    lease = now + LEASE
+    expired = EmailOutbox.objects.filter(status="sending", next_attempt_at__lte=now)
+    with transaction.atomic():
+        expired.filter(attempts__gte=MAX_ATTEMPTS).update(
+            status="failed", last_error="Delivery did not complete.")
+        queryset = EmailOutbox.objects.filter(
+            status__in=("pending", "sending"),
+            next_attempt_at__lte=now,
+        ).order_by("next_attempt_at", "id")
+        if connection.features.has_select_for_update:
+            queryset = queryset.select_for_update(
+                skip_locked=connection.features.has_select_for_update_skip_locked)
+        emails = list(queryset[:batch_size])
+        if emails:
+            EmailOutbox.objects.filter(pk__in=[email.pk for email in emails]).update(
+                status="sending", next_attempt_at=lease, attempts=F("attempts") + 1)
+    for email in emails:
+        email.status = "sending"
+        email.next_attempt_at = lease
+        email.attempts += 1
+    return emails, lease
+
+
+def deliver_batch(batch_size=BATCH_SIZE):
+    """
+    Deliver one batch of due emails over a single backend connection.
+
+    Returns the number of emails processed (sent or failed).
+    """
+    emails, lease = claim_batch(batch_size)
+    if not emails:
+        return 0
+
+    backend = get_connection()
+    try:
+        backend.open()
+    except Exception as error:
+        # Backend unreachable: a failed attempt for the whole batch
+        logger.warning("Cannot open the email backend: %r", error)
+        for email in emails:
+            record_attempt(email, error)
+    else:
+        try:
+            for email in emails:
+                deliver(backend, email)
+        finally:
+            backend.close()
+
+    save_attempts(emails, lease)
+    return len(emails)
+
+
+def deliver(backend, email):
+    """
+    Send one outbox email on an open backend connection and record the
+    outcome on the (unsaved) row.
+
+    Emails are handed to the connection one by one (the SMTP backend
+    sends a list one message at a time too) so each gets its own outcome.
+    """
+    message = EmailMessage(email.subject, email.body, to=email.to, connection=backend)
+    try:
+        backend.send_messages([message])
+    except Exception as error:
+        record_attempt(email, error)
+    else:
+        record_attempt(email)
+
+
+def record_attempt(email, error=None):
+    """
+    Record the outcome of a claimed attempt on the (unsaved) row: sent, or
+    failed with `error` and retried after a backoff until `MAX_ATTEMPTS`.
+    """
+    if error is None:
+        email.status = "sent"
+        email.sent_at = timezone.now()
+        email.last_error = ""
+        return
+    email.last_error = repr(error)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = "failed"
+        logger.error("Giving up on email %s after %s attempts: %r",
+                     email.pk, email.attempts, error)
+    else:
+        email.status = "pending"
+        email.next_attempt_at = timezone.now() + get_retry_delay(email.attempts)
+
+
+def save_attempts(emails, lease):
+    """
+    Save the outcomes of a batch, skipping the rows whose lease expired
+    and which another worker claimed since.
+    """
+    claimed = EmailOutbox.objects.filter(status="sending", next_attempt_at=lease)
+    with transaction.atomic():
+        sent = [email for email in emails if email.status == "sent"]
+        if sent:
+            claimed.filter(pk__in=[email.pk for email in sent]).update(
+                status="sent", sent_at=sent[-1].sent_at, last_error="")
+        for email in emails:
+            if email.status != "sent":
+                claimed.filter(pk=email.pk).update(
+                    status=email.status, next_attempt_at=email.next_attempt_at,
+                    last_error=email.last_error)
+
+
+def deliver_due(batch_size=BATCH_SIZE):
+    """
+    Deliver batches until no due email is left.
+
+    Returns the number of emails processed.
+    """
+    processed = 0
+    while True:
+        count = deliver_batch(batch_size)
+        if not count:
+            return processed
+        processed += count
+
+
+class OutboxPool:
+    """
+    Bounded pool of threads delivering the outbox in the web process.
+
+    At most one flush is waiting at any time: emails queued while a flush
+    is pending are picked up by it, so bursts never grow the queue.
+    """
+
+    def __init__(self, workers):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="email-outbox")
+        self.lock = threading.Lock()
+        self.pending = False
+
+    def schedule(self):
+        with self.lock:
+            if self.pending:
+                return
+            self.pending = True
+        self.executor.submit(self.flush)
+
+    def flush(self):
+        with self.lock:
+            self.pending = False
+        try:
+            deliver_due()
+        except Exception:
+            logger.exception("Email outbox delivery failed")
+        finally:
+            connection.close()
+
+
+pool = OutboxPool(WORKERS)
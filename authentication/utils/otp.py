@@ -0,0 +1,94 @@
+"""
+One-time passwords for account activation and password reset.
+
+OTPs are stored hashed (HMAC-SHA256 keyed with SECRET_KEY), expire after
+`OTP_TTL_SECONDS`, are consumed by a successful verification and are
+discarded after `OTP_MAX_ATTEMPTS` failed verifications.
+"""
+import hashlib
+import hmac
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from authentication.models import OneTimePassword
+
+OTP_LENGTH = 6
+OTP_TTL_SECONDS = getattr(settings, "OTP_TTL_SECONDS", 600)
+OTP_MAX_ATTEMPTS = getattr(settings, "OTP_MAX_ATTEMPTS", 5)
+
+
+def hash_otp(purpose, otp):
+    message = f"{purpose}:{otp}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def issue_otp(user, purpose):
+    """
+    Generate a new OTP for the user, replacing any previous one with the
+    same purpose, and return it in clear text.
+    """
+    otp = get_random_string(length=OTP_LENGTH, allowed_chars="0123456789")
+    OneTimePassword.objects.filter(user=user, purpose=purpose).delete()
+    OneTimePassword.objects.create(
+        user=user,
+        purpose=purpose,
+        otp_hash=hash_otp(purpose, otp),
+        expires_at=timezone.now() + timedelta(seconds=OTP_TTL_SECONDS),
+    )
+    return otp
+
+
+def verify_otp(purpose, otp, user=None):
+    """
+    Consume a valid OTP and return its user, or return None.
+
+    Without a user the OTP alone must identify it; when several users hold
+    the same code, verification fails and the client has to send the user
+    (email) along. Failed verifications for a known user count towards
+    `OTP_MAX_ATTEMPTS`.
+    """
+    otp_hash = hash_otp(purpose, otp)
+    candidates = OneTimePassword.objects.filter(
+        purpose=purpose,
+        otp_hash=otp_hash,
+        expires_at__gt=timezone.now(),
+        attempts__lt=OTP_MAX_ATTEMPTS,
+    ).select_related("user")
+    if user is not None:
+        candidates = candidates.filter(user=user)
+
+    matches = list(candidates[:2])
+    if len(matches) != 1:
+        if user is not None:
+            register_failed_attempt(user, purpose)
+        return None
+
+    entry = matches[0]
+    entry.delete()
+    return entry.user
+
+
+def register_failed_attempt(user, purpose):
+    OneTimePassword.objects.filter(user=user, purpose=purpose).update(
+        attempts=F("attempts") + 1)
+
+
+def purge_expired(batch_size=1000):
+    """
+    Delete expired and exhausted OTPs in batches.
+
+    Returns the number of deleted OTPs.
+    """
+    expired = OneTimePassword.objects.filter(
+        expires_at__lte=timezone.now()
+    ) | OneTimePassword.objects.filter(attempts__gte=OTP_MAX_ATTEMPTS)
+
+    deleted = 0
+    while True:
+        ids = list(expired.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        OneTimePassword.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
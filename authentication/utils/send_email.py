@@ -1,32 +1,21 @@
-import threading
-from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
+from authentication.utils.email_outbox import queue_email
 
 
 def send_activation_otp_email(user, otp):
     email_subject = f"Activation OTP for {user}"
     email_body = render_to_string("activation.txt", {"user": user, "otp": otp})
-    email = EmailMessage(email_subject, email_body, to=[user.email])
 
-    # Define a function to send email in a separate thread
-    def send_email_thread(email):
-        email.send()
-
-    # Start a new thread to send email
-    threading.Thread(target=send_email_thread, args=(email,)).start()
+    # Queue the email in the outbox, it is delivered in the background
+    queue_email(email_subject, email_body, to=[user.email])
 
 
 def send_forget_password_otp_email(user, otp):
     email_subject = f"Forget Password OTP for {user}"
     email_body = render_to_string("forget_pass.txt", {"user": user, "otp": otp})
-    email = EmailMessage(email_subject, email_body, to=[user.email])
-
-    # Define a function to send email in a separate thread
-    def send_email_thread(email):
-        email.send()
 
-    # Start a new thread to send email
-    threading.Thread(target=send_email_thread, args=(email,)).start()
+    # Queue the email in the outbox, it is delivered in the background
+    queue_email(email_subject, email_body, to=[user.email])
 
 
 def send_posted_comment_email(blog_post, content, commenter):
@@ -36,14 +25,6 @@ def send_posted_comment_email(blog_post, content, commenter):
         "post_title": blog_post,
         "content": content,
         "commenter": commenter})
-    email = EmailMessage(
-        email_subject,
-        email_body,
-        to=[blog_post.author.email])
-
-    # Define a function to send email in a separate thread
-    def send_email_thread(email):
-        email.send()
 
-    # Start a new thread to send email
-    threading.Thread(target=send_email_thread, args=(email,)).start()
+    # Queue the email in the outbox, it is delivered in the background
+    queue_email(email_subject, email_body, to=[blog_post.author.email])
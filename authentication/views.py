@@ -1,9 +1,11 @@
 import authentication.utils.send_email as emailsender
-from authentication.models import ActivationOTP, ForgetPasswordOtp
+from authentication.models import OneTimePassword
+from authentication.utils import otp as otp_store
 from authentication.serializers import UserSerializer
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
-from rest_framework.authentication import TokenAuthentication
+from authentication.backends import CachedTokenAuthentication
+from authentication.throttling import SlidingWindowThrottle
 from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.status import (
@@ -16,9 +18,24 @@ from rest_framework.status import (
 )
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import make_password
-from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.permissions import AllowAny
-from django.utils.crypto import get_random_string
+
+
+def verify_request_otp(request, purpose, otp):
+    """
+    Verify the OTP of a request and return its user, or None.
+
+    The optional `email` field narrows the lookup to that user, which also
+    counts failed attempts against its OTP.
+    """
+    email = request.data.get("email")
+    if not email:
+        return otp_store.verify_otp(purpose, otp)
+
+    user = User.objects.filter(email=email).first()
+    if user is None:
+        return None
+    return otp_store.verify_otp(purpose, otp, user=user)
 
 
 class RegistrationAPIView(APIView):
@@ -27,6 +44,8 @@ class RegistrationAPIView(APIView):
     """
 
     permission_classes = [AllowAny]
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = "register"
 
     def post(self, request):
         """
@@ -45,9 +64,8 @@ class RegistrationAPIView(APIView):
         if serializer.is_valid():
             user = serializer.save()
 
-            # Generate OTP and save to the database
-            otp = get_random_string(length=6, allowed_chars="0123456789")
-            ActivationOTP.objects.create(user=user, otp=otp)
+            # Generate OTP and save its hash to the database
+            otp = otp_store.issue_otp(user, OneTimePassword.ACTIVATION)
 
             # Send email with OTP to the user
             emailsender.send_activation_otp_email(user, otp)
@@ -70,12 +88,17 @@ class VerifyActivationOtpView(APIView):
     API View for verifying user OTP during account activation.
     """
 
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = "otp_verify"
+    throttle_account_field = "email"
+
     def post(self, request):
         """
         Verifies the OTP provided by the user for account activation.
 
         Parameters:
-        request (HttpRequest): The HTTP request object containing the OTP.
+        request (HttpRequest): The HTTP request object containing the OTP
+                and, optionally, the user's email.
 
         Returns:
         response (HttpResponse): A JSON response containing the status of
@@ -91,20 +114,16 @@ class VerifyActivationOtpView(APIView):
                 "data": None,
             }, status=HTTP_400_BAD_REQUEST)
 
-        # Fetch user by OTP
-        try:
-            user_activation_otp = ActivationOTP.objects.get(otp=otp)
-        except ObjectDoesNotExist:
-            # If no user activation entry with the provided OTP is found, return an error response
+        # Fetch user by OTP (and email, when provided)
+        user = verify_request_otp(request, OneTimePassword.ACTIVATION, otp)
+        if user is None:
+            # If no valid activation OTP is found, return an error response
             return Response({
                 "status": False,
                 "message": "OTP Verification failed",
                 "data": None,
             }, status=HTTP_401_UNAUTHORIZED)
 
-        # Get the user associated with the user activation entry
-        user = user_activation_otp.user
-
         # Update the user activation status to True
         user.is_active = True
         user.save()
@@ -119,6 +138,9 @@ class VerifyActivationOtpView(APIView):
 
 class SendOtpAcivationAPIView(APIView):
 
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = "otp_send"
+
     def post(self, request):
 
         email = request.data.get("email")
@@ -134,21 +156,12 @@ class SendOtpAcivationAPIView(APIView):
 
             user = users.first()
 
-            # Delete any existing activation otp entry
-            Activationotp = ActivationOTP.objects.filter(user=user)
-            if Activationotp:
-                Activationotp.delete()
-
-            # Generate random OTP
-            otp = get_random_string(length=6, allowed_chars="0123456789")
+            # Generate a random OTP, replacing any existing activation OTP
+            otp = otp_store.issue_otp(user, OneTimePassword.ACTIVATION)
 
             # Send email with OTP to the user
             emailsender.send_activation_otp_email(user, otp)
 
-            # Save OTP to activation entry
-            Activationotp = ActivationOTP(user=user, otp=otp)
-            Activationotp.save()
-
             return Response({
                 "status": True,
                 "message": "OTP sent successfully",
@@ -167,6 +180,10 @@ class EmailLoginAPIView(APIView):
     API View for user email-based login.
     """
 
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = "login"
+    throttle_account_field = "email"
+
     def post(self, request):
         """
         Authenticate a user and generate a new authentication token by
@@ -232,6 +249,9 @@ class SendForgetPasswordOtpAPIView(APIView):
     API View for user password reset.
     """
 
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = "otp_send"
+
     def post(self, request):
         """
         This code defines an API view for resetting user password.
@@ -255,21 +275,12 @@ class SendForgetPasswordOtpAPIView(APIView):
             user = users.first()
             if user.is_active:
 
-                # Delete any existing forget password entry
-                forget_password = ForgetPasswordOtp.objects.filter(user=user)
-                if forget_password:
-                    forget_password.delete()
-
-                # Generate random OTP
-                otp = get_random_string(length=6, allowed_chars="0123456789")
+                # Generate a random OTP, replacing any existing forget password OTP
+                otp = otp_store.issue_otp(user, OneTimePassword.FORGET_PASSWORD)
 
                 # Send email with OTP to the user
                 emailsender.send_forget_password_otp_email(user, otp)
 
-                # Save OTP to forget password entry
-                forget_password = ForgetPasswordOtp(user=user, otp=otp)
-                forget_password.save()
-
                 return Response({
                     "status": True,
                     "message": "OTP sent successfully",
@@ -294,12 +305,17 @@ class VerifyforgetPassOtpView(APIView):
     API View for verifying user OTP during password reset.
     """
 
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = "otp_verify"
+    throttle_account_field = "email"
+
     def post(self, request):
         """
         Verifies the OTP provided by the user for password reset.
 
         Parameters:
-        request (HttpRequest): The HTTP request object containing the OTP.
+        request (HttpRequest): The HTTP request object containing the OTP
+                and, optionally, the user's email.
 
         Returns:
         response (HttpResponse): A JSON response containing the status of
@@ -315,21 +331,16 @@ class VerifyforgetPassOtpView(APIView):
                 "data": None,
             }, status=HTTP_400_BAD_REQUEST)
 
-        # Fetch user by OTP
-        try:
-            # Get the forget password entry with the provided OTP
-            forget_password = ForgetPasswordOtp.objects.get(otp=otp)
-        except ForgetPasswordOtp.DoesNotExist:
-            # If no forget password entry with the provided OTP is found, return an error response
+        # Fetch user by OTP (and email, when provided)
+        user = verify_request_otp(request, OneTimePassword.FORGET_PASSWORD, otp)
+        if user is None:
+            # If no valid forget password OTP is found, return an error response
             raise NotFound({
                 "status": False,
                 "message": "OTP Verification failed",
                 "data": None,
             })
 
-        # Get the user associated with the forget password entry
-        user = forget_password.user
-
         # Delete the old auth token
         token = Token.objects.filter(user=user).first()
         if token:
@@ -351,7 +362,7 @@ class UpdatePasswordAPIView(APIView):
     API View for updating user password.
     """
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def post(self, request):
         """
@@ -0,0 +1,10 @@
+"""
+Benchmarks of the API endpoints.
+
+`run_benchmarks` generates synthetic data (`benchmarks.data`) in a
+throwaway database, sends every scenario (`benchmarks.scenarios`) through
+the test client and writes the results as JSON; `compare_benchmarks` lists
+the regressions between two result files. With `--url`, the read scenarios
+are replayed over HTTP against a running server instead
+(`benchmarks.load`), after `generate_benchmark_data` filled its database.
+"""
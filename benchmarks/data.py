@@ -0,0 +1,136 @@
+"""
+Synthetic data for the benchmarks.
+
+Users, categories, posts and comments are generated at any scale from the
+sample posts of `fixtures/blog_serializer.json`, with a seeded random
+generator so two runs at the same scale build the same data. Rows are
+inserted in bulk with explicit ids, which works on every backend (MySQL
+does not return the ids of bulk inserts), then the derived data the
+signals would normally maintain (search index, timelines, comment and
+category statistics) is built in bulk too.
+"""
+import json
+import random
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db.models import Max
+from rest_framework.authtoken.models import Token
+from authentication.models import SoftDeletedUser
+from blog.models import BlogPost, Category, Comment
+from blog.utils import category_stats, comment_stats, search_index, timelines
+
+FIXTURE = settings.BASE_DIR / "fixtures" / "blog_serializer.json"
+
+# Password of every generated user
+PASSWORD = "benchmark-password"
+
+USERNAME_PREFIX = "bench-user-"
+
+# Share of the generated posts that are published, the others are drafts
+PUBLISHED_RATIO = 0.9
+
+WORDS = (
+    "sleep health yoga productivity blogging travel cooking fitness music "
+    "reading writing design python django database cache search design "
+    "morning routine habits focus energy nature ocean mountain garden coffee"
+).split()
+
+
+def load_samples():
+    """
+    Return the title and content of the sample posts of the fixture.
+    """
+    with open(FIXTURE) as file:
+        entries = json.load(file)
+    return [
+        (entry["fields"]["title"], entry["fields"]["content"])
+        for entry in entries
+        if entry["model"].lower() == "blog.blogpost"
+    ]
+
+
+def get_next_id(model):
+    return (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+
+
+def generate(users=20, categories=10, posts=2000, comments=5, seed=0, batch_size=1000):
+    """
+    Generate the benchmark data and return the number of rows created per
+    model.
+
+    `comments` is the average number of comments per post.
+    """
+    rng = random.Random(seed)
+    samples = load_samples()
+
+    # Hashing is slow on purpose, every user shares the same hash
+    password = make_password(PASSWORD)
+    first_user = get_next_id(User)
+    user_rows = [
+        User(
+            pk=first_user + i,
+            username=f"{USERNAME_PREFIX}{first_user + i}",
+            email=f"{USERNAME_PREFIX}{first_user + i}@example.com",
+            password=password,
+            is_active=True,
+        )
+        for i in range(users)
+    ]
+    User.objects.bulk_create(user_rows, batch_size=batch_size)
+    SoftDeletedUser.objects.bulk_create(
+        [SoftDeletedUser(user=user) for user in user_rows], batch_size=batch_size)
+    Token.objects.bulk_create(
+        [Token(user=user, key=Token.generate_key()) for user in user_rows],
+        batch_size=batch_size)
+
+    first_category = get_next_id(Category)
+    category_rows = [
+        Category(pk=first_category + i, name=f"{rng.choice(WORDS).title()} {first_category + i}")
+        for i in range(categories)
+    ]
+    Category.objects.bulk_create(category_rows, batch_size=batch_size)
+
+    next_post = get_next_id(BlogPost)
+    post_count = 0
+    comment_count = 0
+    for start in range(0, posts, batch_size):
+        post_rows = []
+        for i in range(start, min(start + batch_size, posts)):
+            title, content = rng.choice(samples)
+            post_rows.append(BlogPost(
+                pk=next_post + i,
+                author=rng.choice(user_rows),
+                title=f"{title} #{next_post + i}",
+                content=" ".join([content] + rng.choices(WORDS, k=40)),
+                category=rng.choice(category_rows),
+                status="published" if rng.random() < PUBLISHED_RATIO else "draft",
+                deleted_at=False,
+            ))
+        BlogPost.objects.bulk_create(post_rows)
+        search_index.index_posts(post_rows)
+        timelines.record(
+            (blog_post, None, blog_post.get_counted_category_id()) for blog_post in post_rows)
+        post_count += len(post_rows)
+
+        comment_rows = [
+            Comment(
+                author=f"reader {rng.randrange(1000)}",
+                email="reader@example.com",
+                content=" ".join(rng.choices(WORDS, k=12)),
+                blog_post=post,
+            )
+            for post in post_rows
+            for _ in range(rng.randint(0, 2 * comments))
+        ]
+        Comment.objects.bulk_create(comment_rows, batch_size=batch_size)
+        comment_count += len(comment_rows)
+
+    comment_stats.repair(batch_size=batch_size)
+    category_stats.repair()
+    return {
+        "users": users,
+        "categories": categories,
+        "posts": post_count,
+        "comments": comment_count,
+    }
@@ -0,0 +1,72 @@
+"""
+HTTP load against a running server.
+
+Used to compare deployments (gunicorn and uvicorn workers, sync and async
+views): the read scenarios are replayed over HTTP by `concurrency` threads,
+each with its own keep-alive session, for `requests` requests per
+scenario. The server must run on a database holding the benchmark data,
+which is read here to build the requests.
+"""
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests as http
+from benchmarks.runner import summarize
+from benchmarks.scenarios import SCENARIOS, Dataset
+
+
+def build_url(base_url, request):
+    url = base_url.rstrip("/") + request["path"]
+    return url, request.get("data")
+
+
+def run_scenario(base_url, scenario, dataset, requests=500, concurrency=8, timeout=30):
+    """
+    Send `requests` requests of a scenario with `concurrency` clients and
+    return the results.
+    """
+    local = threading.local()
+
+    def send(i):
+        if not hasattr(local, "session"):
+            local.session = http.Session()
+        url, params = build_url(base_url, scenario.build(dataset, i))
+        start = time.perf_counter()
+        try:
+            response = local.session.get(url, params=params, timeout=timeout)
+            status = response.status_code
+        except http.RequestException:
+            status = None
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(send, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    statuses = Counter(status for _, status in samples)
+    return {
+        "endpoint": scenario.url_name,
+        "method": "GET",
+        **summarize([duration for duration, _ in samples]),
+        # Requests completed per second by all the clients together
+        "throughput_rps": round(requests / elapsed, 1),
+        "concurrency": concurrency,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "errors": sum(count for status, count in statuses.items() if status != scenario.expected),
+    }
+
+
+def run(base_url, names=None, requests=500, concurrency=8):
+    """
+    Load the read endpoints of a running server and return
+    {scenario name: results}.
+    """
+    dataset = Dataset()
+    return {
+        scenario.name: run_scenario(
+            base_url, scenario, dataset, requests=requests, concurrency=concurrency)
+        for scenario in SCENARIOS
+        if scenario.http and (not names or scenario.name in names)
+    }
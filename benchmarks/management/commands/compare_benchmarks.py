@@ -0,0 +1,36 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from benchmarks import runner
+
+
+class Command(BaseCommand):
+    help = "Compare two run_benchmarks result files and fail on regressions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("baseline", help="Results of the reference run.")
+        parser.add_argument("current", help="Results of the run to check.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Allowed slowdown, as a fraction (0.2 = 20%%).",
+        )
+        parser.add_argument(
+            "--metric",
+            default="p50_ms",
+            help="Latency statistic compared (mean_ms, p50_ms, p90_ms, p99_ms).",
+        )
+
+    def handle(self, *args, **options):
+        with open(options["baseline"]) as file:
+            baseline = json.load(file)
+        with open(options["current"]) as file:
+            current = json.load(file)
+
+        regressions = runner.compare(
+            baseline, current, threshold=options["threshold"], metric=options["metric"])
+        for name, description in regressions:
+            self.stdout.write(f"{name}: {description}")
+        if regressions:
+            raise CommandError(f"{len(regressions)} regressions found.")
+        self.stdout.write(self.style.SUCCESS("No regressions found."))
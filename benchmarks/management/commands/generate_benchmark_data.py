@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from benchmarks import data
+
+
+def add_scale_arguments(parser):
+    parser.add_argument("--users", type=int, default=20, help="Number of users.")
+    parser.add_argument("--categories", type=int, default=10, help="Number of categories.")
+    parser.add_argument("--posts", type=int, default=2000, help="Number of blog posts.")
+    parser.add_argument(
+        "--comments", type=int, default=5, help="Average number of comments per post.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random data.")
+
+
+def get_scale(options):
+    return {
+        name: options[name]
+        for name in ("users", "categories", "posts", "comments", "seed")
+    }
+
+
+class Command(BaseCommand):
+    help = "Fill the database with synthetic users, categories, blog posts and comments."
+
+    def add_arguments(self, parser):
+        add_scale_arguments(parser)
+
+    def handle(self, *args, **options):
+        counts = data.generate(**get_scale(options))
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Generated {summary}."))
@@ -0,0 +1,100 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+from benchmarks import data, load, micro, runner
+from benchmarks.management.commands.generate_benchmark_data import (
+    add_scale_arguments,
+    get_scale,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API endpoint on generated data in a throwaway database, "
+        "or the read endpoints of a running server with --url, and write the "
+        "results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        add_scale_arguments(parser)
+        parser.add_argument(
+            "--iterations", type=int, default=50, help="Timed requests per scenario.")
+        parser.add_argument(
+            "--warmup", type=int, default=5, help="Untimed requests run first per scenario.")
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            help="Run only this scenario (repeatable).",
+        )
+        parser.add_argument(
+            "--no-micro", action="store_true", help="Skip the component benchmarks.")
+        parser.add_argument(
+            "--label", default="", help="Name of the run, e.g. the server setup.")
+        parser.add_argument(
+            "--output", help="File the JSON results are written to (default: stdout).")
+        parser.add_argument(
+            "--url",
+            help="Load a running server at this base URL instead, which must use "
+                 "a database filled by generate_benchmark_data.",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=500, help="Requests per scenario with --url.")
+        parser.add_argument(
+            "--concurrency", type=int, default=8, help="Concurrent clients with --url.")
+
+    def handle(self, *args, **options):
+        try:
+            runner.get_scenarios(options["scenarios"])
+        except ValueError as error:
+            raise CommandError(error)
+
+        if options["url"]:
+            results = self.run_http(options)
+        else:
+            results = self.run_in_process(options)
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+        else:
+            self.stdout.write(output)
+
+    def run_http(self, options):
+        metadata = runner.get_metadata(
+            label=options["label"], mode="http", url=options["url"],
+            concurrency=options["concurrency"])
+        return {
+            "meta": metadata,
+            "http": load.run(
+                options["url"], options["scenarios"],
+                requests=options["requests"], concurrency=options["concurrency"]),
+        }
+
+    def run_in_process(self, options):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with runner.benchmark_environment():
+                self.stderr.write("Generating the benchmark data...")
+                counts = data.generate(**get_scale(options))
+                metadata = runner.get_metadata(
+                    label=options["label"], mode="in-process", data=counts,
+                    iterations=options["iterations"], warmup=options["warmup"])
+                self.stderr.write("Running the scenarios...")
+                results = {
+                    "meta": metadata,
+                    "scenarios": runner.run(
+                        options["scenarios"], iterations=options["iterations"],
+                        warmup=options["warmup"]),
+                }
+                if not options["scenarios"] or "bulk" in options["scenarios"]:
+                    self.stderr.write("Comparing bulk and single writes...")
+                    results["throughput"] = {"bulk_vs_single": runner.run_bulk_throughput()}
+                if not options["no_micro"]:
+                    self.stderr.write("Running the component benchmarks...")
+                    results["micro"] = micro.run()
+        finally:
+            teardown_databases(old_config, verbosity=0)
+        return results
@@ -0,0 +1,255 @@
+"""
+Benchmarks of single components, below the request level.
+
+They measure what the request benchmarks cannot isolate: the per-request
+overhead of the rate limiter and of the token cache, the cost of the DRF
+and fast read serializers by page size, the JSON encoding of a feed page,
+category pages read from the timelines and from the posts table, the
+search index against the former ORM search filter, and the throughput of
+the image pipeline.
+"""
+import io
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, zip_longest
+from django.db.models import Q
+from PIL import Image
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from authentication import throttling
+from authentication.backends import CachedTokenAuthentication
+from blog.models import BlogPost, Category, CategoryStats, TimelineEntry
+from blog.serializers import BlogFeedSerializer
+from blog.utils import fast_serializers, get_blog_queryset, images, search_index, timelines
+from benchmarks.runner import percentile
+from configuration.renderers import FastJSONRenderer
+
+# Page sizes of the serializer benchmarks
+SERIALIZER_ROWS = (10, 100, 1000)
+
+# Posts of the feed page encoded by the renderer benchmarks
+RENDERER_ROWS = 100
+
+# Page size and deepest offset of the timeline benchmarks
+TIMELINE_ROWS = 10
+TIMELINE_DEEP_OFFSET = 1000
+
+# Post titles and category names searched by the search benchmarks
+SEARCH_QUERIES = 50
+
+
+def summarize_calls(durations):
+    """
+    Return the statistics of per-call durations in seconds, in microseconds.
+    """
+    durations = sorted(durations)
+    return {
+        "iterations": len(durations),
+        "mean_us": round(sum(durations) / len(durations) * 1e6, 3),
+        "p50_us": round(percentile(durations, 0.5) * 1e6, 3),
+        "p99_us": round(percentile(durations, 0.99) * 1e6, 3),
+    }
+
+
+def time_calls(func, iterations):
+    durations = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        durations.append(time.perf_counter() - start)
+    return summarize_calls(durations)
+
+
+class FakeRequest:
+    user = None
+
+    def __init__(self, ip):
+        self.META = {"REMOTE_ADDR": ip}
+
+
+def bench_throttle(store, iterations):
+    throttle = throttling.SlidingWindowThrottle()
+    throttle.store = store
+    throttle.rates = {"benchmark": "1000000000/min"}
+    view = type("View", (), {"throttle_scope": "benchmark"})()
+    requests = [FakeRequest(f"10.0.{n // 256}.{n % 256}") for n in range(1000)]
+    return time_calls(
+        lambda i: throttle.allow_request(requests[i % len(requests)], view), iterations)
+
+
+def bench_token_auth(iterations):
+    keys = list(Token.objects.values_list("key", flat=True)[:100])
+    cached = CachedTokenAuthentication()
+    uncached = TokenAuthentication()
+    for key in keys:
+        cached.authenticate_credentials(key)
+    return {
+        "token_auth_cached": time_calls(
+            lambda i: cached.authenticate_credentials(keys[i % len(keys)]), iterations),
+        "token_auth_database": time_calls(
+            lambda i: uncached.authenticate_credentials(keys[i % len(keys)]), iterations),
+    }
+
+
+def bench_serializers(repeats):
+    """
+    Load and render pages of posts with their latest comments, with the DRF
+    serializers and with the fast serializers.
+    """
+    renderer = JSONRenderer()
+
+    def drf(rows):
+        blog_posts = get_blog_queryset.attach_latest_comments(
+            get_blog_queryset.get_published_posts()[:rows])
+        return renderer.render(BlogFeedSerializer(blog_posts, many=True).data)
+
+    def fast(rows):
+        page = list(get_blog_queryset.get_published_post_rows()[:rows])
+        comments = get_blog_queryset.get_latest_comment_values([row["id"] for row in page])
+        return renderer.render(fast_serializers.serialize_posts(page, comments))
+
+    results = {}
+    for rows in SERIALIZER_ROWS:
+        results[f"serializer_drf_{rows}"] = time_calls(lambda i: drf(rows), repeats)
+        results[f"serializer_fast_{rows}"] = time_calls(lambda i: fast(rows), repeats)
+    return results
+
+
+def bench_renderers(iterations):
+    """
+    Encode a feed page (posts with their latest comments) with DRF's
+    `JSONRenderer` and with `FastJSONRenderer`.
+    """
+    page = list(get_blog_queryset.get_published_post_rows()[:RENDERER_ROWS])
+    comments = get_blog_queryset.get_latest_comment_values([row["id"] for row in page])
+    data = {
+        "status": True,
+        "message": "All Published Posts Are Listed Below",
+        "data": fast_serializers.serialize_posts(page, comments),
+    }
+    drf, fast = JSONRenderer(), FastJSONRenderer()
+    return {
+        "renderer_drf": time_calls(lambda i: drf.render(data), iterations),
+        "renderer_fast": time_calls(lambda i: fast.render(data), iterations),
+    }
+
+
+def bench_timelines(iterations):
+    """
+    Read the first and a deep page of the posts of the largest category
+    from its timeline (id slice, then the posts by id) and with a query
+    filtering the posts table.
+    """
+    stats = CategoryStats.objects.order_by("-published_count").first()
+    if stats is None:
+        return {}
+    category_id = stats.category_id
+    deep_offset = max(0, min(TIMELINE_DEEP_OFFSET, stats.published_count - TIMELINE_ROWS))
+
+    def timeline(offset):
+        ids = list(
+            timelines.get_timeline(TimelineEntry.CATEGORY, category_id)
+            .values_list("blog_post_id", flat=True)[offset:offset + TIMELINE_ROWS])
+        return get_blog_queryset.get_published_post_rows_by_ids(ids)
+
+    def query(offset):
+        return list(
+            get_blog_queryset.get_published_post_rows().filter(category_id=category_id)
+            .order_by("-created_on", "-id")[offset:offset + TIMELINE_ROWS])
+
+    return {
+        "timeline_first_page": time_calls(lambda i: timeline(0), iterations),
+        "timeline_deep_page": time_calls(lambda i: timeline(deep_offset), iterations),
+        "category_query_first_page": time_calls(lambda i: query(0), iterations),
+        "category_query_deep_page": time_calls(lambda i: query(deep_offset), iterations),
+    }
+
+
+def bench_search(iterations):
+    """
+    Search post titles and category names with the filter the search
+    endpoint used before the index (exact title or category name) and with
+    `search_index.search`, on the same posts.
+    """
+    published = BlogPost.objects.filter(status="published", deleted_at=False)
+    titles = published.order_by("pk").values_list("title", flat=True)[:SEARCH_QUERIES]
+    names = Category.objects.order_by("pk").values_list("name", flat=True)[:SEARCH_QUERIES]
+    queries = [query for query in chain(*zip_longest(titles, names)) if query]
+    if not queries:
+        return {}
+
+    def orm_filter(query):
+        return list(published.filter(
+            Q(title__exact=query) | Q(category__name__exact=query)
+        ).values_list("pk", flat=True))
+
+    results = {}
+    for name, search in (("search_orm_filter", orm_filter), ("search_index", search_index.search)):
+        matches = [len(search(query)) for query in queries]
+        results[name] = {
+            **time_calls(lambda i: search(queries[i % len(queries)]), iterations),
+            "mean_results": round(sum(matches) / len(matches), 2),
+        }
+    return results
+
+
+def make_photo(width, height, seed):
+    """
+    Return a JPEG of noisy gradients, which compresses like a photo.
+    """
+    rng = random.Random(seed)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.effect_noise((width, height), rng.randint(20, 60)).convert("RGB")
+    output = io.BytesIO()
+    Image.blend(image, noise, 0.5).save(output, "JPEG", quality=90)
+    return output.getvalue()
+
+
+def bench_images(count, workers):
+    """
+    Generate the variants of `count` photos one by one, then with a pool of
+    `workers` threads, and return the throughput of both.
+    """
+    photos = [make_photo(1600, 1200, seed) for seed in range(count)]
+
+    def process(photo):
+        images.generate_variants(io.BytesIO(photo))
+
+    results = {}
+    start = time.perf_counter()
+    durations = []
+    for photo in photos:
+        photo_start = time.perf_counter()
+        process(photo)
+        durations.append(time.perf_counter() - photo_start)
+    results["images_sequential"] = {
+        **summarize_calls(durations),
+        "images_per_second": round(count / (time.perf_counter() - start), 2),
+    }
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(process, photos))
+    results["images_parallel"] = {
+        "workers": workers,
+        "images_per_second": round(count / (time.perf_counter() - start), 2),
+    }
+    return results
+
+
+def run(iterations=10000, serializer_repeats=20, image_count=8, image_workers=images.WORKERS):
+    """
+    Run the component benchmarks and return {name: results}.
+    """
+    return {
+        "throttle_memory_store": bench_throttle(throttling.MemoryStore(), iterations),
+        "throttle_cache_store": bench_throttle(throttling.CacheStore(), iterations),
+        **bench_token_auth(iterations),
+        **bench_serializers(serializer_repeats),
+        **bench_renderers(serializer_repeats * 10),
+        **bench_timelines(serializer_repeats * 10),
+        **bench_search(serializer_repeats * 10),
+        **bench_images(image_count, image_workers),
+    }
@@ -0,0 +1,240 @@
+"""
+In-process benchmark runner.
+
+Every scenario is sent through Django's test client, so the timings cover
+the whole request handling (middleware, view, database, rendering) without
+the network and server in the way, and are repeatable from one run to the
+next. Each scenario runs `warmup` untimed iterations, then `iterations`
+timed ones; the results hold latency percentiles, throughput, database
+queries per request and the status codes.
+
+Results are plain JSON-serializable dicts, see `compare` to find the
+regressions between two runs.
+"""
+import gc
+import platform
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from unittest import mock
+import django
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from authentication.throttling import SlidingWindowThrottle
+from authentication.utils import email_outbox
+from benchmarks import scenarios
+from benchmarks.scenarios import SCENARIOS, Dataset
+
+
+def percentile(sorted_values, fraction):
+    """
+    Return the nearest-rank percentile of sorted values.
+    """
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(durations):
+    """
+    Return the latency statistics of durations in seconds, in milliseconds.
+    """
+    durations = sorted(durations)
+    total = sum(durations)
+    return {
+        "iterations": len(durations),
+        "mean_ms": round(total / len(durations) * 1000, 3),
+        "min_ms": round(durations[0] * 1000, 3),
+        "p50_ms": round(percentile(durations, 0.5) * 1000, 3),
+        "p90_ms": round(percentile(durations, 0.9) * 1000, 3),
+        "p99_ms": round(percentile(durations, 0.99) * 1000, 3),
+        "max_ms": round(durations[-1] * 1000, 3),
+        "throughput_rps": round(len(durations) / total, 1) if total else None,
+    }
+
+
+@contextmanager
+def benchmark_environment():
+    """
+    Run the scenarios without rate limits, email deliveries (emails stay
+    in the outbox) or writes to the media directory.
+    """
+    with ExitStack() as stack:
+        media_root = stack.enter_context(tempfile.TemporaryDirectory())
+        stack.enter_context(override_settings(MEDIA_ROOT=media_root))
+        stack.enter_context(mock.patch.object(SlidingWindowThrottle, "rates", {}))
+        stack.enter_context(mock.patch.object(email_outbox, "AUTOFLUSH", False))
+        yield
+
+
+def send(client, scenario, request):
+    request = dict(request)
+    response = getattr(client, scenario.method)(request.pop("path"), **request)
+    if response.streaming:
+        # Streamed responses are produced while they are read
+        b"".join(response.streaming_content)
+    return response
+
+
+def run_scenario(client, scenario, dataset, iterations=50, warmup=5):
+    """
+    Benchmark one scenario and return its results.
+    """
+    durations = []
+    queries = []
+    statuses = Counter()
+
+    def count_query(execute, sql, params, many, context):
+        queries[-1] += 1
+        return execute(sql, params, many, context)
+
+    gc.collect()
+    for i in range(warmup + iterations):
+        request = scenario.build(dataset, i)
+        queries.append(0)
+        with connection.execute_wrapper(count_query):
+            start = time.perf_counter()
+            response = send(client, scenario, request)
+            duration = time.perf_counter() - start
+        if i < warmup:
+            queries.pop()
+            continue
+        durations.append(duration)
+        statuses[response.status_code] += 1
+
+    return {
+        "endpoint": scenario.url_name,
+        "method": scenario.method.upper(),
+        **summarize(durations),
+        "queries": round(sum(queries) / len(queries), 2),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "errors": sum(count for status, count in statuses.items() if status != scenario.expected),
+    }
+
+
+def get_scenarios(names=None):
+    if not names:
+        return SCENARIOS
+    unknown = set(names) - {scenario.name for scenario in SCENARIOS}
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}.")
+    return [scenario for scenario in SCENARIOS if scenario.name in names]
+
+
+def run(names=None, iterations=50, warmup=5):
+    """
+    Benchmark the scenarios on the current database, which must hold the
+    benchmark data, and return {scenario name: results}. Meant to run in
+    `benchmark_environment()`.
+    """
+    results = {}
+    dataset = Dataset()
+    client = Client()
+    for scenario in get_scenarios(names):
+        results[scenario.name] = run_scenario(
+            client, scenario, dataset, iterations=iterations, warmup=warmup)
+    return results
+
+
+def run_bulk_throughput(repeats=3):
+    """
+    Send `BULK_OPERATIONS` post creates and updates (half each) in one bulk
+    request, then as many single requests, `repeats` times, and return
+    the operations per second of both. Meant to run in
+    `benchmark_environment()`.
+    """
+    dataset = Dataset()
+    client = Client()
+    count = scenarios.BULK_OPERATIONS // 2
+    bulk = next(scenario for scenario in SCENARIOS if scenario.name == "bulk")
+    singles = [
+        scenario for scenario in SCENARIOS if scenario.name in ("post_create", "post_update")
+    ]
+
+    durations = {"bulk": 0.0, "single": 0.0}
+    errors = 0
+    gc.collect()
+    for repeat in range(repeats):
+        request = bulk.build(dataset, repeat)
+        start = time.perf_counter()
+        response = send(client, bulk, request)
+        durations["bulk"] += time.perf_counter() - start
+        errors += response.status_code != bulk.expected
+
+        for scenario in singles:
+            for n in range(count):
+                request = scenario.build(dataset, repeat * count + n)
+                start = time.perf_counter()
+                response = send(client, scenario, request)
+                durations["single"] += time.perf_counter() - start
+                errors += response.status_code != scenario.expected
+
+    operations = scenarios.BULK_OPERATIONS * repeats
+    results = {
+        "operations": operations,
+        **{
+            f"{name}_ops_per_second": round(operations / duration, 1)
+            for name, duration in durations.items()
+        },
+        "errors": errors,
+    }
+    results["speedup"] = round(results["bulk_ops_per_second"] / results["single_ops_per_second"], 2)
+    return results
+
+
+def get_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_metadata(**extra):
+    """
+    Describe the run, so results of different runs can be told apart.
+    """
+    return {
+        "started_at": timezone.now().isoformat(),
+        "revision": get_revision(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "machine": platform.machine(),
+        **extra,
+    }
+
+
+def compare(baseline, current, threshold=0.2, metric="p50_ms"):
+    """
+    Compare two runs and return their regressions.
+
+    A scenario regresses when its `metric` grew by more than `threshold`
+    (a fraction), when it runs more queries per request, or when it gets
+    unexpected status codes. Returns a list of (scenario, description).
+    """
+    regressions = []
+    for section in ("scenarios", "http", "micro"):
+        before_section = baseline.get(section) or {}
+        for name, after in (current.get(section) or {}).items():
+            before = before_section.get(name)
+            if before is None:
+                continue
+            label = f"{section}.{name}"
+            key = metric if metric in after else "p50_us" if "p50_us" in after else None
+            if key and before.get(key) and after[key] > before[key] * (1 + threshold):
+                change = after[key] / before[key] - 1
+                regressions.append(
+                    (label, f"{key} {before[key]} -> {after[key]} (+{change:.0%})"))
+            if after.get("queries", 0) > before.get("queries", 0):
+                regressions.append(
+                    (label, f"queries {before['queries']} -> {after['queries']}"))
+            if after.get("errors", 0) > before.get("errors", 0):
+                regressions.append(
+                    (label, f"errors {before['errors']} -> {after['errors']}"))
+    return regressions
@@ -0,0 +1,374 @@
+"""
+Benchmark scenarios, one or more per API endpoint.
+
+A scenario builds the request of every iteration from the `Dataset`. The
+building is not timed: scenarios that consume or change state (OTPs,
+tokens, soft deletes) set it up again there, so every iteration times the
+same work.
+"""
+import base64
+import json
+import uuid
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from authentication.models import OneTimePassword, SoftDeletedUser
+from authentication.utils import otp as otp_store
+from benchmarks.data import PASSWORD, USERNAME_PREFIX
+from blog.models import BlogPost, Category
+from blog.pagination import BlogPostCursorPagination
+
+SEARCH_TERMS = ("sleep", "yoga productivity", "design", "coff")
+
+# Number of operations of a bulk request
+BULK_OPERATIONS = 100
+
+
+class Dataset:
+    """
+    Ids and credentials of the generated data used by the scenarios.
+
+    The first users are kept for the scenarios changing their account
+    (password, token, soft delete), the other ones read and write posts.
+    """
+
+    def __init__(self):
+        self.run = uuid.uuid4().hex[:8]
+        users = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).order_by("pk")[:4]
+        )
+        if len(users) < 4:
+            raise ValueError("Generate the benchmark data first, with at least 4 users.")
+        self.account_user, self.login_user, self.profile_user, self.author = users
+        self.token = Token.objects.get(user=self.author).key
+
+        published = BlogPost.objects.filter(status="published", deleted_at=False)
+        # The posts of the author are updated and deleted by the scenarios
+        self.post_ids = list(
+            published.exclude(author=self.author).order_by("pk").values_list("pk", flat=True)[:1000])
+        self.own_post_ids = list(
+            published.filter(author=self.author).order_by("pk").values_list("pk", flat=True)[:100])
+        if not self.post_ids or not self.own_post_ids:
+            raise ValueError("Generate more benchmark posts.")
+        self.published_count = published.count()
+
+        self.author_ids = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX)
+            .order_by("pk").values_list("pk", flat=True)[:100])
+        self.categories = list(
+            Category.objects.filter(stats__published_count__gt=0)
+            .order_by("pk").values_list("pk", "name")[:100])
+
+        # Position of a post near the end of the feed
+        last = published.order_by("created_on", "id").values_list("created_on", "id")[
+            min(10, self.published_count - 1)]
+        self.deep_cursor = BlogPostCursorPagination().encode_cursor(last)
+
+    def get_post_id(self, i):
+        return self.post_ids[i % len(self.post_ids)]
+
+    def get_author_id(self, i):
+        return self.author_ids[i % len(self.author_ids)]
+
+    def get_category(self, i):
+        return self.categories[i % len(self.categories)]
+
+    def get_own_post_id(self, i):
+        return self.own_post_ids[i % len(self.own_post_ids)]
+
+    def get_token(self, user):
+        """
+        Return a valid token of the user, logging it in again when a
+        previous iteration deleted or rotated it.
+        """
+        return Token.objects.get_or_create(user=user)[0].key
+
+
+class Scenario:
+    """
+    A request to benchmark on the endpoint `url_name`.
+
+    `build(dataset, i)` returns the keyword arguments of the test client
+    request of iteration `i`: "path" and optionally "data",
+    "content_type" and headers.
+    """
+
+    def __init__(self, name, url_name, method, build, expected=200, http=False):
+        self.name = name
+        self.url_name = url_name
+        self.method = method
+        self.build = build
+        self.expected = expected
+        # Safe to replay against a live server
+        self.http = http
+
+
+def auth(token):
+    return {"HTTP_AUTHORIZATION": f"Token {token}"}
+
+
+def basic_auth(user, password):
+    credentials = base64.b64encode(f"{user.username}:{password}".encode()).decode()
+    return {"HTTP_AUTHORIZATION": f"Basic {credentials}"}
+
+
+def feed(dataset, i, **params):
+    page = i % dataset.published_count + 1
+    return {"path": reverse("blogapiset1"), "data": {"page": page, **params}}
+
+
+def feed_cold(dataset, i):
+    cache.clear()
+    return feed(dataset, i)
+
+
+def feed_cursor_deep(dataset, i):
+    # Uncached, to time the page query
+    cache.clear()
+    return {
+        "path": reverse("blogapiset1"),
+        "data": {"pagination": "cursor", "cursor": dataset.deep_cursor},
+    }
+
+
+def feed_offset_deep(dataset, i):
+    cache.clear()
+    return {"path": reverse("blogapiset1"), "data": {"page": dataset.published_count - 10}}
+
+
+def author_timeline(dataset, i):
+    return {
+        "path": reverse("authortimeline", args=[dataset.get_author_id(i)]),
+        "data": {"pagination": "cursor"},
+    }
+
+
+def category_timeline(dataset, i):
+    return {
+        "path": reverse("categorytimeline", args=[dataset.get_category(i)[0]]),
+        "data": {"pagination": "cursor"},
+    }
+
+
+def category_timeline_cold(dataset, i):
+    cache.clear()
+    return category_timeline(dataset, i)
+
+
+def category_search_cold(dataset, i):
+    # The same listing through the search endpoint's category match
+    cache.clear()
+    return {
+        "path": reverse("searchblogs"),
+        "data": {"search": dataset.get_category(i)[1], "pagination": "cursor"},
+    }
+
+
+def post_create(dataset, i):
+    return {
+        "path": reverse("blogapiset1"),
+        "data": {
+            "title": f"Benchmark post {dataset.run} {i}",
+            "content": "Benchmark content",
+            "category": "Benchmarks",
+            "status": "published",
+        },
+        **auth(dataset.token),
+    }
+
+
+def post_detail(dataset, i):
+    return {"path": reverse("blogapiset2", args=[dataset.get_post_id(i)])}
+
+
+def post_update(dataset, i):
+    return {
+        "path": reverse("blogapiset2", args=[dataset.get_own_post_id(i)]),
+        "data": json.dumps({"content": f"Updated content {i}"}),
+        "content_type": "application/json",
+        **auth(dataset.token),
+    }
+
+
+def post_delete(dataset, i):
+    post_id = dataset.get_own_post_id(i)
+    BlogPost.objects.filter(pk=post_id).update(deleted_at=False)
+    return {"path": reverse("blogapiset2", args=[post_id]), **auth(dataset.token)}
+
+
+def comment_create(dataset, i):
+    return {
+        "path": reverse("blogapiset2", args=[dataset.get_post_id(i)]),
+        "data": {"comment": f"Benchmark comment {i}"},
+        **auth(dataset.token),
+    }
+
+
+def comment_list(dataset, i):
+    return {"path": reverse("blogcomments", args=[dataset.get_post_id(i)])}
+
+
+def categories(dataset, i):
+    return {"path": reverse("blogcategories")}
+
+
+def categories_cold(dataset, i):
+    cache.clear()
+    return categories(dataset, i)
+
+
+def bulk(dataset, i):
+    operations = [
+        {
+            "op": "create",
+            "title": f"Bulk post {dataset.run} {i} {n}",
+            "content": "Bulk content",
+            "category": "Benchmarks",
+            "status": "published",
+        }
+        for n in range(BULK_OPERATIONS // 2)
+    ] + [
+        {"op": "update", "id": post_id, "content": f"Bulk update {i}"}
+        for post_id in dataset.own_post_ids[:BULK_OPERATIONS // 2]
+    ]
+    return {
+        "path": reverse("blogapibulk"),
+        "data": json.dumps(operations),
+        "content_type": "application/json",
+        **auth(dataset.token),
+    }
+
+
+def export(dataset, i):
+    return {"path": reverse("blogexport")}
+
+
+def search(dataset, i, url_name="searchblogs"):
+    term = SEARCH_TERMS[i % len(SEARCH_TERMS)]
+    return {"path": reverse(url_name), "data": {"search": term}}
+
+
+def search_cold(dataset, i):
+    cache.clear()
+    return search(dataset, i)
+
+
+def register(dataset, i):
+    username = f"bench-new-{dataset.run}-{i}"
+    return {
+        "path": reverse("register"),
+        "data": {"username": username, "email": f"{username}@example.com", "password": PASSWORD},
+    }
+
+
+def send_activation_otp(dataset, i):
+    return {"path": reverse("sendotp-activation"), "data": {"email": dataset.account_user.email}}
+
+
+def verify_activation_otp(dataset, i):
+    otp = otp_store.issue_otp(dataset.account_user, OneTimePassword.ACTIVATION)
+    return {
+        "path": reverse("verify-activationotp"),
+        "data": {"otp": otp, "email": dataset.account_user.email},
+    }
+
+
+def login(dataset, i):
+    return {
+        "path": reverse("email-login"),
+        "data": {"email": dataset.login_user.email, "password": PASSWORD},
+    }
+
+
+def send_forget_otp(dataset, i):
+    return {"path": reverse("sendotp-forget"), "data": {"email": dataset.account_user.email}}
+
+
+def verify_forget_otp(dataset, i):
+    otp = otp_store.issue_otp(dataset.account_user, OneTimePassword.FORGET_PASSWORD)
+    return {
+        "path": reverse("verify-forgetotp"),
+        "data": {"otp": otp, "email": dataset.account_user.email},
+    }
+
+
+def update_password(dataset, i):
+    return {
+        "path": reverse("forget-password"),
+        "data": {"new_password": PASSWORD},
+        **auth(dataset.get_token(dataset.login_user)),
+    }
+
+
+def update_username(dataset, i):
+    return {
+        "path": reverse("updateusername"),
+        "data": json.dumps({"new_username": f"{USERNAME_PREFIX}{dataset.run}-{i}"}),
+        "content_type": "application/json",
+        **auth(dataset.get_token(dataset.profile_user)),
+    }
+
+
+def soft_delete_user(dataset, i):
+    SoftDeletedUser.objects.filter(user=dataset.profile_user).update(deleted_at=False)
+    return {
+        "path": reverse("softdeleteuser"),
+        **auth(dataset.get_token(dataset.profile_user)),
+    }
+
+
+def logout(dataset, i):
+    return {"path": reverse("logout"), **auth(dataset.get_token(dataset.login_user))}
+
+
+def recover_soft_deleted_user(dataset, i):
+    # Rejected old password: the successful path needs a soft-deleted account
+    return {
+        "path": reverse("recoversoftdeleteduser"),
+        "data": {"old_password": "wrong-password"},
+        **basic_auth(User.objects.get(pk=dataset.profile_user.pk), PASSWORD),
+    }
+
+
+SCENARIOS = [
+    Scenario("feed", "blogapiset1", "get", feed, http=True),
+    Scenario("feed_comments", "blogapiset1", "get",
+             lambda dataset, i: feed(dataset, i, include="comments"), http=True),
+    Scenario("feed_cold_cache", "blogapiset1", "get", feed_cold),
+    Scenario("feed_offset_deep", "blogapiset1", "get", feed_offset_deep, http=True),
+    Scenario("feed_cursor_deep", "blogapiset1", "get", feed_cursor_deep, http=True),
+    Scenario("feed_async", "asyncblogapiset1", "get",
+             lambda dataset, i: {**feed(dataset, i), "path": reverse("asyncblogapiset1")},
+             http=True),
+    Scenario("author_timeline", "authortimeline", "get", author_timeline, http=True),
+    Scenario("category_timeline", "categorytimeline", "get", category_timeline, http=True),
+    Scenario("category_timeline_cold_cache", "categorytimeline", "get", category_timeline_cold),
+    Scenario("category_search_cold_cache", "searchblogs", "get", category_search_cold),
+    Scenario("post_create", "blogapiset1", "post", post_create, expected=201),
+    Scenario("post_detail", "blogapiset2", "get", post_detail, http=True),
+    Scenario("post_update", "blogapiset2", "put", post_update),
+    Scenario("post_delete", "blogapiset2", "delete", post_delete),
+    Scenario("comment_create", "blogapiset2", "post", comment_create, expected=201),
+    Scenario("comment_list", "blogcomments", "get", comment_list, http=True),
+    Scenario("categories", "blogcategories", "get", categories, http=True),
+    Scenario("categories_cold_cache", "blogcategories", "get", categories_cold),
+    Scenario("bulk", "blogapibulk", "post", bulk),
+    Scenario("export", "blogexport", "get", export, http=True),
+    Scenario("search", "searchblogs", "get", search, http=True),
+    Scenario("search_cold_cache", "searchblogs", "get", search_cold),
+    Scenario("search_async", "asyncsearchblogs", "get",
+             lambda dataset, i: search(dataset, i, "asyncsearchblogs"), http=True),
+    Scenario("register", "register", "post", register, expected=201),
+    Scenario("send_activation_otp", "sendotp-activation", "post", send_activation_otp),
+    Scenario("verify_activation_otp", "verify-activationotp", "post", verify_activation_otp),
+    Scenario("login", "email-login", "post", login),
+    Scenario("send_forget_otp", "sendotp-forget", "post", send_forget_otp),
+    Scenario("verify_forget_otp", "verify-forgetotp", "post", verify_forget_otp),
+    Scenario("update_password", "forget-password", "post", update_password),
+    Scenario("update_username", "updateusername", "put", update_username),
+    Scenario("soft_delete_user", "softdeleteuser", "post", soft_delete_user),
+    Scenario("logout", "logout", "post", logout),
+    Scenario("recover_soft_deleted_user", "recoversoftdeleteduser", "post",
+             recover_soft_deleted_user, expected=401),
+]
@@ -0,0 +1,66 @@
+import json
+from django.test import TestCase
+from django.urls import get_resolver
+from authentication import urls as authentication_urls
+from benchmarks import data, runner
+from benchmarks.scenarios import BULK_OPERATIONS, SCENARIOS
+from blog import urls as blog_urls
+from blog.models import BlogPost, Comment, SearchDocument
+from userprofile import urls as userprofile_urls
+
+
+class BenchmarkTest(TestCase):
+    """
+    The benchmarks cover every endpoint and run on the generated data.
+    """
+
+    def test_generated_data(self):
+        counts = data.generate(users=4, categories=2, posts=30, comments=2, seed=1)
+        self.assertEqual(counts["posts"], 30)
+        self.assertEqual(BlogPost.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), counts["comments"])
+        published = BlogPost.objects.filter(status="published")
+        self.assertEqual(SearchDocument.objects.count(), published.count())
+        blog_post = BlogPost.objects.filter(comment_count__gt=0).first()
+        self.assertEqual(blog_post.comment_count, blog_post.comment_set.count())
+
+    def test_every_endpoint_has_a_scenario(self):
+        url_names = {
+            pattern.name
+            for urls in (blog_urls, authentication_urls, userprofile_urls)
+            for pattern in urls.urlpatterns
+        }
+        self.assertEqual(url_names - {scenario.url_name for scenario in SCENARIOS}, set())
+        for scenario in SCENARIOS:
+            self.assertIn(scenario.url_name, get_resolver().reverse_dict)
+
+    def test_scenarios_run(self):
+        data.generate(users=6, categories=3, posts=60, comments=2)
+        with runner.benchmark_environment():
+            results = runner.run(iterations=2, warmup=1)
+
+        self.assertEqual(set(results), {scenario.name for scenario in SCENARIOS})
+        for name, result in results.items():
+            self.assertEqual(result["errors"], 0, f"{name}: {result['statuses']}")
+            self.assertEqual(result["iterations"], 2)
+        # Pages are cached, ranked ids are not
+        self.assertLess(results["feed_offset_deep"]["queries"], 3)
+        json.dumps(results)
+
+    def test_bulk_throughput(self):
+        data.generate(users=6, categories=3, posts=60, comments=2)
+        with runner.benchmark_environment():
+            results = runner.run_bulk_throughput(repeats=1)
+        self.assertEqual(results["errors"], 0)
+        self.assertEqual(results["operations"], BULK_OPERATIONS)
+        self.assertGreater(results["bulk_ops_per_second"], 0)
+        self.assertGreater(results["single_ops_per_second"], 0)
+
+    def test_compare(self):
+        baseline = {"scenarios": {"feed": {"p50_ms": 10.0, "queries": 2, "errors": 0}}}
+        current = {"scenarios": {"feed": {"p50_ms": 11.0, "queries": 2, "errors": 0}}}
+        self.assertEqual(runner.compare(baseline, current), [])
+
+        current["scenarios"]["feed"].update(p50_ms=13.0, queries=3)
+        regressions = runner.compare(baseline, current)
+        self.assertEqual([name for name, _ in regressions], ["scenarios.feed"] * 2)
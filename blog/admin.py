@@ -1,5 +1,5 @@
 from django.contrib import admin
-from blog.models import BlogPost, Category, Comment
+from blog.models import BlogPost, Category, Comment, MediaBlob
 
 
 class CommentInline(admin.StackedInline):
@@ -36,3 +36,12 @@ class CommentAdmin(admin.ModelAdmin):
     """
     list_display = ("author", "blog_post", "email", "created_at")
     list_filter = ("created_at",)
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    """
+    Customizes the display and behavior of the MediaBlob model in the admin panel.
+    """
+    list_display = ("name", "size", "ref_count", "last_saved_at")
+    readonly_fields = ("name", "size", "ref_count", "created_at", "last_saved_at")
@@ -0,0 +1,153 @@
+"""
+Async variants of the blog read endpoints, for ASGI deployments.
+
+The feed and the search listing are served with Django's async ORM and
+cache API, so a worker is not tied up while the database or the cache
+answers. They return exactly the same data as their `blog.views`
+counterparts and share their page cache.
+
+DRF's `APIView` only supports sync handlers, so these are plain Django
+views: the request is wrapped in a DRF `Request` for the paginators and
+the data rendered with the API's JSON renderer. Write methods are handed over
+to the sync DRF views.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from blog.pagination import get_blog_paginator
+from blog.utils import cache, fast_serializers, get_blog_queryset, search_index
+from blog.views import BlogAPISet1View
+
+# Raw querysets have no async interface
+get_latest_comment_values = sync_to_async(get_blog_queryset.get_latest_comment_values)
+
+
+class AsyncAPIView(View):
+    """
+    Base class of the async read views.
+    """
+
+    # The JSON renderer of the DRF views
+    renderer_class = api_settings.DEFAULT_RENDERER_CLASSES[0]
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Like DRF's APIView, requests are authenticated by token, not by session
+        view.csrf_exempt = True
+        return view
+
+    def render(self, data, status=200):
+        renderer = self.renderer_class()
+        return HttpResponse(
+            renderer.render(data),
+            status=status,
+            content_type=renderer.media_type,
+        )
+
+    async def get_page_response(self, endpoint, request, build):
+        """
+        Async variant of `blog.views.get_page_response`.
+        """
+        generation = await cache.aget_generation()
+        etag, last_modified = cache.get_validators(
+            endpoint, request, generation, await cache.aget_last_modified())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.render(
+                await cache.aget_or_set_page(endpoint, request, build, generation))
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.render({"detail": exc.detail}, status=exc.status_code)
+
+
+class AsyncBlogAPISet1View(AsyncAPIView):
+    """
+    Async variant of `BlogAPISet1View`.
+    """
+
+    async def get(self, request):
+        """
+        Retrieve all published blog posts using pagination, with their
+        comments when ?include=comments is given.
+        """
+        request = Request(request)
+        return await self.get_page_response(
+            "feed", request, lambda: self.get_page_data(request))
+
+    async def get_page_data(self, request):
+        """
+        Build the paginated response data of the requested feed page.
+        """
+        blogs = get_blog_queryset.get_published_post_rows()
+        paginator = get_blog_paginator(request)
+        result_page = await paginator.apaginate_queryset(blogs, request)
+
+        comments = None
+        if get_blog_queryset.includes_comments(request):
+            comments = await get_latest_comment_values([row["id"] for row in result_page])
+        return paginator.get_paginated_response(
+            {
+                "status": True,
+                "message": "All Published Posts Are Listed Below",
+                "data": fast_serializers.serialize_posts(result_page, comments),
+            }
+        ).data
+
+    async def post(self, request):
+        """
+        Create a new blog post, handled by the sync `BlogAPISet1View`.
+        """
+        return await sync_to_async(BlogAPISet1View.as_view())(request)
+
+
+class AsyncSearchAPIView(AsyncAPIView):
+    """
+    Async variant of `SearchAPIView`.
+    """
+
+    async def get(self, request):
+        """
+        Returns a list of blog posts that match the search query.
+        """
+        request = Request(request)
+        return await self.get_page_response(
+            "search", request, lambda: self.get_page_data(request))
+
+    async def get_page_data(self, request):
+        """
+        Build the paginated response data of the requested search page.
+        """
+        search_query = request.query_params.get("search")
+        paginator = get_blog_paginator(request)
+
+        if search_query:
+            ranked = await search_index.asearch_ranked(search_query)
+            page_ids = [pk for score, pk in await paginator.apaginate_queryset(ranked, request)]
+            result_page = await get_blog_queryset.aget_published_post_rows_by_ids(page_ids)
+            message = f"Result for '{search_query}'"
+        else:
+            blog_posts = get_blog_queryset.get_published_post_rows()
+            result_page = await paginator.apaginate_queryset(blog_posts, request)
+            message = "List of blogs"
+
+        comments = await get_latest_comment_values([row["id"] for row in result_page])
+        return paginator.get_paginated_response(
+            {
+                "status": True,
+                "message": message,
+                "data": fast_serializers.serialize_posts(result_page, comments),
+            }
+        ).data
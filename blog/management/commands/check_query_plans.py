@@ -0,0 +1,166 @@
+import re
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from blog.models import BlogPost
+from blog.utils import search_index
+
+# How each backend reports a full table scan in its query plan, with the
+# name of the scanned table
+FULL_SCAN_PATTERNS = {
+    "sqlite": re.compile(r"\bSCAN (?:TABLE )?(\w+)(?! USING (?:COVERING )?INDEX)\b"),
+    "mysql": re.compile(r'"table_name":\s*"([^"<]+)",\s*"access_type":\s*"ALL"'),
+    "postgresql": re.compile(r"\bSeq Scan on (\w+)"),
+}
+
+# Subqueries SQLite names in its plans: scanning their rows is expected
+SQLITE_SUBQUERY_PATTERN = re.compile(r"\b(?:CO-ROUTINE|MATERIALIZE) (\w+)")
+
+# Read endpoints of the blog, as (name, url name, url arguments, query
+# parameters). The url arguments name an id of the sample post
+ENDPOINTS = (
+    ("feed", "blogapiset1", (), {}),
+    ("feed with comments", "blogapiset1", (), {"include": "comments"}),
+    ("feed (cursor)", "blogapiset1", (), {"pagination": "cursor", "include": "comments"}),
+    ("feed (async)", "asyncblogapiset1", (), {"include": "comments"}),
+    ("post", "blogapiset2", ("id",), {}),
+    ("comments", "blogcomments", ("id",), {}),
+    ("categories", "blogcategories", (), {}),
+    ("author timeline", "authortimeline", ("author_id",), {"pagination": "cursor"}),
+    ("category timeline", "categorytimeline", ("category_id",), {"pagination": "cursor"}),
+    ("export", "blogexport", (), {}),
+    ("export (since)", "blogexport", (), {"since": "since"}),
+    ("search", "searchblogs", (), {"search": "term"}),
+    ("search (cursor)", "searchblogs", (), {"search": "term", "pagination": "cursor"}),
+    ("search (no terms)", "searchblogs", (), {"search": "the"}),
+    ("search (async)", "asyncsearchblogs", (), {"search": "term"}),
+)
+
+# Endpoints without any read (GET) request
+WRITE_ONLY_ENDPOINTS = ("blogapibulk",)
+
+
+def get_sample():
+    """
+    Return the values the endpoints are called with, from the latest
+    published post.
+    """
+    post = BlogPost.objects.filter(status="published", deleted_at=False).order_by(
+        "-pk").values("id", "author_id", "category_id", "title").first()
+    if post is None:
+        post = {"id": 1, "author_id": 1, "category_id": 1, "title": "Blog"}
+    terms = search_index.analyze(post["title"])
+    return {
+        **post,
+        "term": terms[0] if terms else "blog",
+        "since": (timezone.now() - timedelta(days=1)).isoformat(),
+    }
+
+
+def capture_endpoint_queries(client, url, params):
+    """
+    Call an endpoint, and its next page when it has one, and return the
+    SQL of its queries.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, params)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        elif response.status_code == 200:
+            data = response.json()
+            if isinstance(data, dict) and data.get("next"):
+                client.get(data["next"])
+    return [query["sql"] for query in queries]
+
+
+def get_endpoint_queries():
+    """
+    Return the SELECT statements run by the blog read endpoints, by name.
+
+    The endpoints are called with an empty, private cache, so every page
+    is built and every query is run.
+    """
+    sample = get_sample()
+    client = Client()
+    endpoint_queries = {}
+    caches = {"default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "check-query-plans",
+    }}
+    with override_settings(CACHES=caches, ALLOWED_HOSTS=["testserver"]):
+        for name, url_name, args, params in ENDPOINTS:
+            url = reverse(url_name, args=[sample[arg] for arg in args])
+            params = {key: sample.get(value, value) for key, value in params.items()}
+            endpoint_queries[name] = [
+                sql for sql in capture_endpoint_queries(client, url, params)
+                if sql.lstrip().upper().startswith(("SELECT", "WITH"))
+            ]
+    return endpoint_queries
+
+
+def get_full_scans(plan):
+    """
+    Return the tables read with a full scan in a query plan.
+    """
+    subqueries = set(SQLITE_SUBQUERY_PATTERN.findall(plan)) if connection.vendor == "sqlite" else set()
+    return [
+        table for table in FULL_SCAN_PATTERNS[connection.vendor].findall(plan)
+        if table not in subqueries
+    ]
+
+
+def explain(sql):
+    prefix = connection.ops.explain_query_prefix(
+        format="json" if connection.vendor == "mysql" else None)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{prefix} {sql}")
+        return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the queries of the blog endpoints and fail if any of "
+        "them falls back to a full table scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print the full query plan of every query.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in FULL_SCAN_PATTERNS:
+            raise CommandError(f"Query plans of {connection.vendor} are not supported.")
+
+        failures = []
+        for name, queries in get_endpoint_queries().items():
+            # Chunked and paginated reads repeat a query with other values:
+            # each plan is reported once per endpoint, whatever its numbers
+            plans = set()
+            for index, sql in enumerate(queries, 1):
+                plan = explain(sql)
+                shape = re.sub(r"\d+", "", plan)
+                if shape in plans:
+                    continue
+                plans.add(shape)
+                label = f"{name} #{index}"
+                if options["verbose_plans"]:
+                    self.stdout.write(f"{label}:\n{sql}\n{plan}\n")
+                tables = get_full_scans(plan)
+                if tables:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(f"FULL SCAN  {label} ({', '.join(tables)})"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"OK         {label}"))
+
+        if failures:
+            raise CommandError(
+                f"{len(failures)} quer{'y' if len(failures) == 1 else 'ies'} "
+                f"fall back to a full table scan: {', '.join(failures)}"
+            )
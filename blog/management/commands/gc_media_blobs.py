@@ -0,0 +1,33 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from blog.utils import media_blobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the reference counts of the stored blog images and delete "
+        "the images and resized variants no live blog post uses any more, and "
+        "the files of uploads that were never committed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-minutes",
+            type=int,
+            default=int(media_blobs.GRACE_PERIOD.total_seconds() // 60),
+            help="Keep unreferenced images uploaded less than this many minutes ago.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        deleted, freed = media_blobs.collect(
+            grace_period=timedelta(minutes=options["grace_minutes"]),
+            dry_run=options["dry_run"],
+        )
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {deleted} unreferenced images ({freed} bytes)."))
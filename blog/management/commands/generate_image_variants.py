@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection
+from blog.models import BlogPost
+from blog.utils import images
+
+
+class Command(BaseCommand):
+    help = "Generate the resized copies of the blog post images that are missing or out of date."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Regenerate the variants of every image.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=images.WORKERS,
+            help="Number of images processed in parallel.",
+        )
+
+    def handle(self, *args, **options):
+        blog_posts = BlogPost.objects.exclude(image="").only("pk", "image", "image_variants")
+        ids = [
+            blog_post.pk for blog_post in blog_posts.iterator()
+            if options["all"] or images.needs_processing(blog_post)
+        ]
+
+        def process(blog_post_id):
+            try:
+                return images.process(blog_post_id) is not None
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            processed = sum(executor.map(process, ids))
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} blog post images."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from blog.utils import search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of the published blog posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of posts indexed per batch.",
+        )
+
+    def handle(self, *args, **options):
+        indexed = search_index.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} blog posts."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from blog.utils import cache, timelines
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-author and per-category timelines of the published blog posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=timelines.BATCH_SIZE,
+            help="Number of posts listed per batch.",
+        )
+
+    def handle(self, *args, **options):
+        listed = timelines.rebuild(batch_size=options["batch_size"])
+        # The timeline pages are served from the page cache
+        cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(f"Listed {listed} blog posts."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from blog.utils import cache, category_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the published blog post count of the categories."
+
+    def handle(self, *args, **options):
+        repaired = category_stats.repair()
+        if repaired:
+            # The categories listing is served from the page cache
+            cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} categories."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from blog.utils import comment_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the comment count and last comment time of the blog posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of posts checked per batch.",
+        )
+
+    def handle(self, *args, **options):
+        repaired = comment_stats.repair(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} blog posts."))
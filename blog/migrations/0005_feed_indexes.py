@@ -0,0 +1,25 @@
+# Generated by Django 4.1.7 on 2026-10-18 00:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_searchdocument_searchposting'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', '-created_on', '-id', 'deleted_at'], name='blog_post_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('deleted_at', False), ('status', 'published')), fields=['-created_on', '-id'], name='blog_post_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['blog_post', 'created_at'], name='blog_comment_post_created_idx'),
+        ),
+    ]
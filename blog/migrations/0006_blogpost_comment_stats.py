@@ -0,0 +1,39 @@
+# Generated by Django 4.1.7 on 2026-10-18 01:05
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_stats(apps, schema_editor):
+    """
+    Fill the comment statistics of the existing posts in one UPDATE.
+    """
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    Comment = apps.get_model('blog', 'Comment')
+    comments = Comment.objects.filter(blog_post=OuterRef('pk')).values('blog_post')
+    BlogPost.objects.update(
+        comment_count=Coalesce(Subquery(comments.annotate(count=Count('pk')).values('count')), 0),
+        last_commented_at=Subquery(comments.annotate(last=Max('created_at')).values('last')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='last_commented_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_comment_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.1.7 on 2026-10-18 01:38
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+import django.db.models.deletion
+
+
+def merge_duplicate_categories(apps, schema_editor):
+    """
+    Move the posts of duplicate categories (same name, as compared by the
+    database) to the oldest one and delete the others, so the name can be
+    made unique.
+    """
+    Category = apps.get_model('blog', 'Category')
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    duplicates = Category.objects.values('name').annotate(
+        count=Count('pk'), first=Min('pk')).filter(count__gt=1).order_by()
+    for duplicate in duplicates:
+        others = Category.objects.filter(name=duplicate['name']).exclude(pk=duplicate['first'])
+        BlogPost.objects.filter(category__in=others).update(category=duplicate['first'])
+        others.delete()
+
+
+def backfill_category_stats(apps, schema_editor):
+    """
+    Count the published posts of the existing categories.
+    """
+    Category = apps.get_model('blog', 'Category')
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    CategoryStats = apps.get_model('blog', 'CategoryStats')
+    counts = dict(
+        BlogPost.objects.filter(status='published', deleted_at=False)
+        .values_list('category').annotate(count=Count('pk')).order_by()
+    )
+    CategoryStats.objects.bulk_create(
+        [
+            CategoryStats(category_id=category_id, published_count=counts.get(category_id, 0))
+            for category_id in Category.objects.values_list('pk', flat=True)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_mediablob_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_categories, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='CategoryStats',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='blog.category')),
+                ('published_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.RunPython(backfill_category_stats, migrations.RunPython.noop),
+    ]
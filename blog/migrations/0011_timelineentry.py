@@ -0,0 +1,56 @@
+# Generated by Django 4.1.7 on 2026-10-18 01:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_timelines(apps, schema_editor):
+    """
+    List the existing published posts in the timelines of their author and
+    category, one batch of posts at a time.
+    """
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    TimelineEntry = apps.get_model('blog', 'TimelineEntry')
+    last_id = 0
+    while True:
+        rows = list(
+            BlogPost.objects.filter(pk__gt=last_id, status='published', deleted_at=False)
+            .order_by('pk').values_list('pk', 'author_id', 'category_id', 'created_on')[:1000]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(kind=kind, owner_id=owner_id, blog_post_id=pk, created_on=created_on)
+            for pk, author_id, category_id, created_on in rows
+            for kind, owner_id in (('author', author_id), ('category', category_id))
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_category_unique_name_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('author', 'Author'), ('category', 'Category')], max_length=10)),
+                ('owner_id', models.BigIntegerField()),
+                ('created_on', models.DateTimeField()),
+                ('blog_post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='blog.blogpost')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['kind', 'owner_id', '-created_on', '-blog_post'], name='blog_timeline_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'owner_id', 'blog_post'), name='blog_timeline_entry_unique'),
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.7 on 2026-10-18 02:01
+
+from django.db import migrations, models
+
+
+def backfill_search_stats(apps, schema_editor):
+    """
+    Count the documents already in the search index.
+    """
+    SearchDocument = apps.get_model('blog', 'SearchDocument')
+    SearchStats = apps.get_model('blog', 'SearchStats')
+    stats = SearchDocument.objects.aggregate(
+        document_count=models.Count('pk'), total_length=models.Sum('length'))
+    SearchStats.objects.create(
+        pk=1, document_count=stats['document_count'], total_length=stats['total_length'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_count', models.BigIntegerField(default=0)),
+                ('total_length', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['title'], name='blog_post_title_idx'),
+        ),
+        migrations.RunPython(backfill_search_stats, migrations.RunPython.noop),
+    ]
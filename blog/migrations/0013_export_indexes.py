@@ -0,0 +1,21 @@
+# Generated by Django 4.1.7 on 2026-10-18 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_search_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['updated_on', 'id'], name='blog_post_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['last_commented_at'], name='blog_post_commented_idx'),
+        ),
+    ]
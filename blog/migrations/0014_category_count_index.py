@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_export_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='categorystats',
+            index=models.Index(fields=['-published_count'], name='blog_category_count_idx'),
+        ),
+    ]
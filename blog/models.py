@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from blog.storage import get_blog_image_storage
 
 
 class Category(models.Model):
@@ -9,12 +10,36 @@ class Category(models.Model):
     Attributes:
         name: The name of the category.
     """
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, unique=True)
 
     def __str__(self):
         return self.name
 
 
+class CategoryStats(models.Model):
+    """
+    Counters of a category, maintained on every blog post write (see
+    `blog.utils.category_stats`).
+
+    Attributes:
+        category (OneToOneField): The counted category.
+        published_count (PositiveIntegerField): Number of published,
+            non-deleted blog posts in the category.
+    """
+    category = models.OneToOneField(
+        Category, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    published_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Category listing: categories with published posts, largest first
+            models.Index(fields=['-published_count'], name='blog_category_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"Stats of category {self.category_id}"
+
+
 class BlogPost(models.Model):
     """
     Model representing a blog post.
@@ -25,10 +50,13 @@ class BlogPost(models.Model):
         content (TextField): The content of the blog post.
         category (CharField): The category of the blog post.
         image (ImageField): An image associated with the blog post.
+        image_variants (JSONField): Resized copies of the image, by format and width.
         status (CharField): The status of the blog post, either "draft" or "published".
         created_on (DateTimeField): The date and time when the blog post was created.
         updated_on (DateTimeField): The date and time when the blog post was last updated.
         deleted_at (BooleanField): By default sete as false.
+        comment_count (PositiveIntegerField): Number of comments on the post.
+        last_commented_at (DateTimeField): Creation time of the latest comment.
     """
 
     STATUS_CHOICES = (
@@ -36,18 +64,66 @@ class BlogPost(models.Model):
         ('published', 'Published')
     )
 
+    # Fields written by the API (single and bulk writes). The denormalized
+    # comment stats and the image variants are updated with their own
+    # queries, and must not be overwritten from a stale instance
+    EDITABLE_FIELDS = ('title', 'content', 'status', 'category', 'image', 'deleted_at', 'updated_on')
+
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=250)
     content = models.TextField()
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='blog_images/', blank=True)
+    image = models.ImageField(upload_to='blog_images/', blank=True, storage=get_blog_image_storage)
+    # Generated in the background, see blog.utils.images
+    image_variants = models.JSONField(default=dict, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft')
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
     deleted_at = models.BooleanField(default=False, null=True)
+    # Denormalized from the comments, see blog.utils.comment_stats
+    comment_count = models.PositiveIntegerField(default=0)
+    last_commented_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-created_on']
+        indexes = [
+            # Feed and search listings: published, newest first. deleted_at
+            # is filtered as `NOT deleted_at`, so it is only carried along
+            # (last) to be checked without reading the row
+            models.Index(
+                fields=['status', '-created_on', '-id', 'deleted_at'],
+                name='blog_post_feed_idx',
+            ),
+            # Same listing as a partial index, on backends supporting it
+            models.Index(
+                fields=['-created_on', '-id'],
+                condition=models.Q(status='published', deleted_at=False),
+                name='blog_post_published_idx',
+            ),
+            # Exact title lookups of the search (queries without index terms)
+            models.Index(fields=['title'], name='blog_post_title_idx'),
+            # Incremental exports: posts written or commented after a time
+            models.Index(fields=['updated_on', 'id'], name='blog_post_updated_idx'),
+            models.Index(fields=['last_commented_at'], name='blog_post_commented_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        blog_post = super().from_db(db, field_names, values)
+        # Remember the category the post was counted in when it was loaded,
+        # to count its change on save (unknown when those fields are deferred)
+        if {"status", "deleted_at", "category_id"}.issubset(field_names):
+            blog_post.loaded_counted_category_id = blog_post.get_counted_category_id()
+        return blog_post
+
+    def get_counted_category_id(self):
+        """
+        Return the category the post is counted in by the category stats:
+        its category when it is published and not deleted, else None.
+        """
+        if self.status == "published" and not self.deleted_at:
+            return self.category_id
+        return None
 
     def __str__(self):
         return self.title
@@ -60,5 +136,134 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     blog_post = models.ForeignKey(BlogPost, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Comments of a post in (created_at, id) order: keyset pages of
+            # the comments listing and the latest comments of the feed
+            models.Index(
+                fields=['blog_post', 'created_at', 'id'],
+                name='blog_comment_post_created_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.content
+
+
+class TimelineEntry(models.Model):
+    """
+    Entry of a precomputed timeline: a published blog post listed in the
+    timeline of its author or of its category (see `blog.utils.timelines`).
+
+    Attributes:
+        kind (CharField): The kind of timeline, "author" or "category".
+        owner_id (BigIntegerField): The id of the author or of the category.
+        blog_post (ForeignKey): The listed blog post.
+        created_on (DateTimeField): The creation time of the blog post,
+            copied to order the timeline.
+    """
+    AUTHOR = 'author'
+    CATEGORY = 'category'
+    KIND_CHOICES = (
+        (AUTHOR, 'Author'),
+        (CATEGORY, 'Category'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    owner_id = models.BigIntegerField()
+    blog_post = models.ForeignKey(BlogPost, on_delete=models.CASCADE)
+    created_on = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'owner_id', 'blog_post'],
+                name='blog_timeline_entry_unique',
+            ),
+        ]
+        indexes = [
+            # Timeline pages, newest first: an index range scan returning
+            # the post ids
+            models.Index(
+                fields=['kind', 'owner_id', '-created_on', '-blog_post'],
+                name='blog_timeline_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.owner_id}: {self.blog_post_id}"
+
+
+class MediaBlob(models.Model):
+    """
+    Model representing a file of the content-addressed image storage.
+
+    Attributes:
+        name (CharField): The storage name of the file, made of its digest.
+        size (PositiveBigIntegerField): The size of the file in bytes.
+        ref_count (PositiveIntegerField): The number of blog posts using it.
+        created_at (DateTimeField): The date and time of the first upload.
+        last_saved_at (DateTimeField): The date and time of the last upload.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_saved_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.name
+
+
+class SearchDocument(models.Model):
+    """
+    Entry of the full-text search index for a published blog post.
+
+    Attributes:
+        blog_post (OneToOneField): The indexed blog post.
+        length (PositiveIntegerField): Number of indexed terms in the post,
+            used for BM25 length normalisation.
+    """
+    blog_post = models.OneToOneField(BlogPost, on_delete=models.CASCADE, primary_key=True)
+    length = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Search document for {self.blog_post_id}"
+
+
+class SearchStats(models.Model):
+    """
+    Collection statistics of the full-text search index (a single row),
+    kept up to date by the indexing so BM25 never scans the documents.
+
+    Attributes:
+        document_count (BigIntegerField): Number of indexed documents.
+        total_length (BigIntegerField): Sum of the lengths of the documents.
+    """
+    document_count = models.BigIntegerField(default=0)
+    total_length = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Search stats ({self.document_count} documents)"
+
+
+class SearchPosting(models.Model):
+    """
+    Posting of the inverted index: how often a term occurs in a document.
+
+    Attributes:
+        term (CharField): The stemmed term.
+        document (ForeignKey): The search document the term occurs in.
+        frequency (PositiveIntegerField): Weighted number of occurrences.
+    """
+    term = models.CharField(max_length=64)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE)
+    frequency = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["term", "document"], name="blog_search_term_idx"),
+        ]
+
+    def __str__(self):
+        return self.term
@@ -0,0 +1,269 @@
+import base64
+import bisect
+import json
+from collections import OrderedDict
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class BlogPostPagination(PageNumberPagination):
+    """
+    Custom pagination class for blog posts.
+    """
+
+    # Set the number of items to display per page
+    page_size = 1
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async variant of `paginate_queryset` using the async ORM.
+        """
+        if isinstance(queryset, list):
+            return self.paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Fill the cached count so that the paginator does not query it
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            )
+            raise NotFound(msg)
+
+        self.page.object_list = [item async for item in self.page.object_list]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+        self.request = request
+        return list(self.page)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor (keyset) pagination.
+
+    Instead of an `OFFSET`, every page is fetched with a `WHERE` on the
+    ordering key of the last row of the previous page, so deep pages cost
+    the same as the first one. The ordering must be unique, which is why it
+    ends with the primary key. Pages only move forward ("load more").
+
+    The total count is only computed when the client asks for it with
+    `?count=true`, so a page normally costs a single query.
+
+    Ranked lists of (score, id) pairs (search results) are paginated too,
+    see `paginate_list`.
+    """
+
+    ordering = ("-created_on", "-id")
+    page_size = 10
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor = self.setup(request)
+        if isinstance(queryset, list):
+            return self.paginate_list(queryset, cursor)
+
+        if self.include_count(request):
+            self.count = queryset.count()
+        return self.get_page(list(self.get_page_queryset(queryset, cursor)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async variant of `paginate_queryset` using the async ORM.
+        """
+        cursor = self.setup(request)
+        if isinstance(queryset, list):
+            return self.paginate_list(queryset, cursor)
+
+        if self.include_count(request):
+            self.count = await queryset.acount()
+        return self.get_page([
+            item async for item in self.get_page_queryset(queryset, cursor)
+        ])
+
+    def setup(self, request):
+        """
+        Read the page size and cursor of the request and return the cursor.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        return self.decode_cursor(request)
+
+    def get_page_queryset(self, queryset, cursor):
+        queryset = queryset.order_by(*self.ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_cursor_filter(queryset.model, cursor))
+        # Fetch one extra row to know whether there is a next page
+        return queryset[:self.page_size + 1]
+
+    def get_page(self, results):
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.has_next:
+            last = results[-1]
+            # Model instances, or `.values()` rows
+            get = last.get if isinstance(last, dict) else lambda name: getattr(last, name)
+            self.next_position = [get(field.lstrip("-")) for field in self.ordering]
+        return results
+
+    def paginate_list(self, ranked, cursor):
+        """
+        Return a page of a list of (score, id) pairs sorted best first
+        (score, then id, descending).
+
+        The cursor holds the score, id and position of the last pair of the
+        previous page. The page starts right after that pair, found by
+        bisection. When the results changed in between (the post left
+        them, or new collection statistics moved every score), the page
+        starts after the post if it is still listed, or else at its former
+        position, rather than failing.
+        """
+        if self.include_count(self.request):
+            self.count = len(ranked)
+
+        start = 0
+        if cursor is not None:
+            if len(cursor) != 3 or not all(
+                isinstance(value, (int, float)) and not isinstance(value, bool)
+                for value in cursor
+            ):
+                raise NotFound(self.invalid_cursor_message)
+            score, pk, position = cursor
+            start = bisect.bisect_right(
+                ranked, (-score, -pk), key=lambda item: (-item[0], -item[1]))
+            if not start or tuple(ranked[start - 1]) != (score, pk):
+                ids = [item[1] for item in ranked]
+                start = ids.index(pk) + 1 if pk in ids else max(0, min(int(position), len(ids)))
+
+        results = ranked[start:start + self.page_size]
+        self.has_next = start + self.page_size < len(ranked)
+        if self.has_next:
+            self.next_position = [*results[-1], start + len(results) - 1]
+        return results
+
+    def get_cursor_filter(self, model, cursor):
+        """
+        Build the condition selecting the rows after the cursor position.
+
+        For an ordering (a, b) this is `a < x OR (a = x AND b < y)`, with
+        `>` instead of `<` for ascending fields.
+        """
+        if len(cursor) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, cursor):
+            name = field.lstrip("-")
+            try:
+                value = model._meta.get_field(name).to_python(value)
+            except Exception:
+                raise NotFound(self.invalid_cursor_message)
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return condition
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def include_count(self, request):
+        return request.query_params.get(self.count_query_param, "").lower() in ("1", "true")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(cursor, list) or not cursor:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, position):
+        data = json.dumps([
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in position
+        ])
+        return base64.urlsafe_b64encode(data.encode("ascii")).decode("ascii")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict()
+        if self.count is not None:
+            payload["count"] = self.count
+        payload["next"] = self.get_next_link()
+        payload["results"] = data
+        return Response(payload)
+
+
+class BlogPostCursorPagination(KeysetPagination):
+    """
+    Keyset pagination of blog posts on (created_on, id), matching
+    `BlogPost.Meta.ordering`.
+    """
+
+    ordering = ("-created_on", "-id")
+    page_size = getattr(settings, "BLOG_CURSOR_PAGE_SIZE", 10)
+    max_page_size = getattr(settings, "BLOG_CURSOR_MAX_PAGE_SIZE", 100)
+
+
+class TimelineCursorPagination(BlogPostCursorPagination):
+    """
+    Keyset pagination of timeline entries, in the order of the blog posts
+    they list, answered from `blog_timeline_idx`.
+    """
+
+    ordering = ("-created_on", "-blog_post_id")
+
+
+class CommentCursorPagination(KeysetPagination):
+    """
+    Keyset pagination of the comments of a blog post on (created_at, id),
+    oldest first, answered from `blog_comment_post_created_idx`.
+    """
+
+    ordering = ("created_at", "id")
+    page_size = getattr(settings, "BLOG_COMMENTS_PAGE_SIZE", 20)
+    max_page_size = getattr(settings, "BLOG_COMMENTS_MAX_PAGE_SIZE", 100)
+
+
+def get_blog_paginator(request, cursor_class=BlogPostCursorPagination):
+    """
+    Return the paginator requested by the client.
+
+    `?pagination=cursor` selects keyset pagination (`cursor_class`),
+    anything else keeps the default page number pagination.
+    """
+    if request.query_params.get("pagination") == "cursor":
+        return cursor_class()
+    return BlogPostPagination()
@@ -1,28 +1,46 @@
+from django.db import transaction
 from rest_framework import serializers
-from blog.models import BlogPost, Category, Comment
+from blog.models import BlogPost, Comment
+from blog.utils import categories, comment_stats, images
+from configuration.instrumentation import TimedSerializerMixin
 
 
-class BlogSerializer(serializers.ModelSerializer):
+class BlogSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     # Specify that category is a CharField instead of CategorySerializer
     category = serializers.CharField()
 
+    # srcset of the resized copies of the image, by format
+    image_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = BlogPost
         fields = ('id', 'author', 'title',
-                  'content', 'category', 'image',
+                  'content', 'category', 'image', 'image_srcset',
                   'status', 'created_on', 'updated_on')
         read_only_fields = ('id', 'author', 'created_on', 'updated_on')
 
+    def validate_image(self, value):
+        # Refuse broken, unsupported or oversized images before storing them
+        if value:
+            images.validate_upload(value)
+        return value
+
+    def get_image_srcset(self, instance):
+        return images.get_srcset(instance)
+
     def create(self, validated_data):
         # Get the category data from validated_data and remove it from the dict
         category_data = validated_data.pop('category')
 
         # Get or create the Category object using the category name
-        category = Category.objects.get_or_create(name=category_data)[0]
+        # (from the category cache)
+        category = categories.get_category(category_data)
 
-        # Create the BlogPost object with the category and validated_data
-        blog = BlogPost.objects.create(category=category, **validated_data)
+        # Create the BlogPost object with the category and validated_data,
+        # counted in its category in the same transaction
+        with transaction.atomic():
+            blog = BlogPost.objects.create(category=category, **validated_data)
         return blog
 
     def update(self, instance, validated_data):
@@ -35,22 +53,26 @@ class BlogSerializer(serializers.ModelSerializer):
         instance.status = validated_data.get('status', instance.status)
         instance.image = validated_data.get('image', instance.image)
 
-        # Retrieve the Category instance using the provided category name
-        category_name = validated_data.get('category', instance.category.name)
-        category = Category.objects.get_or_create(name=category_name)[0]
-        instance.category = category
+        # Retrieve the Category instance using the provided category name,
+        # only when it is given and differs from the current one
+        if 'category' in validated_data:
+            category = categories.get_category(validated_data['category'])
+            if category.pk != instance.category_id:
+                instance.category = category
 
-        # Save the updated instance
-        instance.save()
+        # Save the updated instance, counted in its category in the same
+        # transaction. Only the editable fields are written, the instance
+        # may be older than its comment stats
+        with transaction.atomic():
+            instance.save(update_fields=BlogPost.EDITABLE_FIELDS)
 
         # Return the updated instance
         return instance
 
 
-class CommentSerializer(serializers.ModelSerializer):
-    # Specify the queryset for the `blog_post` field as all BlogPost objects
-    blog_post = serializers.PrimaryKeyRelatedField(
-                queryset=BlogPost.objects.all())
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # The blog post is given by the view when saving
+    blog_post = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = Comment
@@ -61,7 +83,48 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'blog_post']
 
     def create(self, validated_data):
-        # Create a new Comment object using the validated data
-        comment = Comment.objects.create(**validated_data)
+        with transaction.atomic():
+            # Create a new Comment object using the validated data
+            comment = Comment.objects.create(**validated_data)
+            # Count it on the blog post in the same transaction
+            comment_stats.record_comment(comment)
         # Return the created Comment object
         return comment
+
+
+class BlogSummarySerializer(BlogSerializer):
+    """
+    Read-only serializer for listing blog posts with their comment
+    statistics only.
+    """
+
+    class Meta(BlogSerializer.Meta):
+        fields = BlogSerializer.Meta.fields + ('comment_count', 'last_commented_at')
+        read_only_fields = BlogSerializer.Meta.read_only_fields + ('comment_count', 'last_commented_at')
+
+
+class BlogFeedSerializer(BlogSummarySerializer):
+    """
+    Read-only serializer for listing blog posts together with their latest
+    comments.
+
+    Expects the comments to be attached (see
+    `blog.utils.get_blog_queryset.attach_latest_comments`).
+    """
+    comments = CommentSerializer(many=True, read_only=True, source="latest_comments")
+
+    class Meta(BlogSummarySerializer.Meta):
+        fields = BlogSummarySerializer.Meta.fields + ('comments',)
+
+
+class BlogReadSerializer(BlogSummarySerializer):
+    """
+    Read-only serializer for blog posts together with all their comments.
+
+    Expects the comments to be prefetched (see
+    `blog.utils.export.get_export_queryset`).
+    """
+    comments = CommentSerializer(many=True, read_only=True, source="comment_set")
+
+    class Meta(BlogSummarySerializer.Meta):
+        fields = BlogSummarySerializer.Meta.fields + ('comments',)
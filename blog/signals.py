@@ -0,0 +1,107 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from blog.models import BlogPost, Category, Comment
+from blog.utils import cache, categories, category_stats, images, search_index, timelines
+
+
+@receiver(post_save, sender=BlogPost)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """
+    Keep the full-text search index in sync with saved blog posts.
+    """
+    if raw:
+        # Fixtures are loaded without their related rows being guaranteed
+        return
+    search_index.index_post(instance)
+
+
+@receiver(post_save, sender=BlogPost)
+def process_image(sender, instance, raw=False, **kwargs):
+    """
+    Generate the resized copies of a new or changed blog post image.
+    """
+    if raw:
+        return
+    images.schedule([instance])
+
+
+@receiver(pre_delete, sender=BlogPost)
+def unindex_deleted_post(sender, instance, **kwargs):
+    """
+    Remove hard deleted blog posts from the search index, counted out of
+    its statistics.
+    """
+    search_index.remove_posts([instance.pk])
+
+
+@receiver(pre_save, sender=BlogPost)
+@receiver(pre_delete, sender=BlogPost)
+def remember_counted_category(sender, instance, raw=False, **kwargs):
+    """
+    Make sure a written blog post knows the category it was counted in.
+    """
+    if raw:
+        return
+    category_stats.remember(instance)
+
+
+@receiver(post_save, sender=BlogPost)
+def count_saved_post(sender, instance, raw=False, **kwargs):
+    """
+    Keep the published post counts of the categories and the timelines in
+    sync with saved blog posts.
+    """
+    if raw:
+        return
+    before, after = category_stats.pop_change(instance)
+    category_stats.record([(before, after)])
+    timelines.record([(instance, before, after)])
+
+
+@receiver(post_delete, sender=BlogPost)
+def uncount_deleted_post(sender, instance, **kwargs):
+    """
+    Uncount deleted blog posts from their category (their timeline entries
+    are deleted with them).
+    """
+    category_stats.record([category_stats.pop_change(instance, deleted=True)])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, created=False, **kwargs):
+    """
+    Drop the cached category ids when a category is renamed or deleted.
+    """
+    if not created:
+        categories.invalidate()
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_page_cache(sender, **kwargs):
+    """
+    Drop the cached feed and search pages whenever a blog post or a
+    comment is written (created, updated, soft or hard deleted).
+    """
+    cache.invalidate()
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_post_cache(sender, instance, **kwargs):
+    """
+    Drop the cached copies of a written blog post.
+    """
+    cache.invalidate_object(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post_cache(sender, instance, **kwargs):
+    """
+    Drop the cached copies of the blog post of a written comment.
+    """
+    cache.invalidate_object(instance.blog_post_id)
@@ -0,0 +1,106 @@
+"""
+Content-addressed, deduplicating storage of the blog post images.
+
+An upload is hashed while it is written to a temporary file, chunk by
+chunk, which is then renamed to its SHA-256 digest
+(`blog_images/ab/ab12...ef.jpg`). When a file with the same content is
+already stored, the temporary file is dropped: the upload only adds a
+reference to the existing blob.
+
+Every blob has a `MediaBlob` row counting its references. Each save counts
+one; the `gc_media_blobs` command recomputes the counts from the live blog
+posts (soft-deleted posts hold no reference) and deletes the blobs nobody
+references any more. Files whose row was rolled back with the transaction
+of the upload are deleted by the same command (see
+`blog.utils.media_blobs.collect_orphans`).
+"""
+import hashlib
+import os
+import uuid
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils import timezone
+
+# Suffix of the files being written, before they are named after their digest
+TEMP_SUFFIX = ".tmp"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    `FileSystemStorage` storing every file under the digest of its content.
+    """
+
+    hash_name = "sha256"
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content, in _save()
+        return name
+
+    def get_content_name(self, name, digest):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension).replace("\\", "/")
+
+    def _save(self, name, content):
+        from blog.models import MediaBlob
+
+        temp_path, digest = self.write(self.path(os.path.dirname(name)), content)
+        name = self.get_content_name(name, digest)
+        full_path = self.path(name)
+        try:
+            if os.path.exists(full_path):
+                os.unlink(temp_path)
+            else:
+                self.make_directory(os.path.dirname(full_path))
+                # Concurrent uploads of the same content both write
+                # identical bytes, so whichever rename comes last does no harm
+                os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        now = timezone.now()
+        if not MediaBlob.objects.filter(name=name).update(
+            ref_count=F("ref_count") + 1, last_saved_at=now
+        ):
+            MediaBlob.objects.get_or_create(
+                name=name,
+                defaults={"size": content.size, "ref_count": 1, "last_saved_at": now},
+            )
+        return name
+
+    def make_directory(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(directory, self.directory_permissions_mode)
+
+    def write(self, directory, content):
+        """
+        Write the content to a temporary file of `directory`, hashing it on
+        the way, and return the path of the file and the digest.
+        """
+        self.make_directory(directory)
+        digest = hashlib.new(self.hash_name)
+        temp_path = os.path.join(directory, f"{uuid.uuid4().hex}{TEMP_SUFFIX}")
+        fd = os.open(temp_path, self.OS_OPEN_FLAGS, 0o666)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return temp_path, digest.hexdigest()
+
+
+blog_image_storage = ContentAddressedStorage()
+
+
+def get_blog_image_storage():
+    return blog_image_storage
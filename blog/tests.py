@@ -1,3 +1,1363 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from PIL import Image
+from blog import urls as blog_urls
+from blog.management.commands import check_query_plans
+from blog.pagination import KeysetPagination
+from blog.models import (
+    BlogPost,
+    Category,
+    CategoryStats,
+    Comment,
+    MediaBlob,
+    SearchDocument,
+    TimelineEntry,
+)
+from rest_framework.renderers import JSONRenderer
+from blog.serializers import (
+    BlogFeedSerializer,
+    BlogReadSerializer,
+    BlogSerializer,
+    BlogSummarySerializer,
+)
+from blog.utils import (
+    cache as page_cache,
+    categories,
+    category_stats,
+    comment_stats,
+    export,
+    fast_serializers,
+    get_blog_object,
+    images,
+    search_index,
+    timelines,
+)
+from blog.utils.get_blog_queryset import (
+    attach_latest_comments,
+    get_comment_values,
+    get_latest_comment_values,
+    get_published_post_rows,
+    get_published_posts,
+)
+
+
+class PublishedFeedQueryCountTest(TestCase):
+    """
+    The published feed must load a page in a fixed number of queries,
+    whatever the number of posts and comments on it.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        self.category = Category.objects.create(name="Health")
+
+    def create_posts(self, count, comments_per_post=2):
+        for i in range(count):
+            post = BlogPost.objects.create(
+                author=self.user,
+                title=f"Post {i}",
+                content="Content",
+                category=self.category,
+                status="published",
+                deleted_at=False,
+            )
+            for j in range(comments_per_post):
+                Comment.objects.create(
+                    author="reader",
+                    email="reader@example.com",
+                    content=f"Comment {j}",
+                    blog_post=post,
+                )
+
+    def serialize_feed(self):
+        blog_posts = attach_latest_comments(get_published_posts())
+        return BlogFeedSerializer(blog_posts, many=True).data
+
+    def test_query_count_is_constant(self):
+        self.create_posts(1)
+        with self.assertNumQueries(2):
+            data = self.serialize_feed()
+        self.assertEqual(len(data), 1)
+
+        self.create_posts(9)
+        with self.assertNumQueries(2):
+            data = self.serialize_feed()
+        self.assertEqual(len(data), 10)
+        self.assertEqual(len(data[0]["comments"]), 2)
+        self.assertEqual(data[0]["category"], "Health")
+
+    def test_only_latest_comments_are_embedded(self):
+        self.create_posts(2, comments_per_post=5)
+        with self.assertNumQueries(2):
+            data = self.serialize_feed()
+        for blog in data:
+            self.assertEqual(
+                [comment["content"] for comment in blog["comments"]],
+                ["Comment 2", "Comment 3", "Comment 4"],
+            )
+
+    def test_feed_view_query_count(self):
+        self.create_posts(3)
+        # count, page
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("blogapiset1"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("comments", response.data["results"]["data"][0])
+
+        # count, page, comments prefetch
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("blogapiset1"), {"include": "comments"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]["data"][0]["comments"]), 2)
+
+
+class SearchIndexTest(TestCase):
+    """
+    The search endpoint ranks posts through the full-text search index.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        health = Category.objects.create(name="Health")
+        work = Category.objects.create(name="Work")
+        self.sleep = self.create_post("The Importance of Sleep", "Sleeping well matters.", health)
+        self.yoga = self.create_post("The Benefits of Yoga", "Yoga helps you sleep.", health)
+        self.work = self.create_post("10 Tips for a Productive Workday", "Plan ahead.", work)
+
+    def create_post(self, title, content, category, status="published"):
+        return BlogPost.objects.create(
+            author=self.user, title=title, content=content,
+            category=category, status=status, deleted_at=False)
+
+    def test_stemming_and_ranking(self):
+        self.assertEqual(search_index.search("sleeps"), [self.sleep.id, self.yoga.id])
+
+    def test_prefix_matching(self):
+        self.assertEqual(search_index.search("produc"), [self.work.id])
+
+    def test_prefix_of_last_letters(self):
+        snoring = self.create_post("Zzzs all night", "Snoring", self.sleep.category)
+        self.create_post("Été", "Summer", self.sleep.category)
+        self.assertEqual(search_index.search("zzz"), [snoring.id])
+
+    def test_category_match(self):
+        self.assertEqual(set(search_index.search("health")), {self.sleep.id, self.yoga.id})
+
+    def test_unpublished_and_deleted_posts_are_removed(self):
+        self.yoga.deleted_at = True
+        self.yoga.save()
+        self.create_post("Sleep drafts", "sleep", self.sleep.category, status="draft")
+        self.assertEqual(search_index.search("sleep"), [self.sleep.id])
+
+    def test_any_script_and_stop_words_only(self):
+        japanese = self.create_post("日本語の記事", "本文", self.sleep.category)
+        stop_words = self.create_post("The It", "Content", self.sleep.category)
+        self.assertEqual(search_index.search("日本語の記事"), [japanese.id])
+        self.assertEqual(search_index.search("日本語"), [japanese.id])
+        self.assertEqual(search_index.search("The It"), [stop_words.id])
+        self.assertEqual(search_index.search("The"), [])
+        self.assertEqual(search_index.search("ＹＯＧＡ"), [self.yoga.id])
+
+    def test_collection_stats_are_maintained(self):
+        def expected():
+            stats = SearchDocument.objects.aggregate(count=Count("pk"), length=Sum("length"))
+            return search_index.to_collection_stats(
+                {"document_count": stats["count"], "total_length": stats["length"] or 0})
+
+        self.assertEqual(search_index.get_collection_stats(), expected())
+        self.yoga.content = "Yoga helps you sleep, and stretch, and breathe."
+        self.yoga.save()
+        self.work.status = "draft"
+        self.work.save()
+        self.sleep.delete()
+        self.assertEqual(search_index.get_collection_stats(), expected())
+        self.assertEqual(search_index.get_collection_stats()["total"], 1)
+        search_index.rebuild()
+        self.assertEqual(search_index.get_collection_stats(), expected())
+
+        # Postings, then the statistics row: the documents are not scanned
+        with CaptureQueriesContext(connection) as queries:
+            search_index.search("yoga")
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("COUNT(", queries[-1]["sql"])
+
+    def test_search_view(self):
+        response = self.client.get(reverse("searchblogs"), {"search": "yoga"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"]["data"][0]["id"], self.yoga.id)
+
+
+class CursorPaginationTest(TestCase):
+    """
+    Keyset pagination walks the feed without OFFSET or COUNT queries.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        category = Category.objects.create(name="Health")
+        self.posts = [
+            BlogPost.objects.create(
+                author=user, title=f"Post {i}", content="Content",
+                category=category, status="published", deleted_at=False)
+            for i in range(5)
+        ]
+
+    def walk(self, url, params):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(blog["id"] for blog in response.data["results"]["data"])
+            if not response.data["next"]:
+                return ids
+            response = self.client.get(response.data["next"])
+
+    def test_walks_feed_newest_first(self):
+        ids = self.walk(reverse("blogapiset1"), {"pagination": "cursor", "page_size": 2})
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+
+    def test_page_is_count_free(self):
+        params = {"pagination": "cursor", "page_size": 2, "include": "comments"}
+        # page, comments prefetch
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("blogapiset1"), params)
+        self.assertNotIn("count", response.data)
+
+        response = self.client.get(reverse("blogapiset1"), {**params, "count": "true"})
+        self.assertEqual(response.data["count"], 5)
+
+    def test_search_keeps_ranking(self):
+        ids = self.walk(reverse("searchblogs"), {
+            "pagination": "cursor", "page_size": 2, "search": "post"})
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+
+    def test_search_cursor_survives_removed_posts(self):
+        params = {"pagination": "cursor", "page_size": 2, "search": "post"}
+        response = self.client.get(reverse("searchblogs"), params)
+        first_page = [blog["id"] for blog in response.data["results"]["data"]]
+        # The post under the cursor leaves the results
+        next_url = response.data["next"]
+        BlogPost.objects.get(pk=first_page[-1]).delete()
+
+        response = self.client.get(next_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [blog["id"] for blog in response.data["results"]["data"]],
+            [post.id for post in reversed(self.posts)][2:4])
+
+        cursor = KeysetPagination().encode_cursor(["high", 1, 0])
+        response = self.client.get(reverse("searchblogs"), {**params, "cursor": cursor})
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse("blogapiset1"), {"pagination": "cursor", "cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+
+class AsyncViewTest(TestCase):
+    """
+    The async read views return the same data as the sync ones.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        category = Category.objects.create(name="Health")
+        for i in range(3):
+            post = BlogPost.objects.create(
+                author=self.user, title=f"Yoga post {i}", content="Content",
+                category=category, status="published", deleted_at=False)
+            Comment.objects.create(
+                author="reader", email="reader@example.com",
+                content="Nice", blog_post=post)
+
+    def assertSameResponse(self, name, params):
+        response = self.client.get(reverse(name), params)
+        async_response = self.client.get(reverse("async" + name), params)
+        self.assertEqual(async_response.status_code, response.status_code)
+        # Only the links of the pages differ
+        self.assertEqual(
+            async_response.content.decode().replace("/async/", "/"),
+            response.content.decode(),
+        )
+
+    def test_feed(self):
+        self.assertSameResponse("blogapiset1", {"page": 2})
+        self.assertSameResponse("blogapiset1", {"page": 9})
+        self.assertSameResponse("blogapiset1", {"pagination": "cursor", "count": "true"})
+
+    def test_search(self):
+        self.assertSameResponse("searchblogs", {"search": "yoga"})
+        self.assertSameResponse("searchblogs", {"search": "yoga", "pagination": "cursor"})
+        self.assertSameResponse("searchblogs", {})
+
+    async def test_async_client(self):
+        response = await self.async_client.get(reverse("asyncblogapiset1"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 3)
+
+    def test_post_creates_blog(self):
+        token = Token.objects.create(user=self.user)
+        response = self.client.post(
+            reverse("asyncblogapiset1"),
+            {"title": "New", "content": "Content", "category": "Health"},
+            HTTP_AUTHORIZATION=f"Token {token.key}",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(BlogPost.objects.filter(title="New").exists())
+
+
+class CommentStatsTest(TestCase):
+    """
+    Posts carry their comment count and last comment time, kept up to date
+    by the comment endpoint and the repair command.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        self.token = Token.objects.create(user=self.user)
+        self.post = BlogPost.objects.create(
+            author=self.user, title="Post", content="Content",
+            category=Category.objects.create(name="Health"),
+            status="published", deleted_at=False)
+
+    def test_comment_endpoint_updates_stats(self):
+        url = reverse("blogapiset2", args=[self.post.id])
+        for comment in ("First", "Second"):
+            response = self.client.post(
+                url, {"comment": comment}, HTTP_AUTHORIZATION=f"Token {self.token.key}")
+            self.assertEqual(response.status_code, 201)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        self.assertEqual(
+            self.post.last_commented_at,
+            Comment.objects.latest("created_at").created_at,
+        )
+        data = self.client.get(reverse("blogapiset1")).data["results"]["data"][0]
+        self.assertEqual(data["comment_count"], 2)
+
+    def test_writes_keep_concurrent_comments(self):
+        def comment(content):
+            # Counted after the post was loaded (and cached), without
+            # invalidating its cached copy
+            comment_stats.record_comment(Comment.objects.bulk_create([Comment(
+                author="reader", email="reader@example.com",
+                content=content, blog_post=self.post)])[0])
+
+        blog_post = get_blog_object.get_object(self.post.id)
+        comment("First")
+        serializer = BlogSerializer(blog_post, data={"title": "Edited"}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.comment_count), ("Edited", 1))
+
+        get_blog_object.get_object(self.post.id)
+        comment("Second")
+        response = self.client.delete(
+            reverse("blogapiset2", args=[self.post.id]),
+            HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.assertEqual(response.status_code, 200)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.deleted_at, self.post.comment_count), (True, 2))
+
+    def test_repair(self):
+        comment = Comment.objects.create(
+            author="reader", email="reader@example.com",
+            content="Nice", blog_post=self.post)
+        call_command("repair_comment_stats", batch_size=1, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.post.last_commented_at, comment.created_at)
+
+        comment.delete()
+        out = StringIO()
+        call_command("repair_comment_stats", stdout=out)
+        self.assertIn("Repaired 1 blog posts.", out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.comment_count, self.post.last_commented_at), (0, None))
+
+    def test_repair_drops_cached_pages(self):
+        BlogPost.objects.filter(pk=self.post.pk).update(comment_count=5)
+        urls = [reverse("blogapiset1"), reverse("blogapiset2", args=[self.post.id])]
+
+        def get_counts():
+            return [
+                self.client.get(urls[0]).data["results"]["data"][0]["comment_count"],
+                self.client.get(urls[1]).data["data"]["comment_count"],
+            ]
+
+        self.assertEqual(get_counts(), [5, 5])
+        call_command("repair_comment_stats", stdout=StringIO())
+        self.assertEqual(get_counts(), [0, 0])
+
+
+class CommentListTest(TestCase):
+    """
+    The comments of a post are listed oldest first, one keyset page at a time.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        self.post = BlogPost.objects.create(
+            author=user, title="Post", content="Content",
+            category=Category.objects.create(name="Health"),
+            status="published", deleted_at=False)
+        self.comments = [
+            Comment.objects.create(
+                author="reader", email="reader@example.com",
+                content=f"Comment {i}", blog_post=self.post)
+            for i in range(5)
+        ]
+
+    def test_walks_comments_oldest_first(self):
+        ids = []
+        # post check, page
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse("blogcomments", args=[self.post.id]), {"page_size": 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(comment["id"] for comment in response.data["results"]["data"])
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(ids, [comment.id for comment in self.comments])
+
+    def test_unpublished_post(self):
+        BlogPost.objects.filter(pk=self.post.pk).update(status="draft")
+        response = self.client.get(reverse("blogcomments", args=[self.post.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+def make_image(width, height, image_format="PNG", color=(200, 30, 30)):
+    output = BytesIO()
+    Image.new("RGB", (width, height), color).save(output, image_format)
+    return output.getvalue()
+
+
+class ImagePipelineTest(TestCase):
+    """
+    Uploaded images are validated, then resized to content-addressed
+    variants exposed as srcset values.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        self.token = Token.objects.create(user=self.user)
+
+    def upload(self, content, name="photo.png"):
+        return self.client.post(
+            reverse("blogapiset1"),
+            {
+                "title": "Photo", "content": "Content", "category": "Travel",
+                "status": "published", "image": SimpleUploadedFile(name, content),
+            },
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+
+    def test_variants_and_srcset(self):
+        response = self.upload(make_image(700, 350))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["data"]["image_srcset"], {})
+
+        post = BlogPost.objects.get(pk=response.data["data"]["id"])
+        variants = images.process(post.pk)
+        # No upscaling past the 700px original
+        self.assertEqual(list(variants["formats"]["webp"]), ["320", "640"])
+        self.assertEqual(list(variants["formats"]["jpeg"]), ["320", "640"])
+        self.assertTrue(variants["formats"]["jpeg"]["640"].endswith(".jpg"))
+        with default_storage.open(variants["formats"]["webp"]["320"]) as file:
+            self.assertEqual(Image.open(file).size, (320, 160))
+
+        post.refresh_from_db()
+        srcset = BlogSerializer(post).data["image_srcset"]
+        self.assertRegex(srcset["webp"], r"^/media/blog_images/variants/\w\w/\w{64}\.webp 320w, ")
+
+    def test_identical_images_share_variants(self):
+        content = make_image(400, 400)
+        first = BlogPost.objects.get(pk=self.upload(content).data["data"]["id"])
+        second = BlogPost.objects.get(pk=self.upload(content).data["data"]["id"])
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            images.process(first.pk)["formats"],
+            images.process(second.pk)["formats"],
+        )
+
+    def test_invalid_uploads(self):
+        response = self.upload(b"not an image")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("image", response.data["error"])
+
+        with mock.patch.object(images, "MAX_PIXELS", 100):
+            response = self.upload(make_image(20, 20))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(BlogPost.objects.exists())
+
+
+class ContentAddressedStorageTest(TestCase):
+    """
+    Identical uploads are stored once and unreferenced files are collected.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        self.category = Category.objects.create(name="Travel")
+
+    def create_post(self, content, name="photo.PNG"):
+        post = BlogPost(
+            author=self.user, title="Photo", content="Content",
+            category=self.category, status="published", deleted_at=False)
+        post.image.save(name, ContentFile(content))
+        return post
+
+    def test_duplicates_are_stored_once(self):
+        content = make_image(10, 10)
+        first = self.create_post(content)
+        second = self.create_post(content, name="copy.png")
+        other = self.create_post(make_image(10, 10, color=(0, 0, 255)))
+
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(first.image.name, f"blog_images/{digest[:2]}/{digest}.png")
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertNotEqual(other.image.name, first.image.name)
+        with first.image.open("rb") as file:
+            self.assertEqual(file.read(), content)
+
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).ref_count, 2)
+        self.assertEqual(len(os.listdir(os.path.dirname(first.image.path))), 1)
+        # No temporary file is left behind
+        self.assertFalse(any(
+            name.endswith(".tmp")
+            for name in os.listdir(default_storage.path("blog_images"))))
+
+    def test_soft_deleted_posts_release_references(self):
+        first = self.create_post(make_image(10, 10))
+        second = self.create_post(make_image(10, 10))
+        path = first.image.path
+        MediaBlob.objects.update(last_saved_at=timezone.now() - timedelta(days=1))
+
+        first.deleted_at = True
+        first.save()
+        call_command("gc_media_blobs", stdout=StringIO())
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        second.deleted_at = True
+        second.save()
+        out = StringIO()
+        call_command("gc_media_blobs", stdout=out)
+        self.assertIn("Deleted 1 unreferenced images", out.getvalue())
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_unused_variants_are_collected(self):
+        first = self.create_post(make_image(400, 200))
+        second = self.create_post(make_image(400, 200, color=(0, 0, 255)))
+        first_paths = set(images.process(first.pk)["formats"]["webp"].values())
+        second_paths = set(images.process(second.pk)["formats"]["webp"].values())
+        first.deleted_at = True
+        first.save()
+
+        # Recent variants may belong to an image being processed
+        call_command("gc_media_blobs", stdout=StringIO())
+        self.assertTrue(all(default_storage.exists(path) for path in first_paths))
+
+        old = time.time() - 86400
+        for path in first_paths | second_paths:
+            os.utime(default_storage.path(path), (old, old))
+        call_command("gc_media_blobs", stdout=StringIO())
+        self.assertFalse(any(default_storage.exists(path) for path in first_paths))
+        self.assertTrue(all(default_storage.exists(path) for path in second_paths))
+
+    def test_rolled_back_uploads_are_collected(self):
+        class Rollback(Exception):
+            pass
+
+        with self.assertRaises(Rollback), transaction.atomic():
+            path = self.create_post(make_image(10, 10)).image.path
+            raise Rollback
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertTrue(os.path.exists(path))
+
+        # Recent files may belong to an upload not committed yet
+        call_command("gc_media_blobs", stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+
+        old = time.time() - 86400
+        os.utime(path, (old, old))
+        out = StringIO()
+        call_command("gc_media_blobs", stdout=out)
+        self.assertIn("Deleted 1 unreferenced images", out.getvalue())
+        self.assertFalse(os.path.exists(path))
+
+    def test_recent_uploads_are_kept(self):
+        post = self.create_post(make_image(10, 10))
+        BlogPost.objects.filter(pk=post.pk).delete()
+        call_command("gc_media_blobs", stdout=StringIO())
+        self.assertEqual(MediaBlob.objects.get().ref_count, 0)
+        self.assertTrue(os.path.exists(post.image.path))
+
+
+class ConditionalGetTest(TestCase):
+    """
+    Listing pages carry validators and unchanged pages are answered with
+    304 before anything is read or serialized.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        self.post = BlogPost.objects.create(
+            author=user, title="Yoga", content="Content",
+            category=Category.objects.create(name="Health"),
+            status="published", deleted_at=False)
+        # Last-Modified is only sent once the second of the last write is over
+        page_cache.cache.set(page_cache.MODIFIED_KEY, time.time() - 2, timeout=None)
+
+    def assertNotModified(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0), \
+                mock.patch.object(page_cache, "get_or_set_page") as get_or_set_page:
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        get_or_set_page.assert_not_called()
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.client.get(
+            url, params, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def test_listings(self):
+        self.assertNotModified(reverse("blogapiset1"))
+        self.assertNotModified(reverse("searchblogs"), {"search": "yoga"})
+        self.assertNotModified(reverse("blogcomments", args=[self.post.id]))
+        self.assertNotModified(reverse("asyncblogapiset1"))
+
+    def test_write_changes_validators(self):
+        url = reverse("blogapiset1")
+        etag = self.assertNotModified(url)
+        self.assertNotEqual(
+            self.client.get(url, {"page": 1}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Comment.objects.create(
+            author="reader", email="reader@example.com",
+            content="Nice", blog_post=self.post)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_writes_in_the_same_second(self):
+        url = reverse("blogapiset1")
+
+        def comment():
+            Comment.objects.create(
+                author="reader", email="reader@example.com",
+                content="Nice", blog_post=self.post)
+
+        clock = mock.Mock()
+        with mock.patch.object(page_cache, "time", clock):
+            clock.time.return_value = 1_000_000.2
+            comment()
+            clock.time.return_value = 1_000_000.5
+            # The second of the write is not over: a later write in it
+            # could not change the date
+            self.assertNotIn("Last-Modified", self.client.get(url))
+
+            clock.time.return_value = 1_000_001.1
+            last_modified = self.client.get(url)["Last-Modified"]
+            self.assertEqual(self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+            clock.time.return_value = 1_000_001.4
+            comment()
+            clock.time.return_value = 1_000_002.5
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["Last-Modified"], last_modified)
+
+
+class SinglePostTest(TestCase):
+    """
+    Single posts are served from a per-object cache that the writes to the
+    post and its comments invalidate.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        self.token = Token.objects.create(user=self.user)
+        self.post = BlogPost.objects.create(
+            author=self.user, title="Yoga", content="Content",
+            category=Category.objects.create(name="Health"),
+            status="published", deleted_at=False)
+        self.url = reverse("blogapiset2", args=[self.post.id])
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {self.token.key}"}
+
+    def test_cached_and_conditional(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["title"], "Yoga")
+        self.assertEqual(response.data["data"]["comments"], [])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).data, response.data)
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_writes_invalidate(self):
+        self.client.get(self.url)
+
+        response = self.client.put(
+            self.url, {"title": "Pilates"}, content_type="application/json", **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url).data["data"]["title"], "Pilates")
+
+        response = self.client.post(self.url, {"comment": "Nice"}, **self.auth)
+        self.assertEqual(response.status_code, 201)
+        data = self.client.get(self.url).data["data"]
+        self.assertEqual(data["comment_count"], 1)
+        self.assertEqual(data["comments"][0]["content"], "Nice")
+
+        self.assertEqual(self.client.delete(self.url, **self.auth).status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_write_paths_fetch_the_post_once(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(
+                self.url, {"title": "Pilates"}, content_type="application/json", **self.auth)
+            self.client.post(self.url, {"comment": "Nice"}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        # The post is not read again by the put, and read once by the comment
+        # (the put invalidated the cached one)
+        post_reads = [
+            query["sql"] for query in queries
+            if query["sql"].startswith("SELECT") and 'FROM "blog_blogpost"' in query["sql"]
+        ]
+        self.assertEqual(len(post_reads), 1)
+
+    def test_drafts_are_only_shown_to_their_author(self):
+        BlogPost.objects.filter(pk=self.post.pk).update(status="draft")
+        self.post.save(update_fields=["title"])
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(self.url, **self.auth).status_code, 200)
+
+
+class FastSerializerTest(TestCase):
+    """
+    The fast read serializers render exactly the JSON of the DRF serializers.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(username="author", password="secret")
+        category = Category.objects.create(name="Santé")
+        for i in range(4):
+            post = BlogPost.objects.create(
+                author=user, title=f"Post {i} \u2014 \"quoted\"", content="Line\nbreak",
+                category=category, status="published", deleted_at=False)
+            for j in range(i):
+                Comment.objects.create(
+                    author="reader", email="reader@example.com",
+                    content=f"Comment {j}", blog_post=post)
+        # An image with its variants, and one without
+        name = "blog_images/ab/abcdef.jpg"
+        BlogPost.objects.filter(pk=post.pk).update(image=name, image_variants={
+            "source": name, "formats": {"webp": {"320": "blog_images/variants/ab/ab.webp"}}})
+        BlogPost.objects.filter(pk=post.pk - 1).update(image="blog_images/cd/cdef.png")
+        BlogPost.objects.create(
+            author=user, title="Draft", content="Content", category=category,
+            status="draft", deleted_at=False)
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def assertSameJSON(self, expected, data):
+        self.assertEqual(self.render(data), self.render(expected))
+
+    def test_summary(self):
+        expected = BlogSummarySerializer(get_published_posts(), many=True).data
+        self.assertSameJSON(expected, fast_serializers.serialize_posts(get_published_post_rows()))
+
+    def test_feed_with_latest_comments(self):
+        blog_posts = attach_latest_comments(get_published_posts())
+        expected = BlogFeedSerializer(blog_posts, many=True).data
+        rows = list(get_published_post_rows())
+        comments = get_latest_comment_values([row["id"] for row in rows])
+        self.assertSameJSON(expected, fast_serializers.serialize_posts(rows, comments))
+
+    def test_all_comments_in_another_timezone(self):
+        with timezone.override("Asia/Kolkata"):
+            expected = BlogReadSerializer(get_published_posts(), many=True).data
+            rows = list(get_published_post_rows())
+            comments = get_comment_values([row["id"] for row in rows])
+            self.assertSameJSON(expected, fast_serializers.serialize_posts(rows, comments))
+        self.assertIn("+05:30", expected[0]["created_on"])
+
+    def test_views(self):
+        for url, params, serializer in (
+            (reverse("blogapiset1"), {"page_size": 10}, BlogSummarySerializer),
+            (reverse("blogapiset1"), {"include": "comments", "pagination": "cursor"},
+             BlogFeedSerializer),
+            (reverse("searchblogs"), {"search": "post"}, BlogFeedSerializer),
+        ):
+            page_cache.invalidate()
+            response = self.client.get(url, params)
+            data = json.loads(response.content)["results"]["data"]
+            ids = [post["id"] for post in data]
+            self.assertTrue(ids)
+            blog_posts = attach_latest_comments(get_published_posts().in_bulk(ids)[id] for id in ids)
+            self.assertEqual(data, json.loads(self.render(serializer(blog_posts, many=True).data)))
+
+
+class ExportTest(TestCase):
+    """
+    The export streams every published post with its comments, reading
+    the table one chunk at a time.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        self.category = Category.objects.create(name="Health")
+        self.posts = []
+        for i in range(5):
+            post = BlogPost.objects.create(
+                author=self.user, title=f"Post {i}", content="Content",
+                category=self.category, status="published", deleted_at=False)
+            Comment.objects.create(
+                author="reader", email="reader@example.com",
+                content="Nice", blog_post=post)
+            self.posts.append(post)
+        BlogPost.objects.create(
+            author=self.user, title="Draft", content="Content",
+            category=self.category, status="draft", deleted_at=False)
+
+    def export(self, **params):
+        response = self.client.get(reverse("blogexport"), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_ndjson_in_chunks(self):
+        # posts and their comments, per chunk of two posts
+        with mock.patch.object(export, "CHUNK_SIZE", 2), \
+                CaptureQueriesContext(connection) as queries:
+            response, content = self.export()
+        self.assertEqual(len(queries), 6)
+        self.assertTrue(all("LIMIT 2" in query["sql"] for query in queries[::2]))
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row["id"] for row in rows], [post.id for post in self.posts])
+        self.assertEqual(rows[0]["comments"][0]["content"], "Nice")
+
+    def test_array_matches_feed_serializer(self):
+        response, content = self.export(output="array")
+        expected = json.loads(json.dumps(
+            BlogReadSerializer(get_published_posts().order_by("id"), many=True).data))
+        self.assertEqual(json.loads(content), expected)
+
+    def test_since_lists_changes_and_deletions(self):
+        since = timezone.now() + timedelta(hours=1)
+        BlogPost.objects.filter(pk=self.posts[0].pk).update(
+            updated_on=since + timedelta(seconds=1))
+        BlogPost.objects.filter(pk=self.posts[1].pk).update(
+            deleted_at=True, updated_on=since + timedelta(seconds=2))
+        Comment.objects.filter(blog_post=self.posts[2]).update(
+            created_at=since + timedelta(seconds=3))
+        BlogPost.objects.filter(pk=self.posts[2].pk).update(
+            last_commented_at=since + timedelta(seconds=3))
+
+        response, content = self.export(since=since.isoformat())
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(rows[0]["id"], self.posts[2].id)
+        self.assertEqual(rows[1]["id"], self.posts[0].id)
+        self.assertEqual(rows[2], {"id": self.posts[1].id, "deleted": True})
+
+    def test_since_chunks_resume_after_equal_times(self):
+        since = timezone.now() + timedelta(hours=1)
+        BlogPost.objects.update(updated_on=since)
+        with mock.patch.object(export, "CHUNK_SIZE", 2):
+            response, content = self.export(since=(since - timedelta(seconds=1)).isoformat())
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [row["id"] for row in rows],
+            sorted(BlogPost.objects.values_list("pk", flat=True)))
+
+    def test_conditional_requests(self):
+        page_cache.cache.set(page_cache.MODIFIED_KEY, time.time() - 2, timeout=None)
+        response, content = self.export()
+        url = reverse("blogexport")
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304)
+
+        Comment.objects.create(
+            author="reader", email="reader@example.com",
+            content="New", blog_post=self.posts[0])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_parameters(self):
+        url = reverse("blogexport")
+        self.assertEqual(self.client.get(url, {"output": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"since": "yesterday"}).status_code, 400)
+
+
+class QueryPlanTest(TestCase):
+    """
+    The read endpoints' queries are answered from indexes.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        post = BlogPost.objects.create(
+            author=user, title="Healthy breakfast", content="Content",
+            category=Category.objects.create(name="Health"),
+            status="published", deleted_at=False)
+        Comment.objects.create(
+            author="reader", email="reader@example.com", content="Nice", blog_post=post)
+
+    def test_no_full_table_scan(self):
+        stdout = StringIO()
+        call_command("check_query_plans", stdout=stdout)
+        # The queries the endpoints run are checked, not copies of them
+        self.assertIn("OK         export #1", stdout.getvalue())
+        self.assertIn("OK         comments #1", stdout.getvalue())
+
+    def test_every_read_endpoint_is_checked(self):
+        url_names = {pattern.name for pattern in blog_urls.urlpatterns}
+        checked = {url_name for name, url_name, args, params in check_query_plans.ENDPOINTS}
+        self.assertEqual(url_names - checked - set(check_query_plans.WRITE_ONLY_ENDPOINTS), set())
+
+    def test_full_scan_is_reported(self):
+        queries = {
+            "unindexed": ["SELECT id FROM blog_comment WHERE content = 'Nice'"],
+            "subquery": [
+                "SELECT * FROM (SELECT id, ROW_NUMBER() OVER (ORDER BY id) AS position "
+                "FROM blog_blogpost WHERE id IN (1, 2)) ranked WHERE position <= 1"
+            ],
+        }
+        with mock.patch.object(check_query_plans, "get_endpoint_queries", return_value=queries):
+            with self.assertRaisesMessage(CommandError, "1 query fall back"):
+                call_command("check_query_plans", stdout=StringIO())
+
+
+class PageCacheTest(TestCase):
+    """
+    Feed pages are served from the cache until a post or comment is written.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        self.category = Category.objects.create(name="Health")
+        self.post = BlogPost.objects.create(
+            author=self.user, title="Post", content="Content",
+            category=self.category, status="published", deleted_at=False)
+        page_cache.stats.reset()
+
+    def test_hit_and_invalidation(self):
+        url = reverse("blogapiset1") + "?include=comments"
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(page_cache.stats.as_dict(), {"hits": 1, "misses": 1})
+
+        Comment.objects.create(
+            author="reader", email="reader@example.com",
+            content="Nice", blog_post=self.post)
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]["data"][0]["comments"]), 1)
+        self.assertEqual(page_cache.stats.as_dict(), {"hits": 1, "misses": 2})
+
+    def test_pages_cached_before_commit_are_dropped(self):
+        url = reverse("blogapiset1")
+        stale = self.client.get(url).data
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.post.title = "Edited"
+                self.post.save()
+                # Cached by a concurrent request, which does not see the
+                # uncommitted post yet
+                page_cache.get_or_set_page("feed", RequestFactory().get(url), lambda: stale)
+        self.assertEqual(self.client.get(url).data["results"]["data"][0]["title"], "Edited")
+
+
+class BulkAPITest(TestCase):
+    """
+    The bulk endpoint applies many operations in one transaction and
+    reports a result per operation.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        other = User.objects.create_user(
+            username="other", email="other@example.com", password="secret")
+        self.category = Category.objects.create(name="Health")
+        self.post = BlogPost.objects.create(
+            author=self.user, title="Old title", content="Content",
+            category=self.category, status="published", deleted_at=False)
+        self.deleted = BlogPost.objects.create(
+            author=self.user, title="To delete", content="Content",
+            category=self.category, status="published", deleted_at=False)
+        self.foreign = BlogPost.objects.create(
+            author=other, title="Not mine", content="Content",
+            category=self.category, status="published", deleted_at=False)
+        self.token = Token.objects.create(user=self.user)
+
+    def post_operations(self, operations):
+        return self.client.post(
+            reverse("blogapibulk"), operations, content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_operations(self):
+        operations = [
+            {"title": f"New {i}", "content": "Bulk content", "category": "Imported",
+             "status": "published"}
+            for i in range(3)
+        ]
+        operations += [
+            {"op": "update", "id": self.post.id, "title": "New title", "category": "Health"},
+            {"op": "delete", "id": self.deleted.id},
+            {"op": "delete", "id": self.foreign.id},
+            {"op": "create", "title": "Missing fields"},
+        ]
+        response = self.post_operations(operations)
+        self.assertEqual(response.status_code, 200)
+
+        results = response.data["data"]
+        self.assertEqual([result["status"] for result in results],
+                         [True] * 5 + [False, False])
+        self.assertEqual(
+            list(BlogPost.objects.filter(id__in=[r["id"] for r in results[:3]])
+                 .values_list("category__name", flat=True)),
+            ["Imported"] * 3)
+        self.assertEqual(Category.objects.filter(name="Imported").count(), 1)
+
+        self.post.refresh_from_db()
+        self.deleted.refresh_from_db()
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.post.title, "New title")
+        self.assertTrue(self.deleted.deleted_at)
+        self.assertFalse(self.foreign.deleted_at)
+
+        self.assertEqual(len(search_index.search("bulk")), 3)
+        self.assertEqual(search_index.search("delete"), [])
+
+    def test_same_post_updated_twice(self):
+        response = self.post_operations([
+            {"op": "update", "id": self.post.id, "content": "First"},
+            {"op": "update", "id": self.post.id, "content": "Second"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.content, "Second")
+        self.assertEqual(search_index.search("second"), [self.post.id])
+
+    def test_requires_authentication(self):
+        response = self.client.post(
+            reverse("blogapibulk"), [], content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+
+
+class CategoryTest(TestCase):
+    """
+    Category ids are cached by name, and the published post count of every
+    category is maintained on each write and listed by the categories
+    endpoint.
+    """
+
+    def setUp(self):
+        categories.local_cache.clear()
+        self.user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {Token.objects.create(user=self.user).key}"}
+        self.health = Category.objects.create(name="Health")
+
+    def create_post(self, category="Health", status="published"):
+        response = self.client.post(
+            reverse("blogapiset1"),
+            {"title": "Post", "content": "Content", "category": category, "status": status},
+            **self.auth)
+        self.assertEqual(response.status_code, 201)
+        return response.data["data"]["id"]
+
+    def update_post(self, post_id, **data):
+        response = self.client.put(
+            reverse("blogapiset2", args=[post_id]), json.dumps(data),
+            content_type="application/json", **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def get_counts(self):
+        response = self.client.get(reverse("blogcategories"))
+        self.assertEqual(response.status_code, 200)
+        return [(row["name"], row["published_count"]) for row in response.data["data"]]
+
+    def test_counts_follow_writes(self):
+        post_id = self.create_post()
+        self.create_post(status="draft")
+        self.create_post(category="Travel")
+        self.create_post(category="Travel")
+        self.assertEqual(self.get_counts(), [("Travel", 2), ("Health", 1)])
+
+        self.update_post(post_id, category="Travel")
+        self.assertEqual(self.get_counts(), [("Travel", 3)])
+        self.update_post(post_id, status="draft")
+        self.assertEqual(self.get_counts(), [("Travel", 2)])
+        response = self.update_post(post_id, status="published", category="Health")
+        self.assertEqual(response.data["data"]["category"], "Health")
+        self.assertEqual(self.get_counts(), [("Travel", 2), ("Health", 1)])
+
+        response = self.client.delete(reverse("blogapiset2", args=[post_id]), **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_counts(), [("Travel", 2)])
+        BlogPost.objects.filter(category__name="Travel").first().delete()
+        self.assertEqual(self.get_counts(), [("Travel", 1)])
+
+    def test_bulk_counts(self):
+        post_id = self.create_post()
+        response = self.client.post(
+            reverse("blogapibulk"),
+            [
+                {"title": "New", "content": "Content", "category": "Imported", "status": "published"},
+                {"title": "Draft", "content": "Content", "category": "Imported"},
+                {"op": "update", "id": post_id, "category": "Imported"},
+                {"op": "update", "id": post_id, "title": "Renamed"},
+            ],
+            content_type="application/json", **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_counts(), [("Imported", 2)])
+
+        # The page cache is invalidated on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("blogapibulk"), [{"op": "delete", "id": post_id}],
+                content_type="application/json", **self.auth)
+        self.assertEqual(self.get_counts(), [("Imported", 1)])
+
+    def test_repair(self):
+        self.create_post()
+        self.create_post(category="Travel")
+        # Writes without signals are not counted
+        BlogPost.objects.filter(category=self.health).update(status="draft")
+        CategoryStats.objects.filter(category__name="Travel").delete()
+
+        out = StringIO()
+        call_command("repair_category_stats", stdout=out)
+        self.assertIn("Repaired 2 categories.", out.getvalue())
+        self.assertEqual(self.get_counts(), [("Travel", 1)])
+
+    def test_drifted_counts_stop_at_zero(self):
+        self.create_post()
+        self.create_post()
+        stats = CategoryStats.objects.filter(category=self.health)
+        stats.update(published_count=1)
+        with CaptureQueriesContext(connection) as queries:
+            category_stats.record([(self.health.pk, None)] * 2)
+        self.assertEqual(stats.get().published_count, 0)
+        # Never computed below zero in SQL (unsigned columns reject it)
+        self.assertFalse([
+            query for query in queries
+            if "GREATEST(" in query["sql"].upper() or "MAX(" in query["sql"].upper()
+        ])
+
+        stats.update(published_count=3)
+        category_stats.record([(self.health.pk, None)] * 2)
+        self.assertEqual(stats.get().published_count, 1)
+
+    def test_unchanged_category_is_not_looked_up(self):
+        post_id = self.create_post()
+        with CaptureQueriesContext(connection) as queries:
+            self.update_post(post_id, content="Updated")
+        self.assertFalse([
+            query for query in queries
+            if 'FROM "blog_category"' in query["sql"] or 'INTO "blog_category"' in query["sql"]
+        ])
+
+    def test_cached_ids(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            created = categories.get_categories(["Health", "New"])
+        self.assertEqual(created["Health"].pk, self.health.pk)
+        self.assertEqual(Category.objects.get(name="New").pk, created["New"].pk)
+
+        with self.assertNumQueries(0):
+            cached = categories.get_categories(["Health", "New"])
+        self.assertEqual({name: category.pk for name, category in cached.items()},
+                         {name: category.pk for name, category in created.items()})
+
+        # Renames invalidate the cache
+        self.health.name = "Wellness"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.health.save()
+        self.assertNotEqual(categories.get_category("Health").pk, self.health.pk)
+
+    def test_invalidation_from_other_processes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            categories.get_category("Health")
+        # Another process renamed the category and bumped the generation
+        Category.objects.filter(pk=self.health.pk).update(name="Wellness")
+        page_cache.bump(categories.GENERATION_KEY)
+
+        with mock.patch.object(categories.local_cache, "checked_at", time.monotonic()):
+            self.assertEqual(categories.get_category("Health").pk, self.health.pk)
+        with mock.patch.object(categories.local_cache, "checked_at", time.monotonic() - 60):
+            self.assertNotEqual(categories.get_category("Health").pk, self.health.pk)
+
+
+class TimelineTest(TestCase):
+    """
+    Published posts are fanned out to the timelines of their author and of
+    their category on write, and the timeline endpoints read a page of ids
+    from them.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="author", email="author@example.com", password="secret")
+        self.other = User.objects.create_user(
+            username="other", email="other@example.com", password="secret")
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {Token.objects.create(user=self.user).key}"}
+        self.health = Category.objects.create(name="Health")
+        self.travel = Category.objects.create(name="Travel")
+        now = timezone.now()
+        self.posts = []
+        for i in range(6):
+            self.posts.append(BlogPost.objects.create(
+                author=self.user if i % 2 else self.other, title=f"Post {i}",
+                content="Content", category=self.health if i < 4 else self.travel,
+                status="published", deleted_at=False))
+        # Distinct creation times, the newest post last. They never change
+        # after creation, so the timelines are built again
+        for i, blog_post in enumerate(self.posts):
+            BlogPost.objects.filter(pk=blog_post.pk).update(created_on=now - timedelta(minutes=10 - i))
+        timelines.rebuild()
+
+    def get_ids(self, url_name, owner_id, **params):
+        response = self.client.get(reverse(url_name, args=[owner_id]), params)
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data["results"]["data"]]
+
+    def get_timelines(self):
+        return (
+            self.get_ids("authortimeline", self.user.pk, pagination="cursor"),
+            self.get_ids("categorytimeline", self.health.pk, pagination="cursor"),
+        )
+
+    def test_timelines(self):
+        ids = [blog_post.pk for blog_post in self.posts]
+        self.assertEqual(self.get_timelines(), ([ids[5], ids[3], ids[1]], [ids[3], ids[2], ids[1], ids[0]]))
+        self.assertEqual(self.get_ids("categorytimeline", self.travel.pk), [ids[5]])
+        self.assertEqual(self.get_ids("categorytimeline", 0), [])
+
+    def test_fan_out_on_write(self):
+        ids = [blog_post.pk for blog_post in self.posts]
+        url = reverse("blogapiset2", args=[ids[3]])
+        response = self.client.put(
+            url, json.dumps({"category": "Travel"}), content_type="application/json", **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_timelines(), ([ids[5], ids[3], ids[1]], [ids[2], ids[1], ids[0]]))
+        self.assertEqual(self.get_ids("categorytimeline", self.travel.pk, pagination="cursor"),
+                         [ids[5], ids[4], ids[3]])
+
+        self.client.put(
+            url, json.dumps({"status": "draft"}), content_type="application/json", **self.auth)
+        self.client.delete(reverse("blogapiset2", args=[ids[1]]), **self.auth)
+        self.assertEqual(self.get_timelines(), ([ids[5]], [ids[2], ids[0]]))
+
+        self.client.put(
+            url, json.dumps({"status": "published"}), content_type="application/json", **self.auth)
+        self.assertEqual(self.get_timelines()[0], [ids[5], ids[3]])
+
+        BlogPost.objects.get(pk=ids[5]).delete()
+        self.assertEqual(self.get_timelines()[0], [ids[3]])
+
+    def test_bulk_fan_out(self):
+        ids = [blog_post.pk for blog_post in self.posts]
+        response = self.client.post(
+            reverse("blogapibulk"),
+            [
+                {"title": "New", "content": "Content", "category": "Health", "status": "published"},
+                {"title": "Draft", "content": "Content", "category": "Health"},
+                {"op": "update", "id": ids[3], "category": "Travel"},
+                {"op": "delete", "id": ids[1]},
+            ],
+            content_type="application/json", **self.auth)
+        self.assertEqual(response.status_code, 200)
+        new_id = response.data["data"][0]["id"]
+        self.assertEqual(self.get_timelines(), ([new_id, ids[5], ids[3]], [new_id, ids[2], ids[0]]))
+
+    def test_cursor_pages_and_query_count(self):
+        ids = [blog_post.pk for blog_post in self.posts]
+        url = reverse("categorytimeline", args=[self.health.pk])
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {"pagination": "cursor", "page_size": 3})
+        self.assertEqual([row["id"] for row in response.data["results"]["data"]],
+                         [ids[3], ids[2], ids[1]])
+        response = self.client.get(response.data["next"])
+        self.assertEqual([row["id"] for row in response.data["results"]["data"]], [ids[0]])
+        self.assertIsNone(response.data["next"])
+
+        # Page numbers, one post per page
+        self.assertEqual(self.get_ids("categorytimeline", self.health.pk, page=2), [ids[2]])
+
+    def test_rebuild(self):
+        TimelineEntry.objects.all().delete()
+        BlogPost.objects.filter(pk=self.posts[0].pk).update(status="draft")
+        out = StringIO()
+        call_command("rebuild_timelines", batch_size=2, stdout=out)
+        self.assertIn("Listed 5 blog posts.", out.getvalue())
+        self.assertEqual(TimelineEntry.objects.count(), 10)
+        self.assertEqual(
+            self.get_ids("categorytimeline", self.health.pk, pagination="cursor"),
+            [self.posts[3].pk, self.posts[2].pk, self.posts[1].pk])
 
-# Create your tests here.
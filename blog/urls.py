@@ -1,13 +1,28 @@
+from django.conf import settings
 from django.urls import path
+from blog.async_views import AsyncBlogAPISet1View, AsyncSearchAPIView
 from blog.views import (
+    AuthorTimelineAPIView,
     BlogAPISet1View,
     BlogAPISet2View,
+    BlogBulkAPIView,
+    BlogExportAPIView,
+    CategoryListAPIView,
+    CategoryTimelineAPIView,
+    CommentListAPIView,
     SearchAPIView,
 )
+
+# The feed and search views served on the main endpoints
+if getattr(settings, "BLOG_ASYNC_VIEWS", False):
+    ListView, SearchView = AsyncBlogAPISet1View, AsyncSearchAPIView
+else:
+    ListView, SearchView = BlogAPISet1View, SearchAPIView
+
 urlpatterns = [
     # User's Blog API for create and list blog API endpoint
     path("blog-api-set1/",
-         BlogAPISet1View.as_view(),
+         ListView.as_view(),
          name="blogapiset1"),
 
     # User's Blog API for update, delete and comment on blog API endpoint
@@ -15,8 +30,46 @@ urlpatterns = [
          BlogAPISet2View.as_view(),
          name="blogapiset2"),
 
+    # Comments of a blog API endpoint
+    path("<int:id>/comments/",
+         CommentListAPIView.as_view(),
+         name="blogcomments"),
+
+    # Categories with their published blog post count API endpoint
+    path("categories/",
+         CategoryListAPIView.as_view(),
+         name="blogcategories"),
+
+    # Published blogs of an author, and of a category API endpoints
+    path("authors/<int:id>/posts/",
+         AuthorTimelineAPIView.as_view(),
+         name="authortimeline"),
+
+    path("categories/<int:id>/posts/",
+         CategoryTimelineAPIView.as_view(),
+         name="categorytimeline"),
+
+    # User's Blog API for bulk create, update and delete API endpoint
+    path("blog-api-bulk/",
+         BlogBulkAPIView.as_view(),
+         name="blogapibulk"),
+
+    # Streaming export of all published blogs API endpoint
+    path("blog-export/",
+         BlogExportAPIView.as_view(),
+         name="blogexport"),
+
     # Search Blogs API endpoint
     path("search-blogs/",
-         SearchAPIView.as_view(),
+         SearchView.as_view(),
          name="searchblogs"),
+
+    # Async variants of the create and list, and search endpoints
+    path("async/blog-api-set1/",
+         AsyncBlogAPISet1View.as_view(),
+         name="asyncblogapiset1"),
+
+    path("async/search-blogs/",
+         AsyncSearchAPIView.as_view(),
+         name="asyncsearchblogs"),
 ]
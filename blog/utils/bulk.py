@@ -0,0 +1,150 @@
+"""
+Bulk create, update and soft delete of blog posts.
+
+Operations are validated one by one, then applied together: the posts to
+change are fetched in one query, the categories resolved from the category
+cache (plus one query and one `bulk_create` for the unknown ones) and the
+posts written with `bulk_create`/`bulk_update` inside a single transaction. Every operation
+gets its own result, invalid ones are reported and skipped.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from blog.models import BlogPost
+from blog.serializers import BlogSerializer
+from blog.utils import cache, categories, category_stats, images, search_index, timelines
+
+MAX_OPERATIONS = getattr(settings, "BLOG_BULK_MAX_OPERATIONS", 1000)
+
+BATCH_SIZE = 500
+
+OPERATIONS = ("create", "update", "delete")
+
+UPDATE_FIELDS = BlogPost.EDITABLE_FIELDS
+
+
+def error_result(index, op, error):
+    return {"index": index, "op": op, "status": False, "error": error}
+
+
+def validate(operations, author):
+    """
+    Validate the operations and check the author's rights on the posts.
+
+    Returns the results of the invalid operations by index, and the valid
+    (index, op, validated_data, blog_post) tuples.
+    """
+    results = {}
+    valid = []
+
+    ids = [
+        item.get("id") for item in operations
+        if isinstance(item, dict) and item.get("op") in ("update", "delete")
+    ]
+    blog_posts = BlogPost.objects.filter(
+        id__in=[id for id in ids if isinstance(id, int)],
+        deleted_at=False,
+    ).select_related("category").in_bulk()
+
+    for index, item in enumerate(operations):
+        if not isinstance(item, dict):
+            results[index] = error_result(index, None, "Operation must be an object.")
+            continue
+        op = item.get("op", "create")
+        if op not in OPERATIONS:
+            results[index] = error_result(index, op, f"Unknown operation '{op}'.")
+            continue
+
+        blog_post = None
+        if op != "create":
+            blog_post = blog_posts.get(item.get("id"))
+            if blog_post is None:
+                results[index] = error_result(index, op, "Blog Post Does Not Exist.")
+                continue
+            if blog_post.author_id != author.pk:
+                results[index] = error_result(
+                    index, op, f"You Have No Rights to {op.capitalize()}.[OnlyAuthor]")
+                continue
+
+        validated_data = {}
+        if op != "delete":
+            data = {key: value for key, value in item.items() if key not in ("op", "id")}
+            serializer = BlogSerializer(data=data, partial=op == "update")
+            if not serializer.is_valid():
+                results[index] = error_result(index, op, serializer.errors)
+                continue
+            validated_data = serializer.validated_data
+
+        valid.append((index, op, validated_data, blog_post))
+    return results, valid
+
+
+def apply_operations(operations, author):
+    """
+    Apply a list of create/update/delete operations on blog posts.
+
+    Returns one result dict per operation, in order.
+    """
+    results, valid = validate(operations, author)
+
+    names = {data["category"] for index, op, data, blog_post in valid if "category" in data}
+    now = timezone.now()
+    created = []
+    changed = []
+
+    with transaction.atomic():
+        resolved = categories.get_categories(names)
+
+        for index, op, data, blog_post in valid:
+            if "category" in data:
+                data = {**data, "category": resolved[data["category"]]}
+            if op == "create":
+                created.append((index, BlogPost(author=author, deleted_at=False, **data)))
+                continue
+            if op == "update":
+                for field, value in data.items():
+                    setattr(blog_post, field, value)
+            else:
+                blog_post.deleted_at = True
+            # bulk_update() does not apply auto_now
+            blog_post.updated_on = now
+            changed.append((index, op, blog_post))
+
+        new_posts = [blog_post for index, blog_post in created]
+        if connection.features.can_return_rows_from_bulk_insert:
+            BlogPost.objects.bulk_create(new_posts, batch_size=BATCH_SIZE)
+            post_changes = [
+                (blog_post, None, blog_post.get_counted_category_id()) for blog_post in new_posts]
+        else:
+            # Without returned primary keys the results could not give ids
+            # (saved posts are counted by the post_save signal)
+            for blog_post in new_posts:
+                blog_post.save()
+            post_changes = []
+        BlogPost.objects.bulk_update(
+            [blog_post for index, op, blog_post in changed],
+            UPDATE_FIELDS,
+            batch_size=BATCH_SIZE,
+        )
+
+        # Bulk writes send no post_save signal, keep the category counts,
+        # timelines, index, images and cache in sync
+        changed_posts = {blog_post.pk: blog_post for index, op, blog_post in changed}
+        post_changes += [
+            (blog_post, blog_post.loaded_counted_category_id, blog_post.get_counted_category_id())
+            for blog_post in changed_posts.values()
+        ]
+        category_stats.record((before, after) for blog_post, before, after in post_changes)
+        timelines.record(post_changes)
+        written = new_posts + [blog_post for index, op, blog_post in changed]
+        search_index.index_posts(written)
+        images.schedule(written)
+        for index, op, blog_post in changed:
+            cache.invalidate_object(blog_post.pk)
+        cache.invalidate()
+
+    for index, blog_post in created:
+        results[index] = {"index": index, "op": "create", "status": True, "id": blog_post.pk}
+    for index, op, blog_post in changed:
+        results[index] = {"index": index, "op": op, "status": True, "id": blog_post.pk}
+    return [results[index] for index in range(len(operations))]
@@ -0,0 +1,233 @@
+"""
+Read-through cache of the serialized blog listing pages and posts.
+
+Pages are cached under a key made of the endpoint, the full request URL
+(query, page number or cursor) and a generation number. Any write to a blog
+post or a comment bumps the generation, which makes every cached page
+unreachable at once without having to find and delete the keys; the stale
+entries simply expire.
+
+Single posts are cached the same way, with one generation per post that is
+bumped by the writes to that post and its comments.
+
+It uses Django's cache framework, so it runs on whatever `CACHES` points
+to (LocMem in development and tests, Redis in production).
+"""
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import quote_etag
+
+GENERATION_KEY = "blog:generation"
+
+MODIFIED_KEY = "blog:modified"
+
+PAGE_CACHE_TIMEOUT = getattr(settings, "BLOG_PAGE_CACHE_TIMEOUT", 300)
+
+
+class CacheStats:
+    """
+    Thread-safe, in-process hit and miss counters.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def reset(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+
+stats = CacheStats()
+
+
+def get_generation(key=GENERATION_KEY):
+    """
+    Return the current cache generation (of the pages, or of the counter
+    at `key`).
+
+    A missing generation (first use, eviction, cache restart) is started
+    from the current time in milliseconds, so it can never go back to a
+    value whose pages are still cached.
+    """
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+async def aget_generation():
+    """
+    Async variant of `get_generation`.
+    """
+    generation = await cache.aget(GENERATION_KEY)
+    if generation is None:
+        await cache.aadd(GENERATION_KEY, int(time.time() * 1000), timeout=None)
+        generation = await cache.aget(GENERATION_KEY)
+    return generation
+
+
+def get_last_modified():
+    """
+    Return the time (epoch seconds) of the last blog write.
+
+    When it is unknown it is taken as now, so clients never get a 304 for
+    data that might have changed.
+    """
+    modified = cache.get(MODIFIED_KEY)
+    if modified is None:
+        cache.add(MODIFIED_KEY, time.time(), timeout=None)
+        modified = cache.get(MODIFIED_KEY)
+    return modified
+
+
+async def aget_last_modified():
+    """
+    Async variant of `get_last_modified`.
+    """
+    modified = await cache.aget(MODIFIED_KEY)
+    if modified is None:
+        await cache.aadd(MODIFIED_KEY, time.time(), timeout=None)
+        modified = await cache.aget(MODIFIED_KEY)
+    return modified
+
+
+def invalidate():
+    """
+    Invalidate every cached page by moving to the next generation.
+
+    The generation is bumped again once the transaction is committed, so a
+    page cached from a concurrent read in the meantime is not kept.
+    """
+    bump_pages()
+    transaction.on_commit(bump_pages)
+
+
+def bump_pages():
+    cache.set(MODIFIED_KEY, time.time(), timeout=None)
+    bump(GENERATION_KEY)
+
+
+def bump(key):
+    """
+    Move the generation at `key` to the next value.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No generation yet: starting one is enough
+        get_generation(key)
+
+
+def get_object_generation_key(blog_post_id):
+    return f"blog:post:{blog_post_id}:generation"
+
+
+def get_object_key(blog_post_id, generation, kind):
+    """
+    Return the cache key of the `kind` ("object" or "data") of a post.
+    """
+    return f"blog:post:{blog_post_id}:{generation}:{kind}"
+
+
+def invalidate_object(blog_post_id):
+    """
+    Invalidate the cached copies of one blog post.
+
+    The generation is bumped again once the transaction is committed, so a
+    copy cached from a concurrent read in the meantime is not kept.
+    """
+    key = get_object_generation_key(blog_post_id)
+    bump(key)
+    transaction.on_commit(lambda: bump(key))
+
+
+def get_page_key(endpoint, request, generation=None):
+    if generation is None:
+        generation = get_generation()
+    url = request.build_absolute_uri()
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return f"blog:page:{endpoint}:{generation}:{digest}"
+
+
+def to_last_modified(timestamp):
+    """
+    Return the `Last-Modified` (epoch seconds) of data last written at
+    `timestamp`, or None while it cannot be sent yet.
+
+    HTTP dates are whole seconds, so truncating the write time would give
+    a second write in the same second the same date, answered with a 304
+    to the clients that fetched in between. The end of the second of the
+    write is used instead, and only once that second is over: any later
+    write then moves it.
+    """
+    last_modified = int(timestamp) + 1
+    if last_modified > time.time():
+        return None
+    return last_modified
+
+
+def get_validators(endpoint, request, generation, last_modified):
+    """
+    Return the `ETag` and `Last-Modified` (epoch seconds, or None, see
+    `to_last_modified`) of a page.
+
+    They are derived from the cache generation and the last write time
+    only, so a request can be answered with 304 without any query.
+    """
+    key = get_page_key(endpoint, request, generation)
+    etag = quote_etag(hashlib.sha1(key.encode("utf-8")).hexdigest())
+    return etag, to_last_modified(last_modified)
+
+
+def get_or_set_page(endpoint, request, build, generation=None):
+    """
+    Return the cached page of `endpoint` for this request, calling
+    `build()` to produce and cache it on a miss.
+    """
+    key = get_page_key(endpoint, request, generation)
+    data = cache.get(key)
+    if data is not None:
+        stats.record(hit=True)
+        return data
+
+    stats.record(hit=False)
+    data = build()
+    cache.set(key, data, timeout=PAGE_CACHE_TIMEOUT)
+    return data
+
+
+async def aget_or_set_page(endpoint, request, build, generation=None):
+    """
+    Async variant of `get_or_set_page`, `build` is a coroutine function.
+    """
+    if generation is None:
+        generation = await aget_generation()
+    key = get_page_key(endpoint, request, generation)
+    data = await cache.aget(key)
+    if data is not None:
+        stats.record(hit=True)
+        return data
+
+    stats.record(hit=False)
+    data = await build()
+    await cache.aset(key, data, timeout=PAGE_CACHE_TIMEOUT)
+    return data
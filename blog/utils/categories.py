@@ -0,0 +1,138 @@
+"""
+In-process cache of the category ids by name.
+
+Every blog post write names its category, which used to cost a
+`get_or_create` (one or two queries) per write. Categories are only ever
+created by those writes, so a name keeps its id until the category is
+renamed or deleted (admin, shell). The ids are kept in a per-process dict,
+filled from the database on a miss, and the missing categories are created
+with one `bulk_create`.
+
+Renames and deletions (see `blog.signals`) clear the local copy and bump a
+generation in Django's cache. Every process compares it to the generation
+of its own copy at most every `CHECK_INTERVAL` seconds, so other workers
+drop their stale ids within that delay.
+
+Ids are only cached once the transaction that read or created them is
+committed, so a rolled back category is never handed out.
+"""
+import threading
+import time
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from blog.models import Category
+from blog.utils import cache
+
+GENERATION_KEY = "blog:categories:generation"
+
+CHECK_INTERVAL = getattr(settings, "BLOG_CATEGORY_CACHE_CHECK_INTERVAL", 5)
+
+
+class CategoryCache:
+    """
+    Thread-safe name -> (id, stored name) dict, cleared when the shared
+    generation changes.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.generation = None
+        self.checked_at = None
+
+    def sync(self):
+        """
+        Drop the entries if the shared generation moved since they were
+        cached, checking at most every `check_interval` seconds.
+        """
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.check_interval:
+            return
+        generation = cache.get_generation(GENERATION_KEY)
+        with self.lock:
+            if generation != self.generation:
+                self.entries.clear()
+                self.generation = generation
+            self.checked_at = now
+
+    def get_many(self, names):
+        self.sync()
+        with self.lock:
+            return {name: self.entries[name] for name in names if name in self.entries}
+
+    def set_many(self, entries):
+        with self.lock:
+            self.entries.update(entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.checked_at = None
+
+
+local_cache = CategoryCache(CHECK_INTERVAL)
+
+
+def clear():
+    local_cache.clear()
+    cache.bump(GENERATION_KEY)
+
+
+def invalidate():
+    """
+    Drop the cached category ids of every process.
+
+    They are dropped again once the transaction is committed, so ids cached
+    from a concurrent read in the meantime are not kept.
+    """
+    clear()
+    transaction.on_commit(clear)
+
+
+def read(names):
+    """
+    Return the name -> (id, stored name) of the existing categories.
+    """
+    return {
+        name: (category_id, name)
+        for category_id, name in Category.objects.filter(name__in=names).values_list("id", "name")
+    }
+
+
+def get_categories(names):
+    """
+    Return a name -> Category dict, creating the missing categories.
+
+    The categories are only loaded with their id and name.
+    """
+    names = set(names)
+    entries = local_cache.get_many(names)
+    missing = names - entries.keys()
+    if missing:
+        found = read(missing)
+        new = missing - found.keys()
+        if new:
+            Category.objects.bulk_create(
+                [Category(name=name) for name in sorted(new)], ignore_conflicts=True)
+            # Re-read them, not every backend returns the new primary keys
+            found.update(read(new))
+        for name in missing - found.keys():
+            # Matched by the database collation only (case or trailing
+            # spaces on MySQL)
+            category = Category.objects.get_or_create(name=name)[0]
+            found[name] = (category.pk, category.name)
+        transaction.on_commit(lambda: local_cache.set_many(found))
+        entries.update(found)
+
+    return {
+        name: Category.from_db(DEFAULT_DB_ALIAS, ["id", "name"], entry)
+        for name, entry in entries.items()
+    }
+
+
+def get_category(name):
+    """
+    Return the Category named `name`, creating it if needed.
+    """
+    return get_categories([name])[name]
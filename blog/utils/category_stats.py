@@ -0,0 +1,124 @@
+"""
+Denormalized published post counts of the categories.
+
+`CategoryStats.published_count` lets the category listing show how many
+published posts every category has without a `GROUP BY` over the posts.
+Saved and deleted posts are counted by signal receivers (`blog.signals`),
+which also fan them out to the timelines (`blog.utils.timelines`). A post
+loaded from the database remembers the category it was counted in
+(`BlogPost.from_db`), so a save only moves the count when the post was
+published, unpublished, soft deleted or moved to another category. Bulk
+writes send no signals and count their posts with `record`.
+
+Counts are changed with `F()` expressions, so concurrent writes never lose
+an update. Writes made some other way (`QuerySet.update`, raw SQL) are
+reconciled by `repair`.
+"""
+from collections import Counter
+from django.db.models import Count, F
+from blog.models import BlogPost, Category, CategoryStats
+
+
+def get_loaded_category_id(blog_post):
+    """
+    Return the category a blog post is counted in, in the database.
+    """
+    if blog_post._state.adding:
+        return None
+    try:
+        return blog_post.loaded_counted_category_id
+    except AttributeError:
+        # Loaded with deferred fields
+        loaded = BlogPost.objects.filter(pk=blog_post.pk).only(
+            "status", "deleted_at", "category").first()
+        return loaded.get_counted_category_id() if loaded else None
+
+
+def record(changes):
+    """
+    Count changes of the posts' categories, given as (before, after)
+    category ids, None standing for posts that are not counted.
+    """
+    deltas = Counter()
+    for before, after in changes:
+        if before == after:
+            continue
+        if before is not None:
+            deltas[before] -= 1
+        if after is not None:
+            deltas[after] += 1
+
+    # In id order, so concurrent writers lock the rows in the same order
+    for category_id, delta in sorted(deltas.items()):
+        if delta > 0:
+            updated = CategoryStats.objects.filter(category_id=category_id).update(
+                published_count=F("published_count") + delta)
+            if not updated:
+                CategoryStats.objects.get_or_create(category_id=category_id)
+                CategoryStats.objects.filter(category_id=category_id).update(
+                    published_count=F("published_count") + delta)
+        elif delta < 0:
+            # Never below zero, even when the counts drifted. Not clamped in
+            # SQL, a negative intermediate value fails on unsigned columns
+            stats = CategoryStats.objects.filter(category_id=category_id)
+            if not stats.filter(published_count__gte=-delta).update(
+                    published_count=F("published_count") + delta):
+                stats.update(published_count=0)
+
+
+def remember(blog_post):
+    """
+    Make sure a blog post about to be saved or deleted knows the category
+    it is counted in, in the database.
+    """
+    blog_post.loaded_counted_category_id = get_loaded_category_id(blog_post)
+
+
+def pop_change(blog_post, deleted=False):
+    """
+    Return the (before, after) categories a written blog post (after
+    `remember`) is counted in, and remember the new one.
+    """
+    after = None if deleted else blog_post.get_counted_category_id()
+    before = blog_post.loaded_counted_category_id
+    blog_post.loaded_counted_category_id = after
+    return before, after
+
+
+def get_published_counts():
+    """
+    Return the categories having published posts with their count, most
+    used first.
+    """
+    rows = CategoryStats.objects.filter(published_count__gt=0).order_by(
+        "-published_count", "category__name"
+    ).values_list("category_id", "category__name", "published_count")
+    return [
+        {"id": category_id, "name": name, "published_count": count}
+        for category_id, name, count in rows
+    ]
+
+
+def repair():
+    """
+    Recompute the counts of every category and save the ones that drifted.
+
+    Returns the number of repaired categories.
+    """
+    counts = dict(
+        BlogPost.objects.filter(status="published", deleted_at=False)
+        .values_list("category_id").annotate(count=Count("pk")).order_by()
+    )
+    stats = dict(CategoryStats.objects.values_list("category_id", "published_count"))
+
+    changed = []
+    missing = []
+    for category_id in Category.objects.values_list("pk", flat=True):
+        count = counts.get(category_id, 0)
+        if category_id not in stats:
+            missing.append(CategoryStats(category_id=category_id, published_count=count))
+        elif stats[category_id] != count:
+            changed.append(CategoryStats(category_id=category_id, published_count=count))
+    CategoryStats.objects.bulk_create(missing, batch_size=500, ignore_conflicts=True)
+    CategoryStats.objects.bulk_update(changed, ["published_count"], batch_size=500)
+    return len(changed) + len(missing)
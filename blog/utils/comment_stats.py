@@ -0,0 +1,67 @@
+"""
+Denormalized comment statistics of the blog posts.
+
+`BlogPost.comment_count` and `BlogPost.last_commented_at` let the listings
+show how much a post is commented without loading its comments. They are
+updated with `F()` expressions in the transaction creating a comment, so
+concurrent comments never lose an increment. Comments written some other
+way (admin, shell, deletions) are reconciled by `repair`.
+"""
+from django.db.models import Count, F, Max, Value
+from django.db.models.functions import Coalesce, Greatest
+from blog.models import BlogPost, Comment
+from blog.utils import cache
+
+
+def record_comment(comment):
+    """
+    Count a new comment on its blog post.
+    """
+    created_at = Value(comment.created_at)
+    BlogPost.objects.filter(pk=comment.blog_post_id).update(
+        comment_count=F("comment_count") + 1,
+        # Comments committed out of order must not move it back
+        last_commented_at=Greatest(Coalesce("last_commented_at", created_at), created_at),
+    )
+
+
+def repair(batch_size=500):
+    """
+    Recompute the statistics of every blog post, one batch of posts at a
+    time, and save the ones that drifted, dropping their cached pages.
+
+    Returns the number of repaired posts.
+    """
+    repaired = 0
+    last_id = 0
+    while True:
+        blog_posts = list(
+            BlogPost.objects.filter(pk__gt=last_id).order_by("pk").only(
+                "pk", "comment_count", "last_commented_at")[:batch_size]
+        )
+        if not blog_posts:
+            return repaired
+        last_id = blog_posts[-1].pk
+
+        stats = {
+            row["blog_post_id"]: row
+            for row in Comment.objects.filter(
+                blog_post_id__in=[blog_post.pk for blog_post in blog_posts]
+            ).values("blog_post_id").annotate(
+                count=Count("pk"), last=Max("created_at")
+            ).order_by()
+        }
+        changed = []
+        for blog_post in blog_posts:
+            row = stats.get(blog_post.pk, {"count": 0, "last": None})
+            if (blog_post.comment_count, blog_post.last_commented_at) != (row["count"], row["last"]):
+                blog_post.comment_count = row["count"]
+                blog_post.last_commented_at = row["last"]
+                changed.append(blog_post)
+        BlogPost.objects.bulk_update(changed, ["comment_count", "last_commented_at"])
+        if changed:
+            # bulk_update() sends no signals
+            for blog_post in changed:
+                cache.invalidate_object(blog_post.pk)
+            cache.invalidate()
+        repaired += len(changed)
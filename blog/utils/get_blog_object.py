@@ -1,13 +1,27 @@
+from django.core.cache import cache as django_cache
 from blog.models import BlogPost
+from blog.utils import cache
 from rest_framework.exceptions import NotFound
 
 
-def get_object(id):
-    try:
-        return BlogPost.objects.get(id=id, deleted_at=False)
-    except BlogPost.DoesNotExist:
-        raise NotFound({
-            "status": False,
-            "message": "Blog Post Does Not Exist.",
-            "data": None
-        })
+def get_object(id, generation=None):
+    """
+    Return the non-deleted blog post with its category, from the cache when
+    it holds the current version of the post.
+    """
+    if generation is None:
+        generation = cache.get_generation(cache.get_object_generation_key(id))
+    key = cache.get_object_key(id, generation, "object")
+
+    blog_post = django_cache.get(key)
+    if blog_post is None:
+        try:
+            blog_post = BlogPost.objects.select_related("category").get(id=id, deleted_at=False)
+        except BlogPost.DoesNotExist:
+            raise NotFound({
+                "status": False,
+                "message": "Blog Post Does Not Exist.",
+                "data": None
+            })
+        django_cache.set(key, blog_post, timeout=cache.PAGE_CACHE_TIMEOUT)
+    return blog_post
@@ -0,0 +1,165 @@
+from django.conf import settings
+from blog.models import BlogPost, Comment
+from blog.utils.fast_serializers import COMMENT_FIELDS, POST_FIELDS
+
+LATEST_COMMENTS = getattr(settings, "BLOG_FEED_LATEST_COMMENTS", 3)
+
+
+def get_published_posts():
+    """
+    Return the published, non-deleted blog posts with their author and
+    category joined in the same query.
+
+    The comments are not loaded: `attach_latest_comments` adds the latest
+    ones of a page with one extra query.
+    """
+    return BlogPost.objects.filter(
+        status="published",
+        deleted_at=False,
+    ).select_related(
+        "category",
+        "author",
+    )
+
+
+def get_published_post_rows():
+    """
+    `get_published_posts` as `.values()` rows, for the fast serializers.
+    """
+    return BlogPost.objects.filter(
+        status="published",
+        deleted_at=False,
+    ).values(*POST_FIELDS)
+
+
+def attach_latest_comments(blog_posts, limit=LATEST_COMMENTS):
+    """
+    Set `latest_comments` on the blog posts to their `limit` latest
+    comments, oldest first.
+    """
+    blog_posts = list(blog_posts)
+    latest = get_latest_comments([blog_post.pk for blog_post in blog_posts], limit)
+    for blog_post in blog_posts:
+        blog_post.latest_comments = latest[blog_post.pk]
+    return blog_posts
+
+
+def get_latest_comments(post_ids, limit=LATEST_COMMENTS):
+    """
+    Return {post id: its `limit` latest comments, oldest first}.
+
+    They are fetched with a single window-function query (Django 4.1 cannot
+    filter on window expressions, hence the raw SQL), so the cost is
+    bounded by the page size whatever the number of comments of a post.
+    """
+    latest = {post_id: [] for post_id in post_ids}
+    if latest:
+        table = Comment._meta.db_table
+        placeholders = ", ".join(["%s"] * len(latest))
+        comments = Comment.objects.raw(
+            f"""
+            SELECT * FROM (
+                SELECT {table}.*, ROW_NUMBER() OVER (
+                    PARTITION BY blog_post_id ORDER BY created_at DESC, id DESC
+                ) AS row_position
+                FROM {table}
+                WHERE blog_post_id IN ({placeholders})
+            ) ranked
+            WHERE row_position <= %s
+            ORDER BY blog_post_id, created_at, id
+            """,
+            [*latest, limit],
+        )
+        for comment in comments:
+            latest[comment.blog_post_id].append(comment)
+    return latest
+
+
+def get_latest_comment_values(post_ids, limit=LATEST_COMMENTS):
+    """
+    `get_latest_comments` as column values, for the fast serializers.
+    """
+    return {
+        post_id: [vars(comment) for comment in comments]
+        for post_id, comments in get_latest_comments(post_ids, limit).items()
+    }
+
+
+def get_comment_values(post_ids):
+    """
+    Return {post id: all its comments as column values, by id}.
+    """
+    comments = {post_id: [] for post_id in post_ids}
+    if comments:
+        for row in Comment.objects.filter(
+            blog_post_id__in=post_ids
+        ).order_by("id").values(*COMMENT_FIELDS):
+            comments[row["blog_post_id"]].append(row)
+    return comments
+
+
+def includes_comments(request):
+    """
+    Whether the listing request asked for the comments (?include=comments)
+    rather than the comment statistics only.
+    """
+    return "comments" in request.query_params.get("include", "").split(",")
+
+
+def is_published(status, deleted_at):
+    return status == "published" and not deleted_at
+
+
+def get_published_posts_by_ids(ids):
+    """
+    Return the published posts with the given ids, in the order of `ids`.
+
+    Ids of posts that are no longer published are skipped. The posts are
+    fetched by primary key only and the unpublished ones dropped here: with
+    the status in the query, SQLite scans the feed index of every published
+    post instead.
+    """
+    posts = BlogPost.objects.select_related("category", "author").in_bulk(ids)
+    return [
+        posts[id] for id in ids
+        if id in posts and is_published(posts[id].status, posts[id].deleted_at)
+    ]
+
+
+async def aget_published_posts_by_ids(ids):
+    """
+    Async variant of `get_published_posts_by_ids`.
+    """
+    posts = await BlogPost.objects.select_related("category", "author").ain_bulk(ids)
+    return [
+        posts[id] for id in ids
+        if id in posts and is_published(posts[id].status, posts[id].deleted_at)
+    ]
+
+
+def get_published_post_rows_by_ids(ids):
+    """
+    `get_published_posts_by_ids` as `.values()` rows.
+    """
+    rows = {
+        row["id"]: row
+        for row in BlogPost.objects.filter(pk__in=ids).values(*POST_FIELDS, "deleted_at")
+    }
+    return [
+        rows[id] for id in ids
+        if id in rows and is_published(rows[id]["status"], rows[id]["deleted_at"])
+    ]
+
+
+async def aget_published_post_rows_by_ids(ids):
+    """
+    Async variant of `get_published_post_rows_by_ids`.
+    """
+    rows = {
+        row["id"]: row
+        async for row in BlogPost.objects.filter(pk__in=ids).values(*POST_FIELDS, "deleted_at")
+    }
+    return [
+        rows[id] for id in ids
+        if id in rows and is_published(rows[id]["status"], rows[id]["deleted_at"])
+    ]
@@ -0,0 +1,239 @@
+"""
+Image pipeline of the blog posts.
+
+Uploaded images are checked and fully decoded when the post is validated
+(`validate_upload`), so broken files and decompression bombs are refused
+before anything is stored. After the post is saved, a small bounded thread
+pool resizes the image to `BLOG_IMAGE_WIDTHS` and encodes every width in
+`BLOG_IMAGE_FORMATS` (Pillow releases the GIL while resizing and encoding,
+so the threads run in parallel).
+
+Variants are stored under a path made of the SHA-256 of their content, so
+identical outputs are stored once and can be cached forever by clients and
+CDNs. The result is saved in `BlogPost.image_variants`:
+
+    {"source": "blog_images/cat.png",
+     "formats": {"webp": {"320": "blog_images/variants/ab/ab12....webp", ...},
+                 "jpeg": {...}}}
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+from blog.models import BlogPost
+from blog.utils import cache
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = tuple(getattr(settings, "BLOG_IMAGE_WIDTHS", (320, 640, 1280)))
+FORMATS = tuple(getattr(settings, "BLOG_IMAGE_FORMATS", ("webp", "jpeg")))
+QUALITY = getattr(settings, "BLOG_IMAGE_QUALITY", 80)
+MAX_PIXELS = getattr(settings, "BLOG_IMAGE_MAX_PIXELS", 40_000_000)
+AUTOPROCESS = getattr(settings, "BLOG_IMAGE_AUTOPROCESS", True)
+WORKERS = getattr(settings, "BLOG_IMAGE_WORKERS", 2)
+
+ALLOWED_FORMATS = ("JPEG", "PNG", "WEBP", "GIF")
+
+VARIANTS_DIR = "blog_images/variants"
+
+ENCODERS = {
+    "webp": ("WEBP", {"quality": QUALITY, "method": 4}),
+    "jpeg": ("JPEG", {"quality": QUALITY, "optimize": True, "progressive": True}),
+}
+
+
+def validate_upload(file):
+    """
+    Check that an uploaded file is a supported, decodable image of a
+    reasonable size, and rewind it.
+    """
+    try:
+        image = Image.open(file)
+        if image.format not in ALLOWED_FORMATS:
+            raise serializers.ValidationError(
+                f"Unsupported image format, use one of {', '.join(ALLOWED_FORMATS)}.")
+        # Checked from the header, before the pixels are decoded
+        if image.width * image.height > MAX_PIXELS:
+            raise serializers.ValidationError(
+                f"Image is too large, at most {MAX_PIXELS} pixels are allowed.")
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise serializers.ValidationError("Upload a valid image.")
+    finally:
+        file.seek(0)
+    return file
+
+
+def open_image(file):
+    image = Image.open(file)
+    image.load()
+    # Apply the camera rotation, variants carry no EXIF data
+    return ImageOps.exif_transpose(image)
+
+
+def resize(image, width):
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def get_widths(width):
+    """
+    Return the variant widths for an image `width` wide, never upscaling.
+    """
+    widths = [candidate for candidate in WIDTHS if candidate <= width]
+    return widths or [width]
+
+
+def encode(image, image_format):
+    pillow_format, options = ENCODERS[image_format]
+    if image_format == "jpeg" and image.mode == "RGBA":
+        # No transparency in JPEG: flatten on a white background
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    output = io.BytesIO()
+    image.save(output, pillow_format, **options)
+    return output.getvalue()
+
+
+def store(data, extension):
+    """
+    Store a variant under the hash of its content and return its path.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    path = f"{VARIANTS_DIR}/{digest[:2]}/{digest}.{extension}"
+    if not default_storage.exists(path):
+        path = default_storage.save(path, ContentFile(data))
+    return path
+
+
+def generate_variants(file):
+    """
+    Resize and encode an image file to every width and format.
+
+    Returns a {format: {width: path}} dict.
+    """
+    image = open_image(file)
+    if image.mode not in ("RGB", "RGBA"):
+        # Palette and grayscale images cannot be resampled as is
+        transparent = "transparency" in image.info or "A" in image.getbands()
+        image = image.convert("RGBA" if transparent else "RGB")
+
+    variants = {image_format: {} for image_format in FORMATS}
+    # Largest first, every width is resized from the previous one
+    source = image
+    for width in sorted(get_widths(image.width), reverse=True):
+        if width != source.width:
+            source = resize(source, width)
+        for image_format in FORMATS:
+            extension = "jpg" if image_format == "jpeg" else image_format
+            variants[image_format][str(width)] = store(encode(source, image_format), extension)
+    return {
+        image_format: dict(sorted(widths.items(), key=lambda item: int(item[0])))
+        for image_format, widths in variants.items()
+    }
+
+
+def process(blog_post_id):
+    """
+    Generate the variants of the image of a blog post and save them.
+
+    Returns the saved variants, or None when the post has no image or its
+    image changed while it was processed.
+    """
+    blog_post = BlogPost.objects.filter(pk=blog_post_id).only("pk", "image").first()
+    if blog_post is None or not blog_post.image:
+        return None
+
+    name = blog_post.image.name
+    with blog_post.image.open("rb") as file:
+        variants = {"source": name, "formats": generate_variants(file)}
+
+    # A newer image gets its own run, this result would be stale
+    if not BlogPost.objects.filter(pk=blog_post_id, image=name).update(image_variants=variants):
+        return None
+    # update() sends no post_save signal
+    cache.invalidate()
+    cache.invalidate_object(blog_post_id)
+    return variants
+
+
+def needs_processing(blog_post):
+    variants = blog_post.image_variants or {}
+    return bool(blog_post.image) and variants.get("source") != blog_post.image.name
+
+
+def schedule(blog_posts):
+    """
+    Process the images of the blog posts whose variants are missing or out
+    of date, once the current transaction is committed.
+    """
+    if not AUTOPROCESS:
+        return
+    for blog_post in blog_posts:
+        if needs_processing(blog_post):
+            transaction.on_commit(lambda pk=blog_post.pk: pool.submit(pk))
+
+
+def get_srcset(blog_post):
+    """
+    Return the `srcset` attribute value of every format of the variants of
+    the blog post image, empty until they are generated.
+    """
+    return build_srcset(blog_post.image.name, blog_post.image_variants)
+
+
+def build_srcset(image_name, variants):
+    """
+    `get_srcset` from the stored image name and variants of a blog post.
+    """
+    variants = variants or {}
+    if not image_name or variants.get("source") != image_name:
+        return {}
+    return {
+        image_format: ", ".join(
+            f"{default_storage.url(path)} {width}w" for width, path in widths.items()
+        )
+        for image_format, widths in variants.get("formats", {}).items()
+    }
+
+
+class ImagePool:
+    """
+    Bounded pool of threads processing images in the web process.
+
+    The same post is never queued twice: a post saved again while it waits
+    is processed once, with its latest image.
+    """
+
+    def __init__(self, workers):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blog-images")
+        self.lock = threading.Lock()
+        self.pending = set()
+
+    def submit(self, blog_post_id):
+        with self.lock:
+            if blog_post_id in self.pending:
+                return
+            self.pending.add(blog_post_id)
+        self.executor.submit(self.run, blog_post_id)
+
+    def run(self, blog_post_id):
+        with self.lock:
+            self.pending.discard(blog_post_id)
+        try:
+            process(blog_post_id)
+        except Exception:
+            logger.exception("Image processing of blog post %s failed", blog_post_id)
+        finally:
+            connection.close()
+
+
+pool = ImagePool(WORKERS)
@@ -0,0 +1,169 @@
+"""
+Reference counting and garbage collection of the content-addressed image
+blobs (see `blog.storage`) and of their resized variants (see
+`blog.utils.images`).
+"""
+import re
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.db.models import Count
+from django.utils import timezone
+from blog.models import BlogPost, MediaBlob
+from blog.storage import TEMP_SUFFIX, blog_image_storage
+from blog.utils import images
+
+# Blobs uploaded more recently than this are kept even without references:
+# the post using them may not be committed yet
+GRACE_PERIOD = timedelta(hours=1)
+
+# Directory of the blobs, stored in subdirectories named after the first
+# two hex digits of their digest
+BLOBS_DIR = BlogPost._meta.get_field("image").upload_to.rstrip("/")
+BLOB_SUBDIRECTORY = re.compile(r"[0-9a-f]{2}")
+
+
+def count_references():
+    """
+    Return the number of live (not soft-deleted) posts using each image.
+    """
+    return dict(
+        BlogPost.objects.filter(deleted_at=False).exclude(image="").values_list(
+            "image"
+        ).annotate(count=Count("pk")).order_by()
+    )
+
+
+def get_variant_references(batch_size=500):
+    """
+    Return the paths of the current image variants of the live posts, one
+    batch of posts at a time.
+    """
+    paths = set()
+    last_id = 0
+    while True:
+        rows = list(
+            BlogPost.objects.filter(pk__gt=last_id, deleted_at=False).exclude(image="")
+            .order_by("pk").values_list("pk", "image", "image_variants")[:batch_size]
+        )
+        if not rows:
+            return paths
+        last_id = rows[-1][0]
+        for pk, image, variants in rows:
+            # Variants of a previous image are never served again
+            if variants and variants.get("source") == image:
+                for widths in variants["formats"].values():
+                    paths.update(widths.values())
+
+
+def iter_variant_paths():
+    """
+    Yield the paths of the stored variant files.
+    """
+    try:
+        directories, files = default_storage.listdir(images.VARIANTS_DIR)
+    except FileNotFoundError:
+        return
+    for directory in directories:
+        for name in default_storage.listdir(f"{images.VARIANTS_DIR}/{directory}")[1]:
+            yield f"{images.VARIANTS_DIR}/{directory}/{name}"
+
+
+def collect_variants(grace_period=GRACE_PERIOD, dry_run=False, batch_size=500):
+    """
+    Delete the variant files no live post uses.
+
+    Returns the number of deleted files and the number of bytes freed.
+    """
+    references = get_variant_references(batch_size)
+    cutoff = timezone.now() - grace_period
+    deleted = 0
+    freed = 0
+    for path in iter_variant_paths():
+        # Recent files may belong to an image being processed
+        if path in references or default_storage.get_modified_time(path) >= cutoff:
+            continue
+        deleted += 1
+        freed += default_storage.size(path)
+        if not dry_run:
+            default_storage.delete(path)
+    return deleted, freed
+
+
+def iter_blob_paths():
+    """
+    Yield the paths of the stored blob files and of the temporary files of
+    the uploads.
+    """
+    try:
+        directories, files = blog_image_storage.listdir(BLOBS_DIR)
+    except FileNotFoundError:
+        return
+    for name in files:
+        if name.endswith(TEMP_SUFFIX):
+            yield f"{BLOBS_DIR}/{name}"
+    for directory in directories:
+        if BLOB_SUBDIRECTORY.fullmatch(directory):
+            for name in blog_image_storage.listdir(f"{BLOBS_DIR}/{directory}")[1]:
+                yield f"{BLOBS_DIR}/{directory}/{name}"
+
+
+def collect_orphans(grace_period=GRACE_PERIOD, dry_run=False, batch_size=500):
+    """
+    Delete the blob files without a `MediaBlob` row: their row was rolled
+    back with the transaction of the upload, or the upload was interrupted.
+
+    Returns the number of deleted files and the number of bytes freed.
+    """
+    cutoff = timezone.now() - grace_period
+    # Recent files may belong to an upload not committed yet
+    paths = [
+        path for path in iter_blob_paths()
+        if blog_image_storage.get_modified_time(path) < cutoff
+    ]
+    deleted = 0
+    freed = 0
+    for start in range(0, len(paths), batch_size):
+        batch = paths[start:start + batch_size]
+        known = set(MediaBlob.objects.filter(name__in=batch).values_list("name", flat=True))
+        for path in batch:
+            if path in known:
+                continue
+            deleted += 1
+            freed += blog_image_storage.size(path)
+            if not dry_run:
+                blog_image_storage.delete(path)
+    return deleted, freed
+
+
+def collect(grace_period=GRACE_PERIOD, dry_run=False, batch_size=500):
+    """
+    Recompute the reference counts of the blobs and delete the files of the
+    unreferenced ones, of the ones without a row, and of the unreferenced
+    variants.
+
+    Returns the number of deleted files and the number of bytes freed.
+    """
+    references = count_references()
+    cutoff = timezone.now() - grace_period
+    deleted = 0
+    freed = 0
+    changed = []
+
+    for blob in MediaBlob.objects.order_by("pk").iterator(chunk_size=batch_size):
+        ref_count = references.get(blob.name, 0)
+        if ref_count == 0 and blob.last_saved_at < cutoff:
+            deleted += 1
+            freed += blob.size
+            if not dry_run:
+                blog_image_storage.delete(blob.name)
+                blob.delete()
+            continue
+        if blob.ref_count != ref_count:
+            blob.ref_count = ref_count
+            changed.append(blob)
+
+    if not dry_run:
+        MediaBlob.objects.bulk_update(changed, ["ref_count"], batch_size=batch_size)
+    orphans_deleted, orphans_freed = collect_orphans(grace_period, dry_run, batch_size)
+    variants_deleted, variants_freed = collect_variants(grace_period, dry_run, batch_size)
+    return deleted + orphans_deleted + variants_deleted, freed + orphans_freed + variants_freed
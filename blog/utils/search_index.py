@@ -0,0 +1,330 @@
+"""
+Full-text search over published blog posts.
+
+Posts are indexed into `SearchDocument`/`SearchPosting` rows: an inverted
+index from stemmed terms to the documents containing them. A query only
+touches the postings of its own terms (an indexed `term` lookup), and the
+matching documents are ranked with BM25. The collection statistics BM25
+needs (number of documents, total length) are kept in the `SearchStats`
+row by the indexing, so a query never scans the documents.
+
+Text is split into Unicode words after NFKC normalization and case
+folding, so titles in any script are indexed. Queries without any index term (only stop words or
+punctuation) fall back to an exact title match.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from blog.models import BlogPost, SearchDocument, SearchPosting, SearchStats
+
+# BM25 tuning parameters
+K1 = 1.2
+B = 0.75
+
+# Title terms count this many times towards the term frequency
+TITLE_WEIGHT = 2
+
+# Query tokens at least this long also match terms they are a prefix of
+MIN_PREFIX_LENGTH = 3
+
+# Score factor for a term matched by prefix rather than exactly
+PREFIX_WEIGHT = 0.5
+
+# Characters of an index term sorted the same way by binary and Unicode
+# collations (other characters are matched by prefix with LIKE)
+TERM_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+MAX_TERM_LENGTH = 64
+
+# Letters and digits of any script
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+STATS_ID = 1
+
+STOP_WORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in",
+    "is", "it", "of", "on", "or", "that", "the", "this", "to", "was", "with",
+))
+
+# Suffixes stripped by the stemmer, longest first
+SUFFIXES = (
+    "ational", "ization", "fulness", "iveness", "ations", "ation", "ments",
+    "ment", "ness", "ings", "ing", "edly", "ies", "ied", "ers", "ed", "er",
+    "ly", "es", "s",
+)
+
+
+def stem(word):
+    """
+    Reduce a lowercase word to its stem with a light suffix-stripping stemmer.
+    """
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix in SUFFIXES:
+        if suffix == "s" and word.endswith("ss"):
+            break
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            if suffix in ("ies", "ied"):
+                word += "y"
+            break
+    # Collapse a doubled final consonant ("running" -> "runn" -> "run")
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiouls":
+        word = word[:-1]
+    return word
+
+
+def analyze(text):
+    """
+    Split text into the list of stemmed, stop-word-free index terms.
+    """
+    return [
+        stem(token)[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(unicodedata.normalize("NFKC", text).casefold())
+        if token not in STOP_WORDS
+    ]
+
+
+def get_post_terms(blog_post):
+    """
+    Return a Counter of the weighted term frequencies of a blog post.
+    """
+    terms = Counter()
+    for term in analyze(blog_post.title):
+        terms[term] += TITLE_WEIGHT
+    terms.update(analyze(blog_post.content))
+    terms.update(analyze(blog_post.category.name))
+    return terms
+
+
+def is_searchable(blog_post):
+    return blog_post.status == "published" and not blog_post.deleted_at
+
+
+def index_posts(blog_posts):
+    """
+    (Re)index the given blog posts in bulk.
+
+    Published posts get a fresh document and postings, every other post is
+    removed from the index.
+    """
+    # A post listed twice (e.g. updated twice in one bulk request) is indexed once
+    blog_posts = list({blog_post.pk: blog_post for blog_post in blog_posts}.values())
+    documents = []
+    postings = []
+    for blog_post in blog_posts:
+        if not is_searchable(blog_post):
+            continue
+        terms = get_post_terms(blog_post)
+        document = SearchDocument(blog_post_id=blog_post.pk, length=sum(terms.values()))
+        documents.append(document)
+        postings.extend(
+            SearchPosting(term=term, document=document, frequency=frequency)
+            for term, frequency in terms.items()
+        )
+
+    with transaction.atomic():
+        remove_posts([blog_post.pk for blog_post in blog_posts])
+        SearchDocument.objects.bulk_create(documents)
+        SearchPosting.objects.bulk_create(postings, batch_size=1000)
+        record(len(documents), sum(document.length for document in documents))
+
+
+def index_post(blog_post):
+    index_posts([blog_post])
+
+
+def remove_posts(blog_post_ids):
+    """
+    Remove blog posts from the index.
+    """
+    documents = SearchDocument.objects.filter(blog_post_id__in=blog_post_ids)
+    removed = documents.aggregate(count=Count("pk"), length=Sum("length"))
+    if removed["count"]:
+        documents.delete()
+        record(-removed["count"], -removed["length"])
+
+
+def record(count, length):
+    """
+    Add `count` documents of `length` terms in total to the collection
+    statistics.
+    """
+    if not count:
+        return
+    updated = SearchStats.objects.filter(pk=STATS_ID).update(
+        document_count=F("document_count") + count, total_length=F("total_length") + length)
+    if not updated:
+        SearchStats.objects.get_or_create(pk=STATS_ID)
+        SearchStats.objects.filter(pk=STATS_ID).update(
+            document_count=F("document_count") + count, total_length=F("total_length") + length)
+
+
+def get_prefix_condition(prefix):
+    """
+    Match the terms starting with `prefix`.
+
+    Written as a range rather than `LIKE 'prefix%'` so that every backend
+    (SQLite included) answers it from the `term` index.
+    """
+    upper = prefix.rstrip(TERM_ALPHABET[-1])
+    if not upper or upper[-1] not in TERM_ALPHABET:
+        # No upper bound in the alphabet (the terms after "zz" include
+        # "été"), or collations do not sort it by code point
+        return Q(term__startswith=prefix)
+    upper = upper[:-1] + TERM_ALPHABET[TERM_ALPHABET.index(upper[-1]) + 1]
+    return Q(term__gte=prefix, term__lt=upper)
+
+
+def get_query_condition(query_terms):
+    """
+    Match the index terms of the query: every query term matches the terms
+    equal to it and, when it is at least `MIN_PREFIX_LENGTH` long, the
+    terms it is a prefix of.
+    """
+    condition = Q()
+    for term in query_terms:
+        if len(term) >= MIN_PREFIX_LENGTH:
+            condition |= get_prefix_condition(term)
+        else:
+            condition |= Q(term=term)
+    return condition
+
+
+def get_postings(query_terms):
+    return SearchPosting.objects.filter(
+        get_query_condition(query_terms)
+    ).values_list("term", "document_id", "frequency", "document__length")
+
+
+def get_collection_stats_queryset():
+    return SearchStats.objects.filter(pk=STATS_ID).values("document_count", "total_length")
+
+
+def get_collection_stats():
+    return to_collection_stats(get_collection_stats_queryset().first())
+
+
+def to_collection_stats(row):
+    """
+    Return the number of documents and their average length, from the
+    `SearchStats` row.
+    """
+    if not row or not row["document_count"]:
+        return {"total": 0, "average": None}
+    return {
+        "total": row["document_count"],
+        "average": row["total_length"] / row["document_count"],
+    }
+
+
+def get_title_matches(query):
+    """
+    Match the published posts titled `query`, newest first, as
+    (created_on, id) rows.
+    """
+    return BlogPost.objects.filter(
+        title=query, status="published", deleted_at=False
+    ).order_by("-created_on", "-id").values_list("created_on", "pk")
+
+
+def rank(query_terms, rows, stats):
+    """
+    Score the documents of the posting rows with BM25 and return them as
+    (score, id) pairs, best first.
+    """
+    postings = defaultdict(list)
+    for term, document_id, frequency, length in rows:
+        postings[term].append((document_id, frequency, length))
+
+    total = stats["total"]
+    average_length = stats["average"] or 1
+
+    scores = defaultdict(float)
+    for term, matches in postings.items():
+        weight = 1 if term in query_terms else PREFIX_WEIGHT
+        idf = math.log(1 + (total - len(matches) + 0.5) / (len(matches) + 0.5))
+        for document_id, frequency, length in matches:
+            norm = K1 * (1 - B + B * length / average_length)
+            scores[document_id] += weight * idf * frequency * (K1 + 1) / (frequency + norm)
+
+    return sorted(
+        ((score, document_id) for document_id, score in scores.items()),
+        key=lambda item: (-item[0], -item[1]),
+    )
+
+
+def search_ranked(query):
+    """
+    Return the published posts matching the query as (score, id) pairs,
+    best first (see `blog.pagination.KeysetPagination.paginate_list`).
+
+    Exact title matches of queries without index terms are scored by
+    creation time, so they are listed newest first.
+    """
+    query_terms = set(analyze(query))
+    if not query_terms:
+        return [
+            (created_on.timestamp(), pk) for created_on, pk in get_title_matches(query)
+        ]
+
+    rows = list(get_postings(query_terms))
+    if not rows:
+        return []
+    return rank(query_terms, rows, get_collection_stats())
+
+
+async def asearch_ranked(query):
+    """
+    Async variant of `search_ranked` using the async ORM.
+    """
+    query_terms = set(analyze(query))
+    if not query_terms:
+        return [
+            (created_on.timestamp(), pk) async for created_on, pk in get_title_matches(query)
+        ]
+
+    rows = [row async for row in get_postings(query_terms)]
+    if not rows:
+        return []
+    stats = to_collection_stats(await get_collection_stats_queryset().afirst())
+    return rank(query_terms, rows, stats)
+
+
+def search(query):
+    """
+    Return the ids of the published posts matching the query, best first.
+    """
+    return [pk for score, pk in search_ranked(query)]
+
+
+def rebuild(batch_size=500):
+    """
+    Rebuild the whole index from the blog posts table.
+
+    Returns the number of indexed posts.
+    """
+    # Postings have no dependants, so they are removed in a single query
+    SearchPosting.objects.all().delete()
+    SearchDocument.objects.all().delete()
+    SearchStats.objects.update_or_create(
+        pk=STATS_ID, defaults={"document_count": 0, "total_length": 0})
+    queryset = BlogPost.objects.filter(
+        status="published", deleted_at=False
+    ).select_related("category").order_by("pk")
+
+    indexed = 0
+    batch = []
+    for blog_post in queryset.iterator(chunk_size=batch_size):
+        batch.append(blog_post)
+        if len(batch) >= batch_size:
+            index_posts(batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        index_posts(batch)
+        indexed += len(batch)
+    return indexed
@@ -0,0 +1,97 @@
+"""
+Precomputed timelines of the published blog posts, per author and per
+category.
+
+Timelines are fanned out on write: a post is added to the timeline of its
+author and to the one of its category when it is published, moved when its
+category changes and removed when it is unpublished or deleted (soft or
+hard). Entries carry the creation time of their post and are indexed on
+(kind, owner, -created_on, -post), so a timeline page is an index range
+scan returning post ids, and the posts of the page are then fetched by id
+in one query.
+
+A post is in the timelines when it is counted in the category stats
+(published, not deleted): saved posts are fanned out by the same signal
+receivers (`blog.signals`), bulk writes call `record`, and `rebuild`
+builds every timeline again (`rebuild_timelines` command).
+"""
+from django.db import transaction
+from blog.models import BlogPost, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def get_entries(blog_post, category_id):
+    """
+    Return the timeline entries of a published post in `category_id`.
+    """
+    return [
+        TimelineEntry(
+            kind=TimelineEntry.AUTHOR, owner_id=blog_post.author_id,
+            blog_post_id=blog_post.pk, created_on=blog_post.created_on),
+        TimelineEntry(
+            kind=TimelineEntry.CATEGORY, owner_id=category_id,
+            blog_post_id=blog_post.pk, created_on=blog_post.created_on),
+    ]
+
+
+def record(changes):
+    """
+    Fan out changes of posts, given as (blog_post, before, after) where
+    `before` and `after` are the category ids the post is counted in
+    (None for posts that are not listed).
+    """
+    changes = [(blog_post, before, after) for blog_post, before, after in changes if before != after]
+    removed = [blog_post.pk for blog_post, before, after in changes if before is not None]
+    if removed:
+        TimelineEntry.objects.filter(blog_post_id__in=removed).delete()
+    TimelineEntry.objects.bulk_create(
+        [
+            entry
+            for blog_post, before, after in changes if after is not None
+            for entry in get_entries(blog_post, after)
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def get_timeline(kind, owner_id):
+    """
+    Return the entries of a timeline, newest first, as ("blog_post_id",
+    "created_on") rows.
+    """
+    return TimelineEntry.objects.filter(kind=kind, owner_id=owner_id).order_by(
+        "-created_on", "-blog_post_id"
+    ).values("blog_post_id", "created_on")
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """
+    Rebuild every timeline from the published posts, one batch of posts at
+    a time.
+
+    Returns the number of listed posts.
+    """
+    listed = 0
+    last_id = 0
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        while True:
+            blog_posts = list(
+                BlogPost.objects.filter(
+                    pk__gt=last_id, status="published", deleted_at=False
+                ).order_by("pk").only("pk", "author", "category", "created_on")[:batch_size]
+            )
+            if not blog_posts:
+                return listed
+            last_id = blog_posts[-1].pk
+            TimelineEntry.objects.bulk_create(
+                [
+                    entry
+                    for blog_post in blog_posts
+                    for entry in get_entries(blog_post, blog_post.category_id)
+                ],
+                batch_size=batch_size,
+            )
+            listed += len(blog_posts)
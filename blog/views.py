@@ -1,6 +1,22 @@
-from blog.utils import get_blog_object
+from django.core.cache import cache as django_cache
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from blog.utils import (
+    bulk,
+    cache,
+    category_stats,
+    export,
+    fast_serializers,
+    get_blog_object,
+    get_blog_queryset,
+    search_index,
+    timelines,
+)
+from rest_framework.exceptions import NotFound
 from rest_framework.views import APIView
-from blog.models import BlogPost, Comment
 from authentication.utils import send_email
 from rest_framework.status import (
     HTTP_201_CREATED,
@@ -9,19 +25,37 @@ from rest_framework.status import (
     HTTP_401_UNAUTHORIZED,
 )
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
-from blog.serializers import BlogSerializer, CommentSerializer
-from django.db.models import Q
-from rest_framework.pagination import PageNumberPagination
+from authentication.backends import CachedTokenAuthentication
+from blog.models import BlogPost, Comment, TimelineEntry
+from blog.serializers import (
+    BlogSerializer,
+    BlogFeedSerializer,
+    CommentSerializer,
+)
+from blog.pagination import (
+    CommentCursorPagination,
+    TimelineCursorPagination,
+    get_blog_paginator,
+)
 
 
-class BlogPostPagination(PageNumberPagination):
-    """
-    Custom pagination class for blog posts.
+def get_page_response(endpoint, request, build):
     """
+    Return the response of a cached listing page.
 
-    # Set the number of items to display per page
-    page_size = 1
+    Requests whose If-None-Match/If-Modified-Since are still current get a
+    304 before anything is read or serialized.
+    """
+    generation = cache.get_generation()
+    etag, last_modified = cache.get_validators(
+        endpoint, request, generation, cache.get_last_modified())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = Response(cache.get_or_set_page(endpoint, request, build, generation))
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
 
 
 class BlogAPISet1View(APIView):
@@ -33,7 +67,7 @@ class BlogAPISet1View(APIView):
     And also provide list of published blogs.
     """
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def post(self, request):
         """
@@ -69,47 +103,47 @@ class BlogAPISet1View(APIView):
 
     def get(self, request):
         """
-        Retrieve all published blog posts with comments using pagination.
+        Retrieve all published blog posts with their comment count using
+        pagination, and their latest comments with ?include=comments.
+
+        Pages are served from the page cache and only rebuilt after a
+        blog post or comment has been written.
 
         Returns:
         Response: JSON response containing the serialized blog posts and their comments.
         """
-        # Retrieve all published blog posts
-        blogs = BlogPost.objects.filter(status="published", deleted_at=False)
+        return get_page_response("feed", request, lambda: self.get_page_data(request))
 
-        # Instantiate the paginator
-        paginator = BlogPostPagination()
+    def get_page_data(self, request):
+        """
+        Build the paginated response data of the requested feed page.
+        """
+        # Retrieve all published blog posts with their category, as rows
+        blogs = get_blog_queryset.get_published_post_rows()
+
+        # Instantiate the paginator requested by the client
+        # (page numbers by default, keyset with ?pagination=cursor)
+        paginator = get_blog_paginator(request)
 
         # Get the paginated result page based on the requested page number
         result_page = paginator.paginate_queryset(blogs, request)
 
-        # Serialize the paginated blog posts using BlogSerializer
-        serializer = BlogSerializer(result_page, many=True)
-
-        # Initialize an empty list to hold the serialized blog posts with comments
-        data = []
-
-        # Iterate over each serialized blog post and retrieve its comments
-        for blog in serializer.data:
-            comments = Comment.objects.filter(blog_post=blog["id"])
+        # Serialize the paginated blog posts together with their latest
+        # comments (loaded in one query), or only their comment statistics
+        comments = None
+        if get_blog_queryset.includes_comments(request):
+            comments = get_blog_queryset.get_latest_comment_values(
+                [row["id"] for row in result_page])
+        data = fast_serializers.serialize_posts(result_page, comments)
 
-            # Serialize the comments using CommentSerializer
-            comment_serializer = CommentSerializer(comments, many=True)
-
-            # Add the serialized comments to the current blog post dictionary
-            blog["comments"] = comment_serializer.data
-
-            # Append the updated blog post dictionary to the data list
-            data.append(blog)
-
-        # Return a paginated JSON response containing the serialized blog posts and their comments
+        # Return the paginated data of the serialized blog posts and their comments
         return paginator.get_paginated_response(
             {
                 "status": True,
                 "message": "All Published Posts Are Listed Below",
                 "data": data,
             }
-        )
+        ).data
 
 
 class BlogAPISet2View(APIView):
@@ -126,9 +160,65 @@ class BlogAPISet2View(APIView):
 
     (3)
     API view to handle creation of comments on a blog post.
+
+    (4)
+    API view that retrieves a single blog post by ID with its latest comments.
+
+    Drafts are only shown to their author.
     """
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+
+    def get(self, request, id):
+        """
+        Retrieves a single blog post by ID.
+
+        The post and its serialized data are cached until the post or one
+        of its comments is written; unchanged posts are answered with 304.
+
+        Args:
+            request (Request): A Django REST Framework request object.
+            id (int): The ID of the blog post to retrieve.
+
+        Returns:
+            Response: A JSON response containing the serialized blog post
+                    and its latest comments.
+        """
+        generation = cache.get_generation(cache.get_object_generation_key(id))
+        blog_post = get_blog_object.get_object(id, generation)
+        if blog_post.status != "published" and blog_post.author_id != request.user.pk:
+            raise NotFound({
+                "status": False,
+                "message": "Blog Post Does Not Exist.",
+                "data": None
+            })
+
+        etag = quote_etag(f"{id}-{generation}")
+        last_modified = blog_post.updated_on.timestamp()
+        if blog_post.last_commented_at:
+            last_modified = max(last_modified, blog_post.last_commented_at.timestamp())
+        last_modified = cache.to_last_modified(last_modified)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+        if response is None:
+            key = cache.get_object_key(id, generation, "data")
+            data = django_cache.get(key)
+            if data is None:
+                get_blog_queryset.attach_latest_comments([blog_post])
+                data = BlogFeedSerializer(blog_post).data
+                django_cache.set(key, data, timeout=cache.PAGE_CACHE_TIMEOUT)
+            response = Response(
+                {
+                    "status": True,
+                    "message": "Blog Post Details.",
+                    "data": data,
+                },
+                status=HTTP_200_OK,
+            )
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
 
     def put(self, request, id):
         """
@@ -144,7 +234,7 @@ class BlogAPISet2View(APIView):
                     along with a success message.
         """
         blog_post = get_blog_object.get_object(id)
-        if blog_post.author == request.user:
+        if blog_post.author_id == request.user.pk:
             serializer = BlogSerializer(blog_post, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -190,7 +280,7 @@ class BlogAPISet2View(APIView):
                     along with a success message.
         """
         blog_post = get_blog_object.get_object(id)
-        if blog_post.author == request.user:
+        if blog_post.author_id == request.user.pk:
             if blog_post.deleted_at:
                 return Response(
                     {
@@ -202,7 +292,7 @@ class BlogAPISet2View(APIView):
                 )
 
             blog_post.deleted_at = True
-            blog_post.save()
+            blog_post.save(update_fields=["deleted_at", "updated_on"])
 
             return Response(
                 {
@@ -249,15 +339,14 @@ class BlogAPISet2View(APIView):
             "author": commenter,
             "email": email,
             "content": content,
-            "blog_post": blog_post.id,
         }
 
         # Serialize the comment data
         serializer = CommentSerializer(data=comment)
 
-        # Save the comment to the database and return the serialized data
+        # Save the comment on the fetched blog post and return the serialized data
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(blog_post=blog_post)
             send_email.send_posted_comment_email(blog_post, content, commenter)
             return Response(
                 {
@@ -278,10 +367,282 @@ class BlogAPISet2View(APIView):
             )
 
 
-class SearchAPIView(APIView):
+class CommentListAPIView(APIView):
+    """
+    API endpoint that lists the comments of a published blog post.
     """
-    API View for searching blog posts by title or category name.
+
+    def get(self, request, id):
+        """
+        Retrieve the comments of a blog post, oldest first, with keyset
+        pagination (follow the "next" link to load more).
+
+        Returns:
+        Response: JSON response containing the serialized comments.
+            Error response if the blog post does not exist.
+        """
+        return get_page_response(
+            "comments", request, lambda: self.get_page_data(request, id))
+
+    def get_page_data(self, request, id):
         """
+        Build the paginated response data of the requested comments page.
+        """
+        if not BlogPost.objects.filter(id=id, status="published", deleted_at=False).exists():
+            raise NotFound({
+                "status": False,
+                "message": "Blog Post Does Not Exist.",
+                "data": None
+            })
+
+        paginator = CommentCursorPagination()
+        comments = paginator.paginate_queryset(
+            Comment.objects.filter(blog_post_id=id), request)
+        serializer = CommentSerializer(comments, many=True)
+        return paginator.get_paginated_response(
+            {
+                "status": True,
+                "message": "Comments Are Listed Below",
+                "data": serializer.data,
+            }
+        ).data
+
+
+class CategoryListAPIView(APIView):
+    """
+    API endpoint that lists the categories with their number of published
+    blog posts.
+    """
+
+    def get(self, request):
+        """
+        Retrieve the categories having published blog posts, most used
+        first, with their post count.
+
+        The counts are maintained on every write (see
+        `blog.utils.category_stats`) and the page is served from the page
+        cache.
+
+        Returns:
+        Response: JSON response containing the categories and their counts.
+        """
+        return get_page_response("categories", request, self.get_page_data)
+
+    def get_page_data(self):
+        """
+        Build the response data of the categories listing.
+        """
+        return {
+            "status": True,
+            "message": "Categories Are Listed Below",
+            "data": category_stats.get_published_counts(),
+        }
+
+
+class TimelineAPIView(APIView):
+    """
+    Base class of the endpoints listing the published blog posts of a
+    precomputed timeline (see `blog.utils.timelines`), newest first.
+    """
+
+    kind = None
+    message = None
+
+    def get(self, request, id):
+        """
+        Retrieve the published blog posts of the timeline with their comment
+        count using pagination, and their latest comments with
+        ?include=comments.
+
+        Returns:
+        Response: JSON response containing the serialized blog posts.
+        """
+        return get_page_response(
+            f"timeline:{self.kind}", request, lambda: self.get_page_data(request, id))
+
+    def get_page_data(self, request, id):
+        """
+        Build the paginated response data of the requested timeline page.
+        """
+        paginator = get_blog_paginator(request, TimelineCursorPagination)
+
+        # Slice the post ids of the page from the timeline, then fetch the
+        # posts by id in one query
+        entries = paginator.paginate_queryset(timelines.get_timeline(self.kind, id), request)
+        result_page = get_blog_queryset.get_published_post_rows_by_ids(
+            [entry["blog_post_id"] for entry in entries])
+
+        comments = None
+        if get_blog_queryset.includes_comments(request):
+            comments = get_blog_queryset.get_latest_comment_values(
+                [row["id"] for row in result_page])
+        data = fast_serializers.serialize_posts(result_page, comments)
+
+        return paginator.get_paginated_response(
+            {
+                "status": True,
+                "message": self.message,
+                "data": data,
+            }
+        ).data
+
+
+class AuthorTimelineAPIView(TimelineAPIView):
+    """
+    API endpoint that lists the published blog posts of an author.
+    """
+
+    kind = TimelineEntry.AUTHOR
+    message = "Posts Of The Author Are Listed Below"
+
+
+class CategoryTimelineAPIView(TimelineAPIView):
+    """
+    API endpoint that lists the published blog posts of a category.
+    """
+
+    kind = TimelineEntry.CATEGORY
+    message = "Posts Of The Category Are Listed Below"
+
+
+class BlogBulkAPIView(APIView):
+    """
+    API endpoint that creates, updates and soft deletes many blog posts of
+    the logged-in user in one request.
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
+
+    def post(self, request):
+        """
+        Apply a list of operations on the user's blog posts.
+
+        The body is a list (or {"operations": [...]}) of objects with an
+        "op" of "create" (the default), "update" or "delete", the post "id"
+        for updates and deletes, and the blog post fields.
+
+        Parameters:
+        request (Request): The incoming request object.
+
+        Returns:
+        Response: JSON response with one result per operation, in order.
+            Error response if the body is not a list of operations.
+        """
+        if not request.user.is_authenticated:
+            return Response(
+                {
+                    "status": False,
+                    "message": "Authentication credentials were not provided.",
+                    "data": None,
+                },
+                status=HTTP_401_UNAUTHORIZED,
+            )
+
+        operations = request.data
+        if isinstance(operations, dict):
+            operations = operations.get("operations")
+        if not isinstance(operations, list) or not operations:
+            return Response(
+                {
+                    "status": False,
+                    "message": "Expected a non-empty list of operations.",
+                    "data": None,
+                },
+                status=HTTP_400_BAD_REQUEST,
+            )
+        if len(operations) > bulk.MAX_OPERATIONS:
+            return Response(
+                {
+                    "status": False,
+                    "message": f"At most {bulk.MAX_OPERATIONS} operations per request.",
+                    "data": None,
+                },
+                status=HTTP_400_BAD_REQUEST,
+            )
+
+        results = bulk.apply_operations(operations, request.user)
+        succeeded = sum(result["status"] for result in results)
+        return Response(
+            {
+                "status": succeeded == len(results),
+                "message": f"{succeeded} of {len(results)} operations applied.",
+                "data": results,
+            },
+            status=HTTP_200_OK,
+        )
+
+
+class BlogExportAPIView(APIView):
+    """
+    API endpoint that streams all published blog posts with their comments,
+    for dumps and incremental syncs.
+    """
+
+    def get(self, request):
+        """
+        Stream the published blog posts as newline-delimited JSON, or as a
+        JSON array with ?output=array.
+
+        With ?since=<ISO 8601 datetime> only the posts written or commented
+        after that time are listed, deleted ones as {"id", "deleted"}.
+        Clients can pass the Last-Modified of their previous export.
+
+        Returns:
+        StreamingHttpResponse: The export document, or 304 when the
+            ETag/If-Modified-Since of the request are still current.
+            Error response if the parameters are invalid.
+        """
+        output = request.query_params.get("output", "ndjson")
+        if output not in export.OUTPUTS:
+            return Response(
+                {
+                    "status": False,
+                    "error": f"output must be one of {', '.join(export.OUTPUTS)}.",
+                    "data": None,
+                },
+                status=HTTP_400_BAD_REQUEST,
+            )
+
+        since = request.query_params.get("since")
+        if since is not None:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                since = None
+            if since is None:
+                return Response(
+                    {
+                        "status": False,
+                        "error": "since must be an ISO 8601 datetime.",
+                        "data": None,
+                    },
+                    status=HTTP_400_BAD_REQUEST,
+                )
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        etag, last_modified = cache.get_validators(
+            "export", request, cache.get_generation(), cache.get_last_modified())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = StreamingHttpResponse(
+                export.stream(since, output),
+                content_type=export.OUTPUTS[output],
+            )
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class SearchAPIView(APIView):
+    """
+    API View for searching blog posts by title, content or category name.
+
+    Results are ranked by relevance using the full-text search index
+    (see `blog.utils.search_index`).
+    """
     def get(self, request):
         """
         Returns a list of blog posts that match the search query.
@@ -293,38 +654,33 @@ class SearchAPIView(APIView):
         Response: JSON response containing the list of matching blog posts.
             Error response if the search query is missing or invalid.
         """
+        return get_page_response("search", request, lambda: self.get_page_data(request))
 
+    def get_page_data(self, request):
+        """
+        Build the paginated response data of the requested search page.
+        """
         search_query = request.query_params.get("search")
 
+        # Instantiate the paginator requested by the client
+        # (page numbers by default, keyset with ?pagination=cursor)
+        paginator = get_blog_paginator(request)
+
         if search_query:
-            # If a search query is provided, filter the BlogPost objects based on the query
-            blog_posts = BlogPost.objects.filter(
-                Q(title__exact=search_query) | Q(category__name__exact=search_query),
-                status="published",
-                deleted_at=False,
-            )
+            # If a search query is provided, rank the matching posts using
+            # the full-text search index and only load the requested page
+            ranked = search_index.search_ranked(search_query)
+            page_ids = [pk for score, pk in paginator.paginate_queryset(ranked, request)]
+            result_page = get_blog_queryset.get_published_post_rows_by_ids(page_ids)
         else:
             # Otherwise, retrieve all published blog posts
-            blog_posts = BlogPost.objects.filter(
-                status="published",
-                deleted_at=False,
-            )
-        # Instantiate the paginator
-        paginator = BlogPostPagination()
-
-        # Get the paginated result page based on the requested page number
-        result_page = paginator.paginate_queryset(blog_posts, request)
+            blog_posts = get_blog_queryset.get_published_post_rows()
+            result_page = paginator.paginate_queryset(blog_posts, request)
 
-        # Serialize the paginated blog posts using BlogSerializer
-        serializer = BlogSerializer(result_page, many=True)
-
-        # Loop through each blog post and retrieve its associated comments using CommentSerializer
-        data = []
-        for blog in serializer.data:
-            comments = Comment.objects.filter(blog_post=blog["id"])
-            comment_serializer = CommentSerializer(comments, many=True)
-            blog["comments"] = comment_serializer.data
-            data.append(blog)
+        # Serialize the paginated blog posts together with their latest comments
+        comments = get_blog_queryset.get_latest_comment_values(
+            [row["id"] for row in result_page])
+        data = fast_serializers.serialize_posts(result_page, comments)
 
         # Return a JSON response containing all matching blog posts and their comments
         if search_query:
@@ -338,4 +694,4 @@ class SearchAPIView(APIView):
                 "message": message,
                 "data": data,
             }
-        )
+        ).data
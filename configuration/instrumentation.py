@@ -0,0 +1,337 @@
+"""
+Per-request instrumentation.
+
+`InstrumentationMiddleware` measures for every request:
+
+- the number of database queries and the time spent running them, with an
+  execute wrapper installed on every database connection,
+- the time spent serializing data (`TimedSerializerMixin`) and rendering
+  the response,
+- the wall time of the whole request.
+
+They are sent back in a `Server-Timing` header (shown by the browser
+developer tools) when `INSTRUMENTATION_SERVER_TIMING` is set, and added up
+per endpoint in histograms served by `MetricsAPIView` in the Prometheus
+text format. Histograms are kept in the process: every worker is scraped
+on its own.
+
+When `INSTRUMENTATION_PROFILE_RATE` is set, that fraction of the requests
+is run under `cProfile`, and the profile of those slower than
+`INSTRUMENTATION_SLOW_REQUEST_MS` is logged (and written to
+`INSTRUMENTATION_PROFILE_DIR` when set).
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+from authentication.backends import CachedTokenAuthentication
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING = getattr(settings, "INSTRUMENTATION_SERVER_TIMING", False)
+PROFILE_RATE = getattr(settings, "INSTRUMENTATION_PROFILE_RATE", 0.0)
+SLOW_REQUEST_MS = getattr(settings, "INSTRUMENTATION_SLOW_REQUEST_MS", 500)
+PROFILE_DIR = getattr(settings, "INSTRUMENTATION_PROFILE_DIR", "")
+
+# Upper bounds of the histogram buckets, in seconds and in queries
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Number of functions shown in the logged profiles
+PROFILE_LINES = 30
+
+# Metrics of the request being handled, None outside of requests
+current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """
+    Measurements of one request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.timings = {"db": 0.0, "serialize": 0.0, "render": 0.0}
+        self.active = set()
+        self.start = time.perf_counter()
+        self.total = None
+
+    @contextmanager
+    def measure(self, name):
+        """
+        Add the time spent in the block to the `name` timing. Nested blocks
+        of the same name (nested serializers) are counted once.
+        """
+        if name in self.active:
+            yield
+            return
+        self.active.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+            self.active.discard(name)
+
+    def get_server_timing(self):
+        entries = [
+            f'db;dur={self.timings["db"] * 1000:.2f};desc="{self.queries} queries"',
+            f'serialize;dur={self.timings["serialize"] * 1000:.2f}',
+            f'render;dur={self.timings["render"] * 1000:.2f}',
+            f"total;dur={self.total * 1000:.2f}",
+        ]
+        return ", ".join(entries)
+
+
+@contextmanager
+def measure(name):
+    """
+    Time a block of the current request, if any.
+    """
+    metrics = current.get()
+    if metrics is None:
+        yield
+    else:
+        with metrics.measure(name):
+            yield
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting the queries of the current request.
+    """
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    metrics.queries += 1
+    with metrics.measure("db"):
+        return execute(sql, params, many, context)
+
+
+def install_query_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Connections are per thread, new ones get the wrapper when they connect
+connection_created.connect(install_query_wrapper)
+
+
+class TimedSerializerMixin:
+    """
+    Count the time spent in `to_representation` as serialization time.
+    """
+
+    def to_representation(self, instance):
+        with measure("serialize"):
+            return super().to_representation(instance)
+
+
+class Histogram:
+    """
+    Prometheus histogram: cumulative counts per bucket, sum and count.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def get_lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+class Registry:
+    """
+    Metrics of the requests of this process, per endpoint and method.
+    """
+
+    metrics = {
+        "http_request_duration_seconds": "Wall time of the requests.",
+        "http_request_db_duration_seconds": "Time spent running database queries.",
+        "http_request_db_queries": "Number of database queries of the requests.",
+        "http_request_serialize_duration_seconds": "Time spent serializing data.",
+        "http_request_render_duration_seconds": "Time spent rendering the responses.",
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, endpoint, method, metrics):
+        values = {
+            "http_request_duration_seconds": metrics.total,
+            "http_request_db_duration_seconds": metrics.timings["db"],
+            "http_request_db_queries": metrics.queries,
+            "http_request_serialize_duration_seconds": metrics.timings["serialize"],
+            "http_request_render_duration_seconds": metrics.timings["render"],
+        }
+        with self.lock:
+            for name, value in values.items():
+                key = (name, endpoint, method)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(
+                        QUERY_BUCKETS if name == "http_request_db_queries" else BUCKETS)
+                self.histograms[key].observe(value)
+
+    def render(self):
+        """
+        Return the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self.lock:
+            for name, description in self.metrics.items():
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, endpoint, method), histogram in sorted(self.histograms.items()):
+                    if metric == name:
+                        labels = f'endpoint="{endpoint}",method="{method}"'
+                        lines.extend(histogram.get_lines(name, labels))
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+registry = Registry()
+
+
+def get_endpoint(request):
+    """
+    Return the route of the view that handled the request, so all the
+    URLs of an endpoint are counted together.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.view_name or match.route
+
+
+class InstrumentationMiddleware:
+    """
+    Measure every request, see the module documentation.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    # One profiler can run at a time
+    profile_lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        for connection in connections.all():
+            install_query_wrapper(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            if PROFILE_RATE and random.random() < PROFILE_RATE:
+                response = self.get_profiled_response(request, metrics)
+            else:
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns
+        metrics = current.get()
+        if metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                metrics.timings["render"] += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, metrics):
+        metrics.total = time.perf_counter() - metrics.start
+        registry.observe(get_endpoint(request), request.method, metrics)
+        if SERVER_TIMING:
+            response["Server-Timing"] = metrics.get_server_timing()
+        return response
+
+    def get_profiled_response(self, request, metrics):
+        if not self.profile_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        finally:
+            self.profile_lock.release()
+
+        duration = (time.perf_counter() - metrics.start) * 1000
+        if duration >= SLOW_REQUEST_MS:
+            self.report_profile(request, profiler, duration)
+        return response
+
+    def report_profile(self, request, profiler, duration):
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+        logger.warning(
+            "Slow request %s %s (%.0f ms)\n%s",
+            request.method, request.path, duration, output.getvalue())
+        if PROFILE_DIR:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            name = f"{get_endpoint(request)}-{int(time.time() * 1000)}.prof"
+            stats.dump_stats(os.path.join(PROFILE_DIR, name.replace("/", "_")))
+
+
+class MetricsAPIView(APIView):
+    """
+    API View exposing the request metrics to Prometheus, for admins only.
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(
+            registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
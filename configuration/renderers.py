@@ -0,0 +1,87 @@
+"""
+JSON renderer of the API responses.
+
+DRF's `JSONRenderer` encodes with the stdlib `json` module and its
+`JSONEncoder`, whose `default` hook is called from Python for every value
+the C encoder does not know. `FastJSONRenderer` encodes with orjson when it
+is installed, and falls back to the stdlib otherwise, or when orjson cannot
+encode the data (integers of more than 64 bits).
+
+Both produce the same bytes as `JSONRenderer`: compact UTF-8, with U+2028
+and U+2029 escaped (but orjson renders NaN and infinities as null where the
+stdlib fails). Both also know the values views put in their data besides
+the serializer output:
+
+* datetimes, dates and times, formatted like DRF's encoder,
+* image and file fields, rendered as their URL (None when empty), like
+  DRF's `ImageField`.
+
+Indented output (`?format=json; indent=4` and the browsable API) goes
+through the stdlib.
+"""
+from django.db.models.fields.files import FieldFile
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class APIJSONEncoder(JSONEncoder):
+    """
+    DRF's encoder, rendering file fields as their URL.
+    """
+
+    def default(self, obj):
+        if isinstance(obj, FieldFile):
+            return obj.url if obj else None
+        return super().default(obj)
+
+
+def orjson_dumps(data, default=APIJSONEncoder().default):
+    """
+    Encode data with orjson like the stdlib path, or return None when
+    orjson is missing or cannot encode it.
+    """
+    if orjson is None:
+        return None
+    try:
+        # Datetimes are passed to `default`, so they keep DRF's format
+        # (milliseconds, "Z" for UTC) instead of orjson's
+        output = orjson.dumps(
+            data, default=default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+    except orjson.JSONEncodeError:
+        return None
+    # Escaped by the stdlib path, as they end lines in JavaScript
+    if b"\xe2\x80\xa8" in output or b"\xe2\x80\xa9" in output:
+        output = output.replace(b"\xe2\x80\xa8", b"\\u2028")
+        output = output.replace(b"\xe2\x80\xa9", b"\\u2029")
+    return output
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    `JSONRenderer` encoding with orjson when it is available.
+    """
+
+    encoder_class = APIJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is not None and self.compact and not self.ensure_ascii and (
+            self.get_indent(accepted_media_type, renderer_context or {}) is None
+        ):
+            output = orjson_dumps(data)
+            if output is not None:
+                return output
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+def dumps(data):
+    """
+    Encode data to compact JSON bytes, like `FastJSONRenderer`.
+    """
+    return FastJSONRenderer().render(data)
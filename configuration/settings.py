@@ -51,10 +51,12 @@ INSTALLED_APPS = [
     "authentication",
     "blog",
     "userprofile",
+    "benchmarks",
     "corsheaders",
 ]
 
 MIDDLEWARE = [
+    "configuration.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -101,6 +103,37 @@ DATABASES = {
 }
 
 
+# Cache
+# LocMem by default, point CACHE_URL at Redis in production
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
+
+# Maximum number of operations of one bulk blog request
+BLOG_BULK_MAX_OPERATIONS = env.int("BLOG_BULK_MAX_OPERATIONS", default=1000)
+
+# Lifetime in seconds of the cached feed and search pages
+BLOG_PAGE_CACHE_TIMEOUT = env.int("BLOG_PAGE_CACHE_TIMEOUT", default=300)
+
+# Number of blog posts read (and comments prefetched) at a time by the export
+BLOG_EXPORT_CHUNK_SIZE = env.int("BLOG_EXPORT_CHUNK_SIZE", default=500)
+
+# Blog post image variants: widths, formats and encoding quality
+BLOG_IMAGE_WIDTHS = env.list("BLOG_IMAGE_WIDTHS", cast=int, default=[320, 640, 1280])
+BLOG_IMAGE_FORMATS = env.list("BLOG_IMAGE_FORMATS", default=["webp", "jpeg"])
+BLOG_IMAGE_QUALITY = env.int("BLOG_IMAGE_QUALITY", default=80)
+# Largest accepted upload, in pixels
+BLOG_IMAGE_MAX_PIXELS = env.int("BLOG_IMAGE_MAX_PIXELS", default=40_000_000)
+# Generate the variants in a thread pool of the web process after each upload,
+# disable it to run generate_image_variants instead
+BLOG_IMAGE_AUTOPROCESS = env.bool("BLOG_IMAGE_AUTOPROCESS", default=True)
+BLOG_IMAGE_WORKERS = env.int("BLOG_IMAGE_WORKERS", default=2)
+
+# Serve the feed and search endpoints with the async views (ASGI deployments),
+# they are always available under api/blog/async/ as well
+BLOG_ASYNC_VIEWS = env.bool("BLOG_ASYNC_VIEWS", default=False)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -142,6 +175,62 @@ MEDIA_URL = "/media/"
 
 MEDIA_ROOT = os.path.join(BASE_DIR, "media/")
 
+# One-time passwords (account activation, forget password)
+OTP_TTL_SECONDS = env.int("OTP_TTL_SECONDS", default=600)
+OTP_MAX_ATTEMPTS = env.int("OTP_MAX_ATTEMPTS", default=5)
+
+# Token authentication cache: tokens resolved in the last TTL seconds are
+# served from memory (and from CACHES when the shared cache is enabled).
+# Revocations (logout, password change) reach the other workers through
+# CACHES within the check interval, only if CACHES is shared by them
+# (Redis): with LocMem they are only seen by the worker handling them
+AUTH_TOKEN_CACHE_SIZE = env.int("AUTH_TOKEN_CACHE_SIZE", default=1024)
+AUTH_TOKEN_CACHE_TTL = env.int("AUTH_TOKEN_CACHE_TTL", default=60)
+AUTH_TOKEN_SHARED_CACHE = env.bool("AUTH_TOKEN_SHARED_CACHE", default=False)
+AUTH_TOKEN_REVOCATION_CHECK_INTERVAL = env.int("AUTH_TOKEN_REVOCATION_CHECK_INTERVAL", default=5)
+
+# Sliding-window rate limits of the authentication endpoints, per user or IP
+# ("<requests>/<sec|min|hour|day>"), and the store of the counters. The
+# "_account" rates limit the attempts on one account (email), from any IP
+AUTH_THROTTLE_RATES = {
+    "register": env.str("AUTH_THROTTLE_REGISTER", default="5/hour"),
+    "login": env.str("AUTH_THROTTLE_LOGIN", default="10/min"),
+    "login_account": env.str("AUTH_THROTTLE_LOGIN_ACCOUNT", default="20/hour"),
+    "otp_send": env.str("AUTH_THROTTLE_OTP_SEND", default="5/hour"),
+    "otp_verify": env.str("AUTH_THROTTLE_OTP_VERIFY", default="10/min"),
+    "otp_verify_account": env.str("AUTH_THROTTLE_OTP_VERIFY_ACCOUNT", default="20/hour"),
+}
+AUTH_THROTTLE_STORE = env.str(
+    "AUTH_THROTTLE_STORE", default="authentication.throttling.CacheStore")
+
+# Blog cursor (keyset) pagination, enabled with ?pagination=cursor
+BLOG_CURSOR_PAGE_SIZE = env.int("BLOG_CURSOR_PAGE_SIZE", default=10)
+BLOG_CURSOR_MAX_PAGE_SIZE = env.int("BLOG_CURSOR_MAX_PAGE_SIZE", default=100)
+
+# Comments listing of a blog post (keyset pagination)
+BLOG_COMMENTS_PAGE_SIZE = env.int("BLOG_COMMENTS_PAGE_SIZE", default=20)
+BLOG_COMMENTS_MAX_PAGE_SIZE = env.int("BLOG_COMMENTS_MAX_PAGE_SIZE", default=100)
+
+# Seconds a process may keep using its cached category ids after a category
+# was renamed or deleted in another process
+BLOG_CATEGORY_CACHE_CHECK_INTERVAL = env.int("BLOG_CATEGORY_CACHE_CHECK_INTERVAL", default=5)
+
+# Number of latest comments embedded per post in the feed and search listings
+BLOG_FEED_LATEST_COMMENTS = env.int("BLOG_FEED_LATEST_COMMENTS", default=3)
+
+# API responses are encoded with orjson when it is installed, with the stdlib
+# json module otherwise (configuration/renderers.py)
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "configuration.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    # Number of trusted proxies in front of the app. Client IPs (rate
+    # limits) are read from X-Forwarded-For only behind them, REMOTE_ADDR
+    # otherwise, as the header is set by the client
+    "NUM_PROXIES": env.int("NUM_PROXIES", default=0),
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -155,6 +244,19 @@ EMAIL_PORT = os.environ.get("EMAIL_PORT")
 EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS")
 EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD")
+# Seconds before a hanging email server is given up on (well within the
+# outbox lease below)
+EMAIL_TIMEOUT = env.int("EMAIL_TIMEOUT", default=30)
+
+# Email outbox: emails are delivered by `manage.py send_queued_emails`
+# and, when autoflush is enabled, by a background thread of the web process.
+EMAIL_OUTBOX_AUTOFLUSH = env.bool("EMAIL_OUTBOX_AUTOFLUSH", default=True)
+EMAIL_OUTBOX_WORKERS = env.int("EMAIL_OUTBOX_WORKERS", default=1)
+EMAIL_OUTBOX_BATCH_SIZE = env.int("EMAIL_OUTBOX_BATCH_SIZE", default=50)
+EMAIL_OUTBOX_MAX_ATTEMPTS = env.int("EMAIL_OUTBOX_MAX_ATTEMPTS", default=5)
+EMAIL_OUTBOX_RETRY_DELAY = env.int("EMAIL_OUTBOX_RETRY_DELAY", default=60)
+# Seconds a worker has to send a claimed batch before other workers take it over
+EMAIL_OUTBOX_LEASE = env.int("EMAIL_OUTBOX_LEASE", default=300)
 
 # cors
 CORS_ORIGIN_ALLOW_ALL = True
@@ -164,6 +266,16 @@ CORS_ORIGIN_WHITELIST = [
 ]
 
 
+# Per-request instrumentation: Server-Timing headers, and cProfile sampling
+# of this fraction of the requests, logging the profiles of the slow ones
+INSTRUMENTATION_SERVER_TIMING = env.bool("INSTRUMENTATION_SERVER_TIMING", default=DEBUG)
+INSTRUMENTATION_PROFILE_RATE = env.float("INSTRUMENTATION_PROFILE_RATE", default=0.0)
+INSTRUMENTATION_SLOW_REQUEST_MS = env.int("INSTRUMENTATION_SLOW_REQUEST_MS", default=500)
+INSTRUMENTATION_PROFILE_DIR = env.str("INSTRUMENTATION_PROFILE_DIR", default="")
+
+# Slack incoming webhook receiving the error reports
+SLACK_WEBHOOK_URL = env("SLACK_WEBHOOK_URL", default="")
+
 LOGGING = DEFAULT_LOGGING
 LOGGING = {
     "version": 1,
@@ -0,0 +1,208 @@
+import datetime
+import decimal
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+from blog.models import BlogPost, Category
+from configuration import instrumentation, renderers
+from configuration.slack_logger import SlackExceptionHandler
+
+
+class WebhookStub(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the Slack webhook recording the posted payloads.
+    """
+    payloads = []
+    delay = 0
+
+    def do_POST(self):
+        time.sleep(self.delay)
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        self.payloads.append(json.loads(parse_qs(body)["payload"][0]))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class SlackExceptionHandlerTest(SimpleTestCase):
+
+    def setUp(self):
+        WebhookStub.payloads = []
+        WebhookStub.delay = 0
+        self.server = HTTPServer(("127.0.0.1", 0), WebhookStub)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def log_error(self, handler, exception):
+        logger = logging.getLogger("configuration.tests.slack")
+        try:
+            raise exception
+        except Exception:
+            record = logger.makeRecord(
+                logger.name, logging.ERROR, __file__, 0, "Internal Server Error",
+                (), exc_info=sys.exc_info())
+        handler.handle(record)
+
+    def test_batches_and_deduplicates(self):
+        handler = SlackExceptionHandler(webhook_url=self.url, flush_interval=60)
+        for _ in range(3):
+            self.log_error(handler, ValueError("boom"))
+        self.log_error(handler, KeyError("missing"))
+        handler.close()
+
+        self.assertEqual(len(WebhookStub.payloads), 1)
+        attachments = WebhookStub.payloads[0]["attachments"]
+        counts = {
+            attachment["fields"][8]["value"]: attachment["fields"][0]["value"]
+            for attachment in attachments
+        }
+        self.assertEqual(counts, {"ValueError": 3, "KeyError": 1})
+
+    def test_rate_limit(self):
+        handler = SlackExceptionHandler(
+            webhook_url=self.url, batch_size=1, rate_limit=1, flush_interval=60)
+        self.log_error(handler, ValueError("first"))
+        self.log_error(handler, KeyError("second"))
+        time.sleep(0.5)
+        self.assertEqual(len(WebhookStub.payloads), 1)
+        handler.close()
+
+    def test_does_not_block_caller(self):
+        WebhookStub.delay = 1
+        handler = SlackExceptionHandler(webhook_url=self.url, batch_size=1)
+        start = time.monotonic()
+        for _ in range(2):
+            self.log_error(handler, ValueError("slow"))
+        self.assertLess(time.monotonic() - start, 0.5)
+        handler.close()
+
+
+@mock.patch.object(instrumentation, "SERVER_TIMING", True)
+class InstrumentationTest(TestCase):
+    """
+    Every request is measured, reported in Server-Timing and in /metrics.
+    """
+
+    def setUp(self):
+        cache.clear()
+        instrumentation.registry.clear()
+        self.user = User.objects.create_user(username="author", password="secret")
+        category = Category.objects.create(name="Health")
+        BlogPost.objects.create(
+            author=self.user, title="Post", content="Content", category=category,
+            status="published", deleted_at=False)
+
+    def get_timings(self, response):
+        timings = {}
+        for entry in response["Server-Timing"].split(", "):
+            name, *params = entry.split(";")
+            timings[name] = dict(param.split("=", 1) for param in params)
+        return timings
+
+    def test_server_timing(self):
+        response = self.client.get(reverse("blogapiset1"))
+        timings = self.get_timings(response)
+        # count, page
+        self.assertEqual(timings["db"]["desc"], '"2 queries"')
+        self.assertGreater(float(timings["serialize"]["dur"]), 0)
+        self.assertGreater(float(timings["render"]["dur"]), 0)
+        self.assertGreaterEqual(
+            float(timings["total"]["dur"]),
+            float(timings["db"]["dur"]) + float(timings["serialize"]["dur"]))
+
+    def test_metrics_are_admin_only(self):
+        self.client.get(reverse("blogapiset1"))
+        self.client.get(reverse("blogapiset1"))
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 401)
+        token = Token.objects.create(user=self.user)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.assertEqual(response.status_code, 403)
+
+        admin = User.objects.create_user(username="admin", password="secret", is_staff=True)
+        token = Token.objects.create(user=admin)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        lines = response.content.decode().splitlines()
+        self.assertIn("# TYPE http_request_duration_seconds histogram", lines)
+        labels = 'endpoint="blogapiset1",method="GET"'
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', lines)
+        # The second page came from the page cache
+        self.assertIn(f'http_request_db_queries_bucket{{{labels},le="0"}} 1', lines)
+        self.assertIn(f'http_request_db_queries_sum{{{labels}}} 2', lines)
+
+    def test_slow_requests_are_profiled(self):
+        with mock.patch.object(instrumentation, "PROFILE_RATE", 1.0), \
+                mock.patch.object(instrumentation, "SLOW_REQUEST_MS", 0), \
+                self.assertLogs("configuration.instrumentation", "WARNING") as logs:
+            response = self.client.get(reverse("blogapiset1"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Slow request GET /api/blog/blog-api-set1/", logs.output[0])
+        self.assertIn("cumulative", logs.output[0])
+
+
+class RendererTest(TestCase):
+
+    data = ReturnDict({
+        "text": "caf\u00e9 \u2028 \u2029 \"quoted\"",
+        "integers": [0, -1, 2 ** 40],
+        "float": 1.5,
+        "decimal": decimal.Decimal("3.25"),
+        "uuid": uuid.UUID(int=7),
+        "nested": {1: None, "flags": (True, False)},
+        "created_at": datetime.datetime(2023, 4, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        "naive": datetime.datetime(2023, 4, 1, 12, 30),
+        "date": datetime.date(2023, 4, 1),
+        "time": datetime.time(8, 15, 1, 500),
+    }, serializer=None)
+
+    def test_same_output_as_drf(self):
+        expected = JSONRenderer().render(self.data)
+        self.assertIsNotNone(renderers.orjson)
+        self.assertEqual(renderers.FastJSONRenderer().render(self.data), expected)
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertEqual(renderers.FastJSONRenderer().render(self.data), expected)
+
+    def test_fallback_on_unsupported_data(self):
+        data = {"big": 2 ** 70}
+        self.assertEqual(renderers.dumps(data), JSONRenderer().render(data))
+
+    def test_indent(self):
+        output = renderers.FastJSONRenderer().render(
+            {"a": 1}, "application/json; indent=2")
+        self.assertEqual(output, b'{\n  "a": 1\n}')
+
+    def test_image_fields(self):
+        image = BlogPost(image="blog_images/photo.jpg").image
+        data = {"image": image, "empty": BlogPost().image}
+        expected = json.dumps({"image": image.url, "empty": None}, separators=(",", ":")).encode()
+        self.assertEqual(renderers.dumps(data), expected)
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertEqual(renderers.dumps(data), expected)
+
+    def test_api_responses(self):
+        response = self.client.get(reverse("blogapiset1"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.accepted_renderer, renderers.FastJSONRenderer)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
@@ -15,10 +15,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from configuration.instrumentation import MetricsAPIView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/auth/', include('authentication.urls')),
     path('api/blog/', include('blog.urls')),
     path('api/userprofile/', include('userprofile.urls')),
+    path('metrics', MetricsAPIView.as_view(), name='metrics'),
 ]
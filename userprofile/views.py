@@ -7,7 +7,7 @@ from rest_framework.status import (
     )
 from django.contrib.auth.models import User
 from authentication.models import SoftDeletedUser
-from rest_framework.authentication import TokenAuthentication
+from authentication.backends import CachedTokenAuthentication
 from django.contrib.auth import logout
 
 
@@ -16,7 +16,7 @@ class UpdateUsernameAPIView(APIView):
     API endpoint that allows a user to update their username.
     """
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def put(self, request):
         """
@@ -79,7 +79,7 @@ class UserSoftDeleteAPIView(APIView):
     API endpoint that allows a user to soft delete their account.
     """
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def post(self, request):
         """
@@ -123,7 +123,7 @@ class LogoutAPIView(APIView):
     API endpoint that allows a user to logout and delete their token.
     """
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def post(self, request):
         """